@@ -0,0 +1,36 @@
+"""
+Migration script to add the composite indexes used by paginated history and notification queries
+Run this from backend directory: python add_performance_indexes.py
+
+Indexes are built CONCURRENTLY on PostgreSQL so the tables stay writable.
+create_all() only creates indexes together with new tables, so existing
+databases need this once.
+"""
+
+from app.database import engine
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_transactions_src_account_timestamp", "transactions", "src_account, timestamp, id"),
+    ("ix_transactions_dest_account_timestamp", "transactions", "dest_account, timestamp, id"),
+    ("ix_notifications_user_id_is_read_created_at", "notifications", "user_id, is_read, created_at"),
+    ("ix_notifications_user_id_created_at", "notifications", "user_id, created_at"),
+    ("ix_fixed_deposits_status_maturity_date", "fixed_deposits", "status, maturity_date, id"),
+]
+
+def migrate():
+    concurrently = "CONCURRENTLY " if engine.dialect.name == "postgresql" else ""
+    for name, table, columns in INDEXES:
+        try:
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                print(f"Creating index {name} on {table} ({columns})...")
+                conn.execute(text(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})"))
+                print(f"✓ {name}")
+        except Exception as e:
+            print(f"Note: {name} - {e}")
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,275 @@
+"""
+admin_stats.py
+
+Aggregates behind /admin/stats.
+
+compute_stats() answers the whole dashboard in one round-trip: a single
+conditional-aggregate subquery per table, joined into one row.
+
+With ADMIN_STATS_COUNTERS on, the same figures are also kept in the
+stat_counters table. An after_flush hook turns every ORM insert, update and
+delete of the counted models into counter deltas, collected on the session
+and applied after it commits, in a short transaction of their own, so
+reading the dashboard costs one small SELECT however large the tables
+grow. Applying them inside the writer's transaction would hold the few
+counter rows locked until every writer commits, serializing all of them.
+
+The counters are therefore eventually consistent, not exact: deltas are
+lost if a process dies between its commit and the update, may be counted
+twice if rebuild_counters() runs in between, and float sums drift. Until the
+next reconcile_admin_stats run (hourly beat task, which calls
+rebuild_counters() to re-derive everything from the base tables and also
+picks up writes that bypass the ORM), /admin/stats can be off by those
+amounts. Turn ADMIN_STATS_COUNTERS off where the dashboard must be exact.
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, update, func, case, cast, and_, true, event, inspect, Numeric
+from sqlalchemy.orm import Session
+from .database import engine, defer_until_commit, discard_rolled_back, take_committed
+from .models import User, Account, Transaction, Loan, FixedDeposit, Card, StatCounter, BOOKKEEPING_KINDS
+from . import config
+
+STAT_FIELDS = [
+    "total_users", "total_accounts", "total_balance", "total_transactions",
+    "total_loans", "total_fixed_deposits", "total_cards",
+    "pending_kyc", "pending_cards", "pending_loans", "pending_fds"
+]
+
+
+def _count_if(condition):
+    return func.count(case((condition, 1)))
+
+
+def compute_stats(db: Session) -> dict:
+    """All dashboard figures from the base tables in a single statement"""
+    users = select(
+        _count_if(User.role == "customer").label("total_users"),
+        _count_if(and_(User.role == "customer", User.status == "pending")).label("pending_kyc")
+    ).subquery()
+    accounts = select(
+        func.count(Account.id).label("total_accounts"),
+        func.coalesce(func.sum(Account.balance), 0).label("total_balance")
+    ).subquery()
+    transactions = select(
+        func.count(Transaction.id).label("total_transactions")
+    ).where(Transaction.kind.notin_(BOOKKEEPING_KINDS)).subquery()
+    loans = select(
+        func.count(Loan.id).label("total_loans"),
+        _count_if(Loan.approval_status == "pending").label("pending_loans")
+    ).subquery()
+    fixed_deposits = select(
+        func.count(FixedDeposit.id).label("total_fixed_deposits"),
+        _count_if(FixedDeposit.approval_status == "pending").label("pending_fds")
+    ).subquery()
+    cards = select(
+        func.count(Card.id).label("total_cards"),
+        _count_if(Card.approval_status == "pending").label("pending_cards")
+    ).subquery()
+
+    joined = users
+    for subquery in (accounts, transactions, loans, fixed_deposits, cards):
+        joined = joined.join(subquery, true())
+
+    row = db.execute(select(joined)).one()
+    return _typed(row._mapping)
+
+
+def _typed(values) -> dict:
+    return {
+        name: float(values[name] or 0) if name == "total_balance" else int(values[name] or 0)
+        for name in STAT_FIELDS
+    }
+
+
+def get_stats(db: Session) -> dict:
+    """Dashboard figures: from stat_counters when enabled, otherwise computed live"""
+    if not config.ADMIN_STATS_COUNTERS:
+        return compute_stats(db)
+
+    counters = dict(
+        db.query(StatCounter.name, StatCounter.value).filter(StatCounter.name.in_(STAT_FIELDS)).all()
+    )
+    if len(counters) < len(STAT_FIELDS):
+        return rebuild_counters(db)
+    return _typed(counters)
+
+
+def rebuild_counters(db: Session) -> dict:
+    """Recompute every counter from the base tables and store it"""
+    # Lock the counter rows first: writers bumping them wait for us, so their
+    # rows are either in our snapshot or bumped on top of it, never both
+    db.query(StatCounter).filter(StatCounter.name.in_(STAT_FIELDS)).with_for_update().all()
+
+    stats = compute_stats(db)
+    now = datetime.utcnow()
+    for name in STAT_FIELDS:
+        db.merge(StatCounter(name=name, value=stats[name], updated_at=now))
+    db.commit()
+    return stats
+
+
+# --- Incremental maintenance -------------------------------------------------
+
+def _user_counts(get) -> dict:
+    if get("role") != "customer":
+        return {}
+    return {"total_users": 1, "pending_kyc": int(get("status") == "pending")}
+
+
+def _account_counts(get) -> dict:
+    return {"total_accounts": 1, "total_balance": get("balance") or 0}
+
+
+def _transaction_counts(get) -> dict:
+    if get("kind") in BOOKKEEPING_KINDS:
+        return {}
+    return {"total_transactions": 1}
+
+
+def _loan_counts(get) -> dict:
+    return {"total_loans": 1, "pending_loans": int(get("approval_status") == "pending")}
+
+
+def _fixed_deposit_counts(get) -> dict:
+    return {"total_fixed_deposits": 1, "pending_fds": int(get("approval_status") == "pending")}
+
+
+def _card_counts(get) -> dict:
+    return {"total_cards": 1, "pending_cards": int(get("approval_status") == "pending")}
+
+
+# model -> (contribution function, attributes it reads)
+_COUNTED = {
+    User: (_user_counts, ("role", "status")),
+    Account: (_account_counts, ("balance",)),
+    Transaction: (_transaction_counts, ("kind",)),
+    Loan: (_loan_counts, ("approval_status",)),
+    FixedDeposit: (_fixed_deposit_counts, ("approval_status",)),
+    Card: (_card_counts, ("approval_status",)),
+}
+
+
+def _current_getter(obj):
+    def get(key):
+        value = getattr(obj, key)
+        if value is None:
+            # Column defaults are only applied at INSERT time
+            default = obj.__table__.c[key].default
+            if default is not None and default.is_scalar:
+                return default.arg
+        return value
+    return get
+
+
+def _previous_getter(obj):
+    state = inspect(obj)
+    current = _current_getter(obj)
+
+    def get(key):
+        history = state.attrs[key].history
+        return history.deleted[0] if history.deleted else current(key)
+    return get
+
+
+def _add(deltas: Counter, counts: dict, sign: int):
+    for name, value in counts.items():
+        deltas[name] += sign * value
+
+
+# session.info key: Counter of deltas to apply once the session commits
+_PENDING = "admin_stat_deltas"
+
+
+def _apply(connection, deltas: Counter):
+    now = datetime.utcnow()
+    # Always in name order so concurrent writers lock counter rows in the same order
+    for name in sorted(deltas):
+        delta = round(deltas[name], 2)
+        if delta:
+            connection.execute(
+                update(StatCounter.__table__)
+                .where(StatCounter.name == name)
+                # Kept to cents, so repeated float additions do not drift
+                .values(value=func.round(cast(StatCounter.value + delta, Numeric), 2), updated_at=now)
+            )
+
+
+def _merge(pending: Counter, deltas: Counter) -> Counter:
+    pending.update(deltas)
+    return pending
+
+
+def _defer(session: Session, deltas: Counter):
+    if any(deltas.values()):
+        defer_until_commit(session, _PENDING, deltas, _merge)
+
+
+def _apply_pending(session: Session):
+    """after_commit hook: one short transaction, outside the writer's locks"""
+    deltas = Counter()
+    for committed in take_committed(session, _PENDING):
+        deltas.update(committed)
+    if not any(deltas.values()):
+        return
+    try:
+        with engine.begin() as connection:
+            _apply(connection, deltas)
+    except Exception as e:
+        # The reconcile_admin_stats beat task corrects the counters
+        print(f"Failed to apply admin stat counter deltas: {e}")
+
+
+def _discard_pending(session: Session, previous_transaction):
+    discard_rolled_back(session, _PENDING, previous_transaction)
+
+
+def _track_counters(session: Session, flush_context):
+    """after_flush hook: new/dirty/deleted still describe what was just written"""
+    deltas = Counter()
+
+    for obj in session.new:
+        if type(obj) in _COUNTED:
+            _add(deltas, _COUNTED[type(obj)][0](_current_getter(obj)), 1)
+
+    for obj in session.deleted:
+        if type(obj) in _COUNTED:
+            _add(deltas, _COUNTED[type(obj)][0](_previous_getter(obj)), -1)
+
+    for obj in session.dirty:
+        if type(obj) not in _COUNTED:
+            continue
+        counts, attrs = _COUNTED[type(obj)]
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in attrs):
+            continue
+        _add(deltas, counts(_current_getter(obj)), 1)
+        _add(deltas, counts(_previous_getter(obj)), -1)
+
+    _defer(session, deltas)
+
+
+def bulk_delete(db: Session, query) -> int:
+    """query.delete() that keeps the counters right (bulk deletes skip flush hooks)"""
+    if config.ADMIN_STATS_COUNTERS:
+        model = query.column_descriptions[0]["entity"]
+        deltas = Counter()
+        for obj in query.all():
+            _add(deltas, _COUNTED[model][0](_current_getter(obj)), -1)
+        _defer(db, deltas)
+    return query.delete()
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+if config.ADMIN_STATS_COUNTERS:
+    event.listen(Session, "after_flush", _track_counters)
+    event.listen(Session, "after_commit", _apply_pending)
+    event.listen(Session, "after_soft_rollback", _discard_pending)
+    # Assigning an expired column normally skips loading its old value; the
+    # counters need it to know what to subtract
+    for model, (_, attrs) in _COUNTED.items():
+        for key in attrs:
+            event.listen(getattr(model, key), "set", _keep_previous_value, active_history=True)
@@ -1,36 +1,48 @@
 from fastapi import HTTPException, Depends
 from sqlalchemy.orm import Session
-from . import models, utils
+from . import models, utils, user_cache
 from .database import get_db
 from datetime import datetime
 import random
 import asyncio
 
 
+def _verified_payload(token: str) -> dict:
+    payload = user_cache.decode_token(token)
+    if payload is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
 def get_current_user(token: str = Depends(utils.get_token_from_header), db: Session = Depends(get_db)):
-    """Get current authenticated user from token"""
-    payload = utils.verify_access_token(token)
+    """Get current authenticated user from token (cached; attached to the request session)"""
+    payload = _verified_payload(token)
     user_id = payload.get("user_id")
     
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = user_cache.get_user(user_id, db)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user
+    # Attach without a SELECT so routes can lazy-load relationships and modify it
+    return db.merge(user, load=False)
 
 
 def get_current_user_from_token(token: str, db: Session):
     """Get current user from raw token (for WebSocket authentication)"""
-    payload = utils.verify_access_token(token)
+    payload = _verified_payload(token)
     user_id = payload.get("user_id")
     
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = user_cache.get_user(user_id, db)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
@@ -0,0 +1,151 @@
+"""
+broadcasts.py
+
+Admin broadcasts to every customer.
+
+A broadcast is a NotificationBroadcast row; run_broadcast() fans it out in
+chunks of recipients taken in user id order. Each chunk is one
+INSERT ... SELECT ... RETURNING into notifications plus the progress update
+on the broadcast row and the recipients' notification counters, committed
+together, followed by a single "fanout" WebSocket event for the whole
+chunk. A job that dies half-way resumes from last_user_id without notifying
+anyone twice.
+
+Every chunk starts by locking the broadcast row (FOR UPDATE SKIP LOCKED)
+and re-reading last_user_id, so two runs of the same broadcast (a manual
+rerun and a Celery redelivery) can never insert the same chunk: a run that
+finds the row locked leaves the broadcast to the one holding it.
+"""
+from datetime import datetime
+from sqlalchemy import select, insert, literal
+from sqlalchemy.orm import Session
+from .models import Notification, NotificationBroadcast, User
+from . import rabbitmq, notification_counters
+
+
+def create_broadcast(db: Session, title: str, message: str, notification_type: str, from_user_id: int) -> NotificationBroadcast:
+    """Record a queued broadcast addressed to all current customers"""
+    broadcast = NotificationBroadcast(
+        title=title,
+        message=message,
+        type=notification_type,
+        from_user_id=from_user_id,
+        status="queued",
+        total_recipients=db.query(User).filter(User.role == "customer").count()
+    )
+    db.add(broadcast)
+    db.commit()
+    db.refresh(broadcast)
+    return broadcast
+
+
+def _insert_chunk(db: Session, broadcast: NotificationBroadcast, created_at: datetime, chunk_size: int) -> list:
+    recipients = select(
+        User.id,
+        literal(broadcast.title),
+        literal(broadcast.message),
+        literal(broadcast.type),
+        literal(False),
+        literal(created_at),
+        literal(broadcast.from_user_id)
+    ).where(
+        User.role == "customer",
+        User.id > broadcast.last_user_id
+    ).order_by(User.id).limit(chunk_size)
+
+    stmt = insert(Notification).from_select(
+        ["user_id", "title", "message", "type", "is_read", "created_at", "from_user_id"], recipients
+    ).returning(Notification.user_id, Notification.id)
+    return [list(row) for row in db.execute(stmt)]
+
+
+def _publish_chunk(broadcast: NotificationBroadcast, recipients: list, created_at: datetime, from_user_name: str):
+    try:
+        with rabbitmq.publisher.batch():
+            rabbitmq.publish_fanout_event(recipients, {
+                "title": broadcast.title,
+                "message": broadcast.message,
+                "type": broadcast.type,
+                "related_id": None,
+                "is_read": False,
+                "created_at": created_at.isoformat(),
+                "read_at": None,
+                "from_user_id": broadcast.from_user_id,
+                "from_user_name": from_user_name
+            })
+            rabbitmq.publish_admin_event({
+                "type": "notification.broadcast.progress",
+                "broadcast_id": broadcast.id,
+                "status": broadcast.status,
+                "sent_count": broadcast.sent_count,
+                "total_recipients": broadcast.total_recipients
+            })
+    except Exception as e:
+        # The notifications are stored; clients that miss the push see them on their next fetch
+        print(f"Failed to publish broadcast {broadcast.id} chunk: {e}")
+
+
+def _claim(db: Session, broadcast_id: int):
+    """The broadcast row, locked until the next commit and freshly read; None if another run holds it"""
+    return db.query(NotificationBroadcast).filter(NotificationBroadcast.id == broadcast_id) \
+        .populate_existing().with_for_update(skip_locked=True).first()
+
+
+def _held_elsewhere(db: Session, broadcast_id: int):
+    db.rollback()
+    broadcast = db.query(NotificationBroadcast).filter(NotificationBroadcast.id == broadcast_id).first()
+    if broadcast is not None:
+        print(f"Broadcast {broadcast_id} is being sent by another run")
+    return broadcast
+
+
+def run_broadcast(db: Session, broadcast_id: int, chunk_size: int) -> NotificationBroadcast:
+    """Insert and push the broadcast chunk by chunk, recording progress on the broadcast row"""
+    broadcast = _claim(db, broadcast_id)
+    if broadcast is None:
+        return _held_elsewhere(db, broadcast_id)
+    if broadcast.status == "completed":
+        db.rollback()
+        return broadcast
+
+    from_user_name = None
+    if broadcast.from_user_id:
+        from_user_name = db.query(User.username).filter(User.id == broadcast.from_user_id).scalar()
+
+    broadcast.status = "running"
+    broadcast.error = None
+    db.commit()
+
+    try:
+        while True:
+            broadcast = _claim(db, broadcast_id)
+            if broadcast is None:
+                return _held_elsewhere(db, broadcast_id)
+            if broadcast.status == "completed":
+                db.rollback()
+                return broadcast
+
+            created_at = datetime.utcnow()
+            recipients = _insert_chunk(db, broadcast, created_at, chunk_size)
+            if not recipients:
+                break
+
+            # Clients count the fanout notifications themselves, so no stats push here
+            notification_counters.apply(db, {user_id: (1, 1) for user_id, _ in recipients}, push=False)
+            broadcast.last_user_id = max(user_id for user_id, _ in recipients)
+            broadcast.sent_count += len(recipients)
+            db.commit()
+
+            _publish_chunk(broadcast, recipients, created_at, from_user_name)
+
+        broadcast.status = "completed"
+        broadcast.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        broadcast.status = "failed"
+        broadcast.error = str(e)
+        db.commit()
+        print(f"Broadcast {broadcast_id} failed after {broadcast.sent_count} recipients: {e}")
+
+    return broadcast
@@ -1,5 +1,6 @@
 from celery import Celery
 from celery.schedules import crontab
+from .sharding import route_task
 
 celery_app = Celery(
     "banking_celery",
@@ -11,10 +12,24 @@ celery_app = Celery(
 # worker command you are using: `celery -A app.tasks worker -Q celery`.
 # Previously this was set to a custom queue 'transaction.process',
 # causing the worker (listening only on 'celery') to never receive tasks.
-celery_app.conf.task_routes = {
-    "process_transaction": {"queue": "celery"},
-    "auto_debit_loan_emi": {"queue": "celery"}
-}
+#
+# process_transaction is routed by app.sharding.route_task: with
+# TRANSACTION_SHARDS > 1 it goes to transactions.shard.<n> chosen by the
+# transfer's lower account id (run one worker per shard queue), otherwise it
+# stays on 'celery'.
+celery_app.conf.task_routes = (
+    route_task,
+    {
+        "process_transaction": {"queue": "celery"},
+        "settle_pending_transactions": {"queue": "celery"},
+        "auto_debit_loan_emi": {"queue": "celery"},
+        "process_emi_partition": {"queue": "celery"},
+        "mature_fixed_deposits": {"queue": "celery"},
+        "reconcile_admin_stats": {"queue": "celery"},
+        "rebuild_transaction_rollup": {"queue": "celery"},
+        "broadcast_notification": {"queue": "celery"}
+    },
+)
 
 # Schedule periodic tasks
 celery_app.conf.beat_schedule = {
@@ -22,6 +37,18 @@ celery_app.conf.beat_schedule = {
         'task': 'auto_debit_loan_emi',
         'schedule': crontab(hour=0, minute=0),  # Run daily at midnight
     },
+    'mature-fixed-deposits-daily': {
+        'task': 'mature_fixed_deposits',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'reconcile-admin-stats-hourly': {
+        'task': 'reconcile_admin_stats',
+        'schedule': crontab(minute=15),  # No-op unless ADMIN_STATS_COUNTERS is on
+    },
+    'rebuild-transaction-rollup': {
+        'task': 'rebuild_transaction_rollup',
+        'schedule': crontab(minute='*/10'),  # Today and yesterday
+    },
 }
 
 celery_app.conf.timezone = 'UTC'
\ No newline at end of file
@@ -24,4 +24,76 @@ def get_cors_origins() -> list[str]:
 	return CORS_ORIGINS
 
 
+# Transaction settlement mode for the Celery worker.
+#   "per_message" - every process_transaction message settles exactly one transfer.
+#   "batched"     - a message drains up to SETTLEMENT_BATCH_SIZE pending transfers and
+#                   commits them in a single DB transaction.
+SETTLEMENT_MODE = os.getenv("SETTLEMENT_MODE", "per_message").lower()
+SETTLEMENT_BATCH_SIZE = int(os.getenv("SETTLEMENT_BATCH_SIZE", "100"))
 
+# RabbitMQ publisher (see app.rabbitmq.RabbitPublisher)
+RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "127.0.0.1")
+RABBITMQ_PUBLISHER_POOL_SIZE = int(os.getenv("RABBITMQ_PUBLISHER_POOL_SIZE", "4"))
+RABBITMQ_PUBLISHER_CONFIRMS = os.getenv("RABBITMQ_PUBLISHER_CONFIRMS", "true").lower() == "true"
+
+# Account-sharded routing of process_transaction (see app.sharding). 1 keeps the single 'celery' queue.
+TRANSACTION_SHARDS = int(os.getenv("TRANSACTION_SHARDS", "1"))
+TRANSACTION_SHARD_VNODES = int(os.getenv("TRANSACTION_SHARD_VNODES", "64"))
+
+# WebSocket fan-out listener (see app.rabbitmq_ws_listener)
+WS_LISTENER_PREFETCH = int(os.getenv("WS_LISTENER_PREFETCH", "64"))
+WS_DELIVERY_TIMEOUT = float(os.getenv("WS_DELIVERY_TIMEOUT", "5"))
+
+# Per-connection WebSocket outbound queue (see app.websocket_manager). Clients that fall
+# WS_OUTBOUND_QUEUE_SIZE messages behind, or take longer than WS_SEND_TIMEOUT seconds to
+# accept a single frame, are dropped as slow consumers.
+WS_OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# Identity cache for the get_current_user dependencies (see app.user_cache).
+# AUTH_USER_CACHE_TTL bounds how long another API process can serve a stale
+# status/role after a change; 0 disables the user cache.
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+
+# Keep /admin/stats figures in the stat_counters table (see app.admin_stats). Eventually
+# consistent: deltas are applied in a separate transaction after each write commits, so a
+# crash in between leaves the figures off until the hourly reconcile_admin_stats run.
+# Off: the figures are aggregated live in one query and always exact.
+ADMIN_STATS_COUNTERS = os.getenv("ADMIN_STATS_COUNTERS", "false").lower() == "true"
+
+# Admin broadcasts (see app.broadcasts): recipients per multi-row INSERT, commit and fan-out event
+NOTIFICATION_BROADCAST_CHUNK_SIZE = int(os.getenv("NOTIFICATION_BROADCAST_CHUNK_SIZE", "1000"))
+
+# Seconds an API process serves /api/notifications/stats from memory (see app.notification_counters).
+# Changes made in this process, or pushed to a socket it holds, refresh the entry immediately.
+NOTIFICATION_STATS_CACHE_TTL = float(os.getenv("NOTIFICATION_STATS_CACHE_TTL", "30"))
+
+# EMI auto-debit runs (see app.emi): due loans are split into EMI_PARTITIONS loan id ranges,
+# one Celery task each, and every task commits EMI_CHUNK_SIZE loans at a time.
+EMI_PARTITIONS = int(os.getenv("EMI_PARTITIONS", "8"))
+EMI_CHUNK_SIZE = int(os.getenv("EMI_CHUNK_SIZE", "200"))
+
+# Fixed deposit maturity engine (see app.fd_maturity): deposits matured per DB transaction
+FD_MATURITY_CHUNK_SIZE = int(os.getenv("FD_MATURITY_CHUNK_SIZE", "500"))
+
+# Rendered QR code images (see app.qr_utils): QR_CACHE_SIZE images per process in memory, plus
+# one PNG file per digest in QR_CACHE_DIR shared by all processes ("" disables the disk cache).
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "1024"))
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".qr_cache"))
+QR_CACHE_MAX_AGE = int(os.getenv("QR_CACHE_MAX_AGE", "86400"))
+# Bounds of QR_CACHE_DIR, enforced on write at most once a minute per process: files not read
+# or written for QR_CACHE_DIR_MAX_AGE_DAYS are removed, then the oldest beyond QR_CACHE_DIR_MAX_FILES.
+QR_CACHE_DIR_MAX_FILES = int(os.getenv("QR_CACHE_DIR_MAX_FILES", "50000"))
+QR_CACHE_DIR_MAX_AGE_DAYS = float(os.getenv("QR_CACHE_DIR_MAX_AGE_DAYS", "30"))
+# Seconds between checks of the QR logo file for changes (0 checks on every render)
+QR_LOGO_RELOAD_INTERVAL = float(os.getenv("QR_LOGO_RELOAD_INTERVAL", "5"))
+# Worker processes rendering QR codes for multi-account requests (see app.qr_renderer); 0 renders in-process
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Signed QR payment tokens (see app.qr_utils). Codes stay valid for 1-2 QR_TOKEN_TTL_DAYS periods.
+# QR_ACCEPT_LEGACY_HASH=true temporarily accepts codes printed with the old unsigned hash again;
+# that hash is forgeable by anyone who knows an account id, so every acceptance is logged.
+QR_SIGNING_KEY = os.getenv("QR_SIGNING_KEY", JWT_SECRET_KEY)
+QR_TOKEN_TTL_DAYS = int(os.getenv("QR_TOKEN_TTL_DAYS", "365"))
+QR_ACCEPT_LEGACY_HASH = os.getenv("QR_ACCEPT_LEGACY_HASH", "false").lower() == "true"
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 import os
@@ -13,6 +14,36 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def dialect_insert(bind):
+    """insert() of the bind's dialect, which supports ON CONFLICT upserts (PostgreSQL or SQLite)"""
+    return (postgresql if bind.dialect.name == "postgresql" else sqlite).insert
+
+# Work deferred to the outermost commit. Session "after_commit" also fires when a
+# SAVEPOINT is released and "after_rollback" on ROLLBACK TO SAVEPOINT, so values are
+# kept per (nested) transaction: dropped with a rolled-back savepoint, handed over
+# once the real transaction commits.
+def defer_until_commit(session, key: str, value, merge):
+    """Attach `value` to the session's innermost transaction, merge(old, new) with earlier ones"""
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    pending = session.info.setdefault(key, {})
+    pending[transaction] = merge(pending[transaction], value) if transaction in pending else value
+
+def discard_rolled_back(session, key: str, transaction):
+    """after_soft_rollback: forget what `transaction` and the savepoints inside it deferred"""
+    pending = session.info.get(key)
+    for deferred in list(pending or ()):
+        parent = deferred
+        while parent is not None and parent is not transaction:
+            parent = parent.parent
+        if parent is transaction:
+            del pending[deferred]
+
+def take_committed(session, key: str) -> list:
+    """after_commit: everything deferred, once the outermost transaction committed"""
+    if session.in_nested_transaction():
+        return []
+    return list(session.info.pop(key, {}).values())
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,227 @@
+"""
+emi.py
+
+EMI auto-debit runs.
+
+A run covers every loan due on its run date. start_run() records it in
+emi_runs and splits the due loans into contiguous loan id ranges, one Celery
+task per range. Each task repeatedly claims up to EMI_CHUNK_SIZE due loans
+of its range with FOR UPDATE SKIP LOCKED, locks their accounts once (in id
+order), debits every loan inside its own savepoint and commits the chunk
+together with one emi_run_items row per loan and the run's progress
+counters.
+
+A loan that already has an item in the run is never picked again, so a
+task that is re-delivered or re-dispatched continues where it stopped
+instead of debiting twice. Every dispatch (the first one and each resume)
+starts a new generation of the run; partition tasks carry theirs, and
+only completions of the current generation are counted, so a stale or
+re-delivered task of an earlier dispatch cannot complete the run early.
+Loans still due when their run is abandoned are picked up by the next
+day's run.
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, exists
+from sqlalchemy.orm import Session
+from .models import Account, AuditLog, Loan, Notification, Transaction, EmiRun, EmiRunItem
+from .settlement import notification_payload
+
+
+def _account_id(account_ref):
+    # Loans store the linked account id as a string
+    return int(account_ref) if account_ref is not None and str(account_ref).isdigit() else None
+
+
+def _pending_loans(run: EmiRun):
+    """Filters for loans due in `run` that it has not processed yet"""
+    return (
+        Loan.status == "ACTIVE",
+        Loan.next_due_date <= run.run_date,
+        ~exists().where(EmiRunItem.run_id == run.id, EmiRunItem.loan_id == Loan.id)
+    )
+
+
+def _partition(first_id: int, last_id: int, partitions: int) -> list:
+    width = -(-(last_id - first_id + 1) // max(partitions, 1))
+    return [
+        (start, min(start + width - 1, last_id))
+        for start in range(first_id, last_id + 1, width)
+    ]
+
+
+def start_run(db: Session, run_date: date, partitions: int) -> tuple:
+    """
+    Create the run for `run_date`, or resume it if it is still unfinished.
+    Returns (run, [(first_loan_id, last_loan_id), ...]) for the ranges to
+    dispatch, tagged with run.generation.
+    """
+    run = db.query(EmiRun).filter(EmiRun.run_date == run_date).with_for_update().first()
+    if run is not None and run.status == "completed":
+        db.rollback()
+        return run, []
+
+    if run is None:
+        run = EmiRun(run_date=run_date, status="running")
+        db.add(run)
+        db.flush()
+
+    first_id, last_id, remaining = db.query(
+        func.min(Loan.id), func.max(Loan.id), func.count(Loan.id)
+    ).filter(*_pending_loans(run)).one()
+
+    run.total_loans = run.processed_count + remaining
+    if not remaining:
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        db.commit()
+        return run, []
+
+    ranges = _partition(first_id, last_id, partitions)
+    run.partitions_total = len(ranges)
+    run.partitions_done = 0
+    run.generation = (run.generation or 0) + 1
+    db.commit()
+    return run, ranges
+
+
+def _debit_loan(db: Session, loan: Loan, account: Account) -> dict:
+    """Debit one claimed loan. Caller owns the savepoint."""
+    if not account:
+        notification = Notification(
+            user_id=loan.user_id,
+            title="Loan EMI Auto-Debit Failed",
+            message=f"Unable to debit EMI of ${loan.emi:,.2f} for your {loan.loan_type} loan. Linked account not found.",
+            type="loan_payment",
+            related_id=loan.id
+        )
+        db.add(notification)
+        return {"status": "account_not_found", "notification": notification}
+
+    if account.balance < loan.emi:
+        notification = Notification(
+            user_id=loan.user_id,
+            title="Loan EMI Auto-Debit Failed",
+            message=f"Insufficient balance to debit EMI of ${loan.emi:,.2f} for your {loan.loan_type} loan. Available balance: ${account.balance:,.2f}. Please maintain sufficient balance.",
+            type="loan_payment",
+            related_id=loan.id
+        )
+        db.add(notification)
+        return {"status": "insufficient_balance", "notification": notification,
+                "detail": f"Required {loan.emi}, available {account.balance}"}
+
+    account.balance -= loan.emi
+    db.add(Transaction(src_account=account.id, dest_account=None, amount=loan.emi, status="SUCCESS", kind="emi"))
+    loan.amount_paid = round(loan.amount_paid + loan.emi, 2)
+    loan.outstanding = round(max(loan.total_payable - loan.amount_paid, 0.0), 2)
+
+    # Update next due date or close loan
+    if loan.outstanding > 0:
+        loan.next_due_date = loan.next_due_date + timedelta(days=30)
+    else:
+        loan.status = "CLOSED"
+        loan.next_due_date = None
+
+    db.add(AuditLog(
+        event_type="LOAN_EMI_AUTO_DEBIT",
+        message=f"Auto-debited EMI of ${loan.emi} from account {account.account_number} for loan {loan.id}"
+    ))
+
+    notification = Notification(
+        user_id=loan.user_id,
+        title="Loan EMI Auto-Debited",
+        message=f"EMI of ${loan.emi:,.2f} has been debited for your {loan.loan_type} loan. Outstanding: ${loan.outstanding:,.2f}. New balance: ${account.balance:,.2f}.",
+        type="loan_payment",
+        related_id=loan.id
+    )
+    db.add(notification)
+
+    return {"status": "debited", "amount": loan.emi, "notification": notification, "event": {
+        "type": "loan.emi_debit",
+        "loan_id": loan.id,
+        "user_id": loan.user_id,
+        "emi_amount": loan.emi,
+        "outstanding": loan.outstanding,
+        "status": loan.status,
+        "account_balance": account.balance
+    }}
+
+
+def process_chunk(db: Session, run_id: int, first_loan_id: int, last_loan_id: int, limit: int) -> list:
+    """
+    Claim and debit up to `limit` pending loans of the id range in one DB transaction.
+
+    Returns one outcome per loan (with its serialized notification and event);
+    an empty list once the range is exhausted. Nothing is published here.
+    """
+    run = db.query(EmiRun).filter(EmiRun.id == run_id).first()
+    if run is None:
+        return []
+
+    loans = db.query(Loan).filter(
+        Loan.id.between(first_loan_id, last_loan_id), *_pending_loans(run)
+    ).order_by(Loan.id).with_for_update(skip_locked=True).limit(limit).all()
+    if not loans:
+        db.rollback()
+        return []
+
+    # Lock every linked account once, in id order, for the whole chunk
+    account_ids = sorted({_account_id(loan.account_ref) for loan in loans} - {None})
+    accounts = {
+        acc.id: acc
+        for acc in db.query(Account).filter(Account.id.in_(account_ids)).order_by(Account.id).with_for_update().all()
+    } if account_ids else {}
+
+    outcomes = []
+    for loan in loans:
+        loan_id, user_id = loan.id, loan.user_id
+        savepoint = db.begin_nested()
+        try:
+            outcome = _debit_loan(db, loan, accounts.get(_account_id(loan.account_ref)))
+            savepoint.commit()
+        except Exception as e:
+            print(f"Error processing loan {loan_id} in EMI run {run_id}: {e}")
+            savepoint.rollback()
+            outcome = {"status": "error", "detail": str(e)}
+
+        db.add(EmiRunItem(
+            run_id=run_id,
+            loan_id=loan_id,
+            status=outcome["status"],
+            amount=outcome.get("amount", 0.0),
+            detail=outcome.get("detail")
+        ))
+        notification = outcome.get("notification")
+        outcomes.append({
+            "loan_id": loan_id,
+            "user_id": user_id,
+            "status": outcome["status"],
+            "amount": outcome.get("amount", 0.0),
+            # Serialize while ids/created_at are still loaded; commit expires them
+            "notification": notification_payload(notification) if notification is not None else None,
+            "event": outcome.get("event")
+        })
+
+    debited = [o for o in outcomes if o["status"] == "debited"]
+    db.query(EmiRun).filter(EmiRun.id == run_id).update({
+        EmiRun.processed_count: EmiRun.processed_count + len(outcomes),
+        EmiRun.debited_count: EmiRun.debited_count + len(debited),
+        EmiRun.failed_count: EmiRun.failed_count + len(outcomes) - len(debited),
+        EmiRun.debited_amount: EmiRun.debited_amount + sum(o["amount"] for o in debited)
+    }, synchronize_session=False)
+    db.commit()
+    return outcomes
+
+
+def finish_partition(db: Session, run_id: int, generation: int) -> EmiRun:
+    """Count a drained partition of the current generation; the last one marks the run completed"""
+    counted = db.query(EmiRun).filter(EmiRun.id == run_id, EmiRun.generation == generation).update(
+        {EmiRun.partitions_done: EmiRun.partitions_done + 1}, synchronize_session=False
+    )
+    db.commit()
+
+    run = db.query(EmiRun).filter(EmiRun.id == run_id).first()
+    if counted and run is not None and run.status != "completed" and run.partitions_done >= run.partitions_total:
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        db.commit()
+    return run
@@ -0,0 +1,169 @@
+"""
+fd_maturity.py
+
+Fixed deposit maturity engine.
+
+mature_due_deposits() claims up to FD_MATURITY_CHUNK_SIZE ACTIVE, approved
+deposits whose maturity_date has passed (walking the (status,
+maturity_date, id) index, FOR UPDATE SKIP LOCKED), locks their payout
+accounts once in id order and matures each one inside its own savepoint:
+
+    - auto_renew off: maturity_amount is credited to the linked account
+      (recorded as a SUCCESS transaction) and the deposit becomes MATURED.
+    - auto_renew on: the deposit becomes RENEWED and a new deposit for the
+      maturity amount starts on the old maturity date, same rate and tenure.
+
+The status change commits together with the credit, so reruns never pay a
+deposit twice, and the caller loops over chunks, so memory stays bounded
+however many deposits mature on a day.
+"""
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+from .models import Account, AuditLog, FixedDeposit, Notification, Transaction
+from .settlement import notification_payload
+
+
+def add_months(source_date: date, months: int) -> date:
+    # safe month add
+    month = source_date.month - 1 + months
+    year = source_date.year + month // 12
+    month = month % 12 + 1
+    # days per month
+    mdays = [31, 29 if (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)) else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    day = min(source_date.day, mdays[month - 1])
+    return date(year, month, day)
+
+
+def compute_maturity_amount(principal: float, rate: float, tenure_months: int) -> float:
+    """Compound interest with monthly compounding: A = P(1 + r/12)^months"""
+    monthly_rate = rate / 12 / 100
+    return round(principal * ((1 + monthly_rate) ** tenure_months), 2)
+
+
+def _claim_due(db: Session, today: date, limit: int, exclude: set) -> list:
+    query = db.query(FixedDeposit).filter(
+        FixedDeposit.status == "ACTIVE",
+        FixedDeposit.maturity_date <= today,
+        FixedDeposit.approval_status == "approved"
+    )
+    if exclude:
+        query = query.filter(FixedDeposit.id.notin_(exclude))
+    return query.order_by(FixedDeposit.maturity_date, FixedDeposit.id) \
+        .with_for_update(skip_locked=True).limit(limit).all()
+
+
+def _payout_accounts(db: Session, fds: list) -> dict:
+    """Lock the payout account of every deposit (linked account, else the owner's first account)"""
+    linked_ids = {fd.account_id for fd in fds if fd.account_id}
+    unlinked_users = {fd.user_id for fd in fds if not fd.account_id}
+
+    fallback_ids = {}
+    if unlinked_users:
+        for account_id, user_id in db.query(Account.id, Account.user_id) \
+                .filter(Account.user_id.in_(unlinked_users)).order_by(Account.id).all():
+            fallback_ids.setdefault(user_id, account_id)
+
+    account_ids = sorted(linked_ids | set(fallback_ids.values()))
+    accounts = {
+        acc.id: acc
+        for acc in db.query(Account).filter(Account.id.in_(account_ids)).order_by(Account.id).with_for_update().all()
+    } if account_ids else {}
+    return {fd.id: accounts.get(fd.account_id or fallback_ids.get(fd.user_id)) for fd in fds}
+
+
+def _renew(db: Session, fd: FixedDeposit, amount: float) -> FixedDeposit:
+    renewed = FixedDeposit(
+        fd_number=f"FD{int(datetime.utcnow().timestamp())}{fd.user_id}R{fd.id}",
+        user_id=fd.user_id,
+        account_id=fd.account_id,
+        principal=amount,
+        rate=fd.rate,
+        start_date=fd.maturity_date,
+        maturity_date=add_months(fd.maturity_date, fd.tenure_months),
+        tenure_months=fd.tenure_months,
+        maturity_amount=compute_maturity_amount(amount, fd.rate, fd.tenure_months),
+        status="ACTIVE",
+        auto_renew=True,
+        approval_status="approved",
+        approved_by=fd.approved_by,
+        approval_date=datetime.utcnow()
+    )
+    db.add(renewed)
+    fd.status = "RENEWED"
+    db.flush()
+    return renewed
+
+
+def _mature(db: Session, fd: FixedDeposit, account: Account) -> dict:
+    """Mature one claimed deposit. Caller owns the savepoint."""
+    amount = fd.maturity_amount or compute_maturity_amount(fd.principal, fd.rate, fd.tenure_months)
+    fd.matured_at = datetime.utcnow()
+
+    if fd.auto_renew:
+        renewed = _renew(db, fd, amount)
+        message = f"Your fixed deposit {fd.fd_number} matured at ${amount:,.2f} and was renewed as {renewed.fd_number} until {renewed.maturity_date}."
+        db.add(AuditLog(event_type="FD_AUTO_RENEWED", message=f"FD {fd.id} renewed as FD {renewed.id} for ${amount}"))
+        outcome = {"status": "RENEWED", "amount": amount, "renewed_fd_id": renewed.id}
+    else:
+        if account is None:
+            raise ValueError(f"no payout account for FD {fd.id}")
+        account.balance += amount
+        fd.status = "MATURED"
+        txn = Transaction(src_account=None, dest_account=account.id, amount=amount,
+                          status="SUCCESS", timestamp=fd.matured_at, kind="fd")
+        db.add(txn)
+        message = f"Your fixed deposit {fd.fd_number} has matured. ${amount:,.2f} was credited to account {account.account_number}. New balance: ${account.balance:,.2f}."
+        db.add(AuditLog(event_type="FD_MATURED", message=f"FD {fd.id} matured: ${amount} credited to account {account.id}"))
+        outcome = {"status": "MATURED", "amount": amount, "account_id": account.id, "account_balance": account.balance}
+
+    notification = Notification(
+        user_id=fd.user_id,
+        title="Fixed Deposit Matured",
+        message=message,
+        type="fixed_deposit",
+        related_id=fd.id
+    )
+    db.add(notification)
+    outcome["notification"] = notification
+    return outcome
+
+
+def mature_due_deposits(db: Session, today: date, limit: int, exclude: set) -> list:
+    """
+    Mature up to `limit` due deposits in one DB transaction.
+
+    Returns one outcome per claimed deposit (empty once nothing is due).
+    Deposits that fail are added to `exclude`, so the caller's next chunk
+    skips them; they are retried on the next run. Nothing is published here.
+    """
+    fds = _claim_due(db, today, limit, exclude)
+    if not fds:
+        db.rollback()
+        return []
+
+    accounts = _payout_accounts(db, fds)
+
+    outcomes = []
+    for fd in fds:
+        fd_id, user_id = fd.id, fd.user_id
+        savepoint = db.begin_nested()
+        try:
+            outcome = _mature(db, fd, accounts[fd_id])
+            savepoint.commit()
+        except Exception as e:
+            print(f"Error maturing fixed deposit {fd_id}: {e}")
+            savepoint.rollback()
+            exclude.add(fd_id)
+            outcome = {"status": "FAILED", "reason": str(e), "notification": None}
+
+        notification = outcome.pop("notification")
+        outcome.update({
+            "fd_id": fd_id,
+            "user_id": user_id,
+            # Serialize while ids/created_at are still loaded; commit expires them
+            "notification": notification_payload(notification) if notification is not None else None
+        })
+        outcomes.append(outcome)
+
+    db.commit()
+    return outcomes
@@ -16,13 +16,12 @@ from .routers import qr_router
 from .routers import account_qr_router
 from .routers import push_router
 from .routers import stats_router
-import threading
 import asyncio
 import json
 import os
 from dotenv import load_dotenv
 from .rabbitmq_ws_listener import rabbitmq_ws_listener
-from . import config
+from . import config, qr_utils, qr_renderer
 
 load_dotenv()
 
@@ -42,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth_router.router)
@@ -66,11 +66,23 @@ app.include_router(stats_router.router)
 
 @app.on_event("startup")
 async def start_background_tasks():
-    # Start WebSocket listener
-    thread = threading.Thread(
-        target=lambda: asyncio.run(rabbitmq_ws_listener()),
-        daemon=True
-    )
-    thread.start()
+    # Start WebSocket listener on this event loop (it owns the WebSocket objects)
+    app.state.ws_listener_task = asyncio.create_task(rabbitmq_ws_listener())
+
+    # Decode the QR logo and its per-size composites before the first QR request
+    qr_utils.preload_logo()
     
-    # stock streamer removed
\ No newline at end of file
+    # stock streamer removed
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    task = getattr(app.state, "ws_listener_task", None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    qr_renderer.shutdown()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy import DateTime, Text
 from datetime import datetime
@@ -65,6 +65,12 @@ class Account(Base):
     owner = relationship("User", back_populates="accounts", foreign_keys=[user_id])
     approver = relationship("User", foreign_keys=[approved_by])
 
+# Transaction.kind values of money moving between an account and the bank's own books rather
+# than between customers. They are recorded so balances can be derived from transactions
+# (statements), and left out of transfer listings and transaction statistics.
+BOOKKEEPING_KINDS = ("fd", "emi", "adjustment")
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
@@ -74,6 +80,7 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
     status = Column(String, default="PENDING")  # PENDING, SUCCESS, FAILED
     timestamp = Column(DateTime, default=datetime.utcnow)
+    kind = Column(String, nullable=False, default="transfer")  # transfer, loan, fd, emi, adjustment
     
     # Card-based transaction support - UNCOMMENT AFTER RUNNING fix_transactions_table.sql
     # src_card_id = Column(Integer, ForeignKey("cards.id"), nullable=True)  # Source card for card-to-account transfers
@@ -87,6 +94,12 @@ class Transaction(Base):
     # src_card_rel = relationship("Card", foreign_keys=[src_card_id])
     # dest_card_rel = relationship("Card", foreign_keys=[dest_card_id])
 
+    # Keyset pagination of an account's history walks these newest-first
+    __table_args__ = (
+        Index("ix_transactions_src_account_timestamp", "src_account", "timestamp", "id"),
+        Index("ix_transactions_dest_account_timestamp", "dest_account", "timestamp", "id"),
+    )
+
 
 class AuditLog(Base):
     __tablename__ = "auditlogs"
@@ -109,8 +122,10 @@ class FixedDeposit(Base):
     start_date = Column(Date, nullable=False)
     maturity_date = Column(Date, nullable=False)
     tenure_months = Column(Integer, nullable=False)
-    status = Column(String, default="ACTIVE")
+    status = Column(String, default="ACTIVE")  # ACTIVE, MATURED, RENEWED, CANCELLED
     maturity_amount = Column(Float, nullable=True)
+    auto_renew = Column(Boolean, default=False, nullable=False)  # Roll over into a new FD at maturity
+    matured_at = Column(DateTime, nullable=True)
     
     # Approval fields
     approval_status = Column(String, default="pending", nullable=False)  # 'pending', 'approved', 'rejected'
@@ -121,6 +136,11 @@ class FixedDeposit(Base):
     owner = relationship("User", back_populates="fixed_deposits", foreign_keys=[user_id])
     account = relationship("Account", foreign_keys=[account_id])
 
+    # The maturity engine walks ACTIVE deposits in maturity date order
+    __table_args__ = (
+        Index("ix_fixed_deposits_status_maturity_date", "status", "maturity_date", "id"),
+    )
+
 
 class Loan(Base):
     __tablename__ = "loans"
@@ -150,6 +170,43 @@ class Loan(Base):
     owner = relationship("User", back_populates="loans", foreign_keys=[user_id])
 
 
+class EmiRun(Base):
+    """One EMI auto-debit run (per due date), processed in loan id partitions (see app.emi)"""
+    __tablename__ = "emi_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_date = Column(Date, unique=True, nullable=False)
+    status = Column(String, nullable=False, default="running")  # 'running', 'completed'
+    total_loans = Column(Integer, nullable=False, default=0)
+    processed_count = Column(Integer, nullable=False, default=0)
+    debited_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    debited_amount = Column(Float, nullable=False, default=0.0)
+    partitions_total = Column(Integer, nullable=False, default=0)
+    partitions_done = Column(Integer, nullable=False, default=0)
+    # Bumped on every (re-)dispatch; only partitions of the current generation count as done
+    generation = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class EmiRunItem(Base):
+    """Outcome of one loan in an EMI run; a loan is debited at most once per run"""
+    __tablename__ = "emi_run_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("emi_runs.id"), nullable=False)
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=False)
+    status = Column(String, nullable=False)  # 'debited', 'insufficient_balance', 'account_not_found', 'error'
+    amount = Column(Float, nullable=False, default=0.0)
+    detail = Column(Text, nullable=True)
+    processed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("run_id", "loan_id", name="uq_emi_run_items_run_loan"),
+    )
+
+
 class Card(Base):
     __tablename__ = "cards"
 
@@ -208,4 +265,58 @@ class Notification(Base):
     from_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     user = relationship("User", foreign_keys=[user_id])
-    from_user = relationship("User", foreign_keys=[from_user_id])
\ No newline at end of file
+    from_user = relationship("User", foreign_keys=[from_user_id])
+
+    # A user's unread notifications newest first, and all of them newest first;
+    # the first index cannot serve the unfiltered listing in created_at order
+    __table_args__ = (
+        Index("ix_notifications_user_id_is_read_created_at", "user_id", "is_read", "created_at"),
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+    )
+
+
+class NotificationBroadcast(Base):
+    """An admin broadcast to every customer, fanned out in chunks by a Celery job"""
+    __tablename__ = "notification_broadcasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    type = Column(String, nullable=False, default="general")
+    from_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    status = Column(String, nullable=False, default="queued")  # 'queued', 'running', 'completed', 'failed'
+    total_recipients = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    last_user_id = Column(Integer, nullable=False, default=0)  # Resume point: recipients are processed in user id order
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class NotificationCounter(Base):
+    """Per-user notification totals, kept in step with the notifications table (see app.notification_counters)"""
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_count = Column(Integer, nullable=False, default=0)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StatCounter(Base):
+    """Running totals behind /admin/stats (maintained when ADMIN_STATS_COUNTERS is on)"""
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TransactionDailyRollup(Base):
+    """Settled transaction count and amount per UTC day (see app.rollups)"""
+    __tablename__ = "transaction_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    transaction_count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
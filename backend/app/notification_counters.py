@@ -0,0 +1,248 @@
+"""
+notification_counters.py
+
+Per-user notification totals behind /api/notifications/stats.
+
+notification_counters holds (total_count, unread_count) per user. An
+after_flush hook turns every ORM insert, delete and is_read change of a
+Notification into one multi-row INSERT ... ON CONFLICT DO UPDATE of the
+affected counters, in the same transaction as the change. Bulk statements
+that bypass the ORM (mark-all-read, admin broadcasts) call apply() instead.
+
+Reads are served from an in-process cache (NOTIFICATION_STATS_CACHE_TTL),
+but only for users with a socket on this process: every event addressed to
+them then passes through this process's WS listener, which refreshes the
+entry from "notification.stats" pushes and drops it when it delivers a new
+notification (single or fanned out) that was committed elsewhere, e.g. in
+a Celery worker. Other users are read from the counter row every time.
+After a commit that marked notifications read or deleted them, the new
+figures are pushed to the user's sockets as a "notification.stats" event;
+new notifications are already pushed one by one and counted by the client.
+
+A user without a counter row has no notifications. Existing databases
+need a backfill once:
+    python -m app.notification_counters rebuild
+"""
+import argparse
+import asyncio
+import itertools
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import select, func, case, event, inspect
+from sqlalchemy.orm import Session
+from .database import SessionLocal, dialect_insert, defer_until_commit, discard_rolled_back, take_committed
+from .models import Notification, NotificationCounter
+from . import config, rabbitmq
+
+_lock = threading.Lock()
+_cache: dict = {}
+
+# session.info key: {user_id: (sequence, (total_count, unread_count), push)} to publish on commit
+_PENDING = "notification_counters"
+_sequence = itertools.count()
+
+
+def remember(user_id: int, total_count: int, unread_count: int):
+    """Cache a user's figures (after a change made or delivered by this process)"""
+    if config.NOTIFICATION_STATS_CACHE_TTL > 0:
+        with _lock:
+            _cache[user_id] = (time.monotonic() + config.NOTIFICATION_STATS_CACHE_TTL, total_count, unread_count)
+
+
+def forget(user_id: int):
+    """Drop a user's cached figures (a notification was added by another process)"""
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def get(db: Session, user_id: int) -> tuple:
+    """(total_count, unread_count) for a user, from the cache or a primary-key lookup"""
+    from .websocket_manager import manager
+
+    with _lock:
+        entry = _cache.get(user_id)
+    # Without a socket here, changes made by other processes never reach this cache
+    if entry and entry[0] > time.monotonic() and user_id in manager.user_connections:
+        return entry[1], entry[2]
+
+    row = db.query(NotificationCounter.total_count, NotificationCounter.unread_count) \
+        .filter(NotificationCounter.user_id == user_id).first()
+    total_count, unread_count = (row.total_count, row.unread_count) if row else (0, 0)
+    remember(user_id, total_count, unread_count)
+    return total_count, unread_count
+
+
+def _upsert(connection, deltas: dict) -> dict:
+    now = datetime.utcnow()
+    stmt = dialect_insert(connection)(NotificationCounter.__table__).values([
+        {"user_id": user_id, "total_count": total, "unread_count": unread, "updated_at": now}
+        # Always in user order so concurrent writers lock counter rows in the same order
+        for user_id, (total, unread) in sorted(deltas.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "total_count": NotificationCounter.total_count + stmt.excluded.total_count,
+            "unread_count": NotificationCounter.unread_count + stmt.excluded.unread_count,
+            "updated_at": now
+        }
+    ).returning(NotificationCounter.user_id, NotificationCounter.total_count, NotificationCounter.unread_count)
+    return {row.user_id: (row.total_count, row.unread_count) for row in connection.execute(stmt)}
+
+
+def _merge(pending: dict, updated: dict) -> dict:
+    # The latest figures win; a push requested by any change is kept
+    merged = dict(pending)
+    for user_id, (sequence, figures, push) in updated.items():
+        previous = merged.get(user_id)
+        if previous is not None and previous[0] > sequence:
+            sequence, figures = previous[0], previous[1]
+        merged[user_id] = (sequence, figures, push or (previous is not None and previous[2]))
+    return merged
+
+
+def _record(session: Session, updated: dict, push: bool):
+    sequence = next(_sequence)
+    defer_until_commit(session, _PENDING, {
+        user_id: (sequence, figures, push) for user_id, figures in updated.items()
+    }, _merge)
+
+
+def apply(db: Session, deltas: dict, push: bool = True):
+    """
+    Add {user_id: (total_delta, unread_delta)} to the counters in one statement,
+    as part of the caller's transaction. With `push`, the new figures are sent
+    to the users' sockets once the transaction commits.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta)}
+    if deltas:
+        _record(db, _upsert(db.connection(), deltas), push)
+
+
+# --- ORM hooks ---------------------------------------------------------------
+
+def _unread(notification: Notification, previous: bool = False) -> int:
+    if previous:
+        history = inspect(notification).attrs.is_read.history
+        if history.deleted:
+            return int(not history.deleted[0])
+    # is_read defaults to False and is only filled in at INSERT time
+    return int(not notification.is_read)
+
+
+def _track_counters(session: Session, flush_context):
+    """after_flush hook: new/dirty/deleted still describe what was just written"""
+    deltas, push = {}, False
+
+    def add(user_id, total, unread):
+        current = deltas.get(user_id, (0, 0))
+        deltas[user_id] = (current[0] + total, current[1] + unread)
+
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            add(obj.user_id, 1, _unread(obj))
+
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            add(obj.user_id, -1, -_unread(obj, previous=True))
+            push = True
+
+    for obj in session.dirty:
+        if isinstance(obj, Notification) and inspect(obj).attrs.is_read.history.has_changes():
+            add(obj.user_id, 0, _unread(obj) - _unread(obj, previous=True))
+            push = True
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if any(delta)}
+    if deltas:
+        _record(session, _upsert(session.connection(), deltas), push)
+
+
+async def _push_async(user_id: int, event: dict):
+    from .rabbitmq_ws_listener import publish_user_event
+    from .websocket_manager import manager
+
+    try:
+        if not await publish_user_event(user_id, event):
+            await manager.send_personal_message(event, user_id)
+    except Exception as e:
+        print(f"Failed to push notification stats to user {user_id}: {e}")
+
+
+def _publish(session: Session):
+    """after_commit hook: only once the outermost transaction has committed"""
+    pending = {}
+    for committed in take_committed(session, _PENDING):
+        pending = _merge(pending, committed)
+    if not pending:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    for user_id, (_, (total_count, unread_count), push) in pending.items():
+        remember(user_id, total_count, unread_count)
+        if not push:
+            continue
+        event = {"type": "notification.stats", "data": {"total_count": total_count, "unread_count": unread_count}}
+        if loop is not None:
+            # Committed from an async endpoint: publish on the event loop, never block it
+            loop.create_task(_push_async(user_id, event))
+        else:
+            try:
+                rabbitmq.publish_user_event(user_id, event)
+            except Exception as e:
+                print(f"Failed to push notification stats to user {user_id}: {e}")
+
+
+def _discard(session: Session, previous_transaction):
+    discard_rolled_back(session, _PENDING, previous_transaction)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+event.listen(Session, "after_flush", _track_counters)
+event.listen(Session, "after_commit", _publish)
+event.listen(Session, "after_soft_rollback", _discard)
+# Assigning an expired is_read normally skips loading its old value; the counters need it
+event.listen(Notification.is_read, "set", _keep_previous_value, active_history=True)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every counter from the notifications table"""
+    db.query(NotificationCounter).delete(synchronize_session=False)
+    totals = select(
+        Notification.user_id,
+        func.count(Notification.id),
+        func.count(case((Notification.is_read.isnot(True), 1))),
+        func.now()
+    ).group_by(Notification.user_id)
+    db.execute(NotificationCounter.__table__.insert().from_select(
+        ["user_id", "total_count", "unread_count", "updated_at"], totals
+    ))
+    db.commit()
+    with _lock:
+        _cache.clear()
+    return db.query(NotificationCounter).count()
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Notification counter tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recompute every user's notification counters")
+    parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild(db)
+        print(f"Rebuilt notification_counters: {rebuilt} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,95 @@
+"""
+qr_renderer.py
+
+Shared process pool for rendering QR codes.
+
+qrcode/PIL rendering is CPU-bound and holds the GIL, so rendering several
+codes in a request handler serializes them and ties up a threadpool worker.
+render_many() looks every code up in the qr_utils cache first and submits
+only the misses to a ProcessPoolExecutor of QR_RENDER_WORKERS processes
+(spawned, each with the logo preloaded), yielding results as they finish.
+A single miss is rendered in place, where the round trip to a worker would
+cost more than it saves. With QR_RENDER_WORKERS=0, or if the pool breaks,
+everything is rendered in the calling thread.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from . import config, qr_utils
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if config.QR_RENDER_WORKERS <= 0:
+        return None
+    with _lock:
+        if _executor is None:
+            # spawn, not fork: the API process runs event loop and broker threads
+            _executor = ProcessPoolExecutor(
+                max_workers=config.QR_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=qr_utils.preload_logo
+            )
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _discard_broken(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_many(contents: dict):
+    """
+    Render {key: qr_content}. Yields (key, png, digest) as each image becomes
+    available: cache hits first, then renders in completion order.
+    """
+    misses = {}
+    for key, content in contents.items():
+        digest = qr_utils.qr_digest(content)
+        png = qr_utils.cached_qr_image(digest)
+        if png is not None:
+            yield key, png, digest
+        else:
+            misses[key] = (content, digest)
+
+    executor = _get_executor() if len(misses) > 1 else None
+    if executor is not None:
+        try:
+            futures = {
+                executor.submit(qr_utils.render_qr_png, content): (key, digest)
+                for key, (content, digest) in misses.items()
+            }
+            for future in as_completed(futures):
+                key, digest = futures[future]
+                png = future.result()
+                qr_utils.store_qr_image(digest, png)
+                misses.pop(key)
+                yield key, png, digest
+        except BrokenProcessPool as e:
+            print(f"QR render pool failed, rendering in-process: {e}")
+            _discard_broken(executor)
+
+    for key, (content, digest) in misses.items():
+        png = qr_utils.render_qr_png(content)
+        qr_utils.store_qr_image(digest, png)
+        yield key, png, digest
+
+
+def render_all(contents: dict) -> dict:
+    """{key: png} for every entry of `contents`, rendered concurrently"""
+    return {key: png for key, png, _ in render_many(contents)}
@@ -1,11 +1,146 @@
 import qrcode
 import io
 import base64
-from typing import Union
+from typing import Union, Optional, Tuple
 import hashlib
+import hmac
 import json
+import threading
+import time
+from collections import OrderedDict
+from xml.sax.saxutils import quoteattr
+from fastapi import Request, Response
 from PIL import Image, ImageDraw
 import os
+from . import config
+
+# Logo path (adjust based on your project structure)
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "public", "logo.png")
+
+# The logo is decoded once and kept in memory together with its padded composite for
+# every QR width produced so far. The file's mtime/size is re-checked at most every
+# QR_LOGO_RELOAD_INTERVAL seconds; a changed file is decoded again and its composites
+# rebuilt (and, through the digest, every cached QR image goes stale).
+_logo_lock = threading.Lock()
+_logo_state = {"signature": None, "image": None, "composites": {}, "svg_href": None, "checked_at": 0.0}
+
+def _stat_logo() -> str:
+    try:
+        stat = os.stat(LOGO_PATH)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+    except OSError:
+        return "none"
+
+def reload_logo(force: bool = False) -> bool:
+    """Decode the logo again if the file changed (or `force`). Returns True when reloaded."""
+    signature = _stat_logo()
+    with _logo_lock:
+        _logo_state["checked_at"] = time.monotonic()
+        if not force and signature == _logo_state["signature"]:
+            return False
+
+    image = None
+    if signature != "none":
+        try:
+            with Image.open(LOGO_PATH) as logo:
+                logo.load()
+                image = logo.copy()
+        except Exception as e:
+            print(f"Error loading QR logo: {e}")
+
+    with _logo_lock:
+        _logo_state.update(signature=signature, image=image, composites={}, svg_href=None)
+    return True
+
+def _current_logo() -> tuple:
+    """(signature, decoded logo or None), reloading it when the file changed"""
+    with _logo_lock:
+        fresh = time.monotonic() - _logo_state["checked_at"] < config.QR_LOGO_RELOAD_INTERVAL
+        if fresh and _logo_state["signature"] is not None:
+            return _logo_state["signature"], _logo_state["image"]
+    reload_logo()
+    with _logo_lock:
+        return _logo_state["signature"], _logo_state["image"]
+
+def _build_logo_composite(logo: Image.Image, qr_width: int) -> Image.Image:
+    # Calculate logo size (15% of QR code size for better scanning)
+    logo = logo.copy()
+    logo_max_size = int(qr_width * 0.15)  # 15% of QR size (reduced from 20%)
+    
+    # Resize logo maintaining aspect ratio
+    logo.thumbnail((logo_max_size, logo_max_size), Image.Resampling.LANCZOS)
+    
+    # Create a white background with padding (adds white border around logo)
+    logo_width, logo_height = logo.size
+    padding = int(logo_max_size * 0.20)  # 20% padding (increased from 15%)
+    
+    background_size = logo_width + (padding * 2)
+    background = Image.new('RGB', (background_size, background_size), 'white')
+    
+    # Paste logo onto white background
+    logo_pos = (padding, padding)
+    if logo.mode == 'RGBA':
+        background.paste(logo, logo_pos, logo)
+    else:
+        background.paste(logo, logo_pos)
+    return background
+
+def _logo_composite(qr_width: int) -> Optional[Image.Image]:
+    """Padded logo for a QR code `qr_width` pixels wide, built once per width"""
+    signature, logo = _current_logo()
+    if logo is None:
+        return None
+
+    with _logo_lock:
+        composite = _logo_state["composites"].get(qr_width)
+    if composite is not None:
+        return composite
+
+    composite = _build_logo_composite(logo, qr_width)
+    with _logo_lock:
+        # Only keep it if the logo was not swapped meanwhile
+        if _logo_state["signature"] == signature:
+            _logo_state["composites"][qr_width] = composite
+    return composite
+
+# Pixel size of the logo embedded in SVG codes: the logo covers about 15% of a 450-650px code
+SVG_LOGO_SIZE = 96
+
+def _svg_logo_href() -> Optional[str]:
+    """The logo as a PNG data URI for SVG codes, encoded once per logo file"""
+    signature, logo = _current_logo()
+    if logo is None:
+        return None
+
+    with _logo_lock:
+        href = _logo_state["svg_href"]
+    if href is not None:
+        return href
+
+    logo = logo.copy()
+    logo.thumbnail((SVG_LOGO_SIZE, SVG_LOGO_SIZE), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    logo.save(buffer, format="PNG", optimize=True)
+    href = png_data_uri(buffer.getvalue())
+    with _logo_lock:
+        if _logo_state["signature"] == signature:
+            _logo_state["svg_href"] = href
+    return href
+
+def qr_image_width(version: int) -> int:
+    """Pixel width of a rendered QR code of the given version (box_size 10, border 4)"""
+    return (17 + 4 * version + 2 * 4) * 10
+
+# Payment URLs (roughly 110-240 characters at error correction H) fit QR versions 9-16;
+# other widths still get their composite built on first use
+PRELOAD_QR_VERSIONS = range(9, 17)
+
+def preload_logo(versions: range = PRELOAD_QR_VERSIONS):
+    """Decode the logo and pre-render its composites for the QR versions payment URLs use"""
+    reload_logo(force=True)
+    for version in versions:
+        _logo_composite(qr_image_width(version))
+    _svg_logo_href()
 
 def add_logo_to_qr(qr_image: Image.Image) -> Image.Image:
     """
@@ -17,39 +152,14 @@ def add_logo_to_qr(qr_image: Image.Image) -> Image.Image:
     Returns:
         QR code with logo embedded
     """
-    # Get logo path (adjust based on your project structure)
-    logo_path = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "public", "logo.png")
-    
-    # Check if logo exists
-    if not os.path.exists(logo_path):
-        return qr_image  # Return original QR if logo not found
-    
     try:
-        # Open logo
-        logo = Image.open(logo_path)
-        
-        # Calculate logo size (15% of QR code size for better scanning)
         qr_width, qr_height = qr_image.size
-        logo_max_size = int(qr_width * 0.15)  # 15% of QR size (reduced from 20%)
-        
-        # Resize logo maintaining aspect ratio
-        logo.thumbnail((logo_max_size, logo_max_size), Image.Resampling.LANCZOS)
-        
-        # Create a white background with padding (adds white border around logo)
-        logo_width, logo_height = logo.size
-        padding = int(logo_max_size * 0.20)  # 20% padding (increased from 15%)
-        
-        background_size = logo_width + (padding * 2)
-        background = Image.new('RGB', (background_size, background_size), 'white')
-        
-        # Paste logo onto white background
-        logo_pos = (padding, padding)
-        if logo.mode == 'RGBA':
-            background.paste(logo, logo_pos, logo)
-        else:
-            background.paste(logo, logo_pos)
+        background = _logo_composite(qr_width)
+        if background is None:
+            return qr_image  # Return original QR if logo not found
         
         # Calculate position to center the logo (avoiding the 3 corner squares)
+        background_size = background.size[0]
         logo_position = (
             (qr_width - background_size) // 2,
             (qr_height - background_size) // 2
@@ -64,35 +174,8 @@ def add_logo_to_qr(qr_image: Image.Image) -> Image.Image:
         print(f"Error adding logo to QR: {e}")
         return qr_image  # Return original QR if error occurs
 
-def generate_user_qr_code(user_id: int, user_data: dict = None, base_url: str = "http://localhost:3000") -> str:
-    """
-    Generate a unique QR code for a user that contains a payment URL.
-    When scanned, it redirects to the payment page.
-    
-    Args:
-        user_id: The user's unique ID
-        user_data: Optional dictionary with user info like name, email etc.
-        base_url: Base URL of the frontend application
-    
-    Returns:
-        Base64 encoded PNG image of the QR code
-    """
-    # Generate secure hash for the user
-    user_hash = generate_user_qr_hash(user_id)
-    
-    # Create payment URL that works with external scanners
-    payment_url = f"{base_url}/pay?to={user_id}&hash={user_hash}"
-    
-    # Add user info as URL parameters for better UX
-    if user_data:
-        if user_data.get("username"):
-            payment_url += f"&username={user_data['username']}"
-        if user_data.get("full_name"):
-            payment_url += f"&name={user_data['full_name'].replace(' ', '%20')}"
-    
-    # QR content is now a simple URL
-    qr_content = payment_url
-    
+def render_qr_png(qr_content: str) -> bytes:
+    """Render `qr_content` as a PNG QR code with the logo in the middle"""
     # Create QR code with HIGH error correction for logo embedding
     qr = qrcode.QRCode(
         version=1,  # Controls size, 1 is smallest
@@ -113,20 +196,275 @@ def generate_user_qr_code(user_id: int, user_data: dict = None, base_url: str =
     # Add logo to center of QR code
     qr_image = add_logo_to_qr(qr_image)
     
-    # Convert to base64 string
     img_buffer = io.BytesIO()
     qr_image.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
+    return img_buffer.getvalue()
+
+def _qr_matrix(qr_content: str) -> list:
+    # Same parameters as render_qr_png, so both formats encode the same symbol
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(qr_content)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+def render_qr_svg(qr_content: str, logo_href: Optional[str] = None) -> bytes:
+    """
+    Render `qr_content` as an SVG QR code, without PIL.
+    
+    Dark modules are one stroked path (an "h" segment per horizontal run), in
+    module units scaled to the same pixel size as the PNG. The logo sits on
+    the same padded white square as in the PNG, as an <image> embedding the
+    preloaded logo as a data URI (`logo_href` overrides it): SVGs shown
+    through <img> or a data URI never load external resources. Without a
+    logo the code is rendered without the square.
+    """
+    if logo_href is None:
+        logo_href = _svg_logo_href()
+    matrix = _qr_matrix(qr_content)
+    size = len(matrix)  # modules, border included
+    
+    # Each row is one subpath: a relative move over every light gap and an "h"
+    # for every dark run, stroked 1 module wide along the row's middle
+    path = []
+    for y, row in enumerate(matrix):
+        segments, x = [], 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            run = x
+            while run < size and row[run]:
+                run += 1
+            segments.append((x, run - x))
+            x = run
+        if not segments:
+            continue
+        end = segments[0][0]
+        path.append(f"M{end} {y}.5")
+        for start, length in segments:
+            if start != end:
+                path.append(f"m{start - end} 0")
+            path.append(f"h{length}")
+            end = start + length
+    
+    # Logo square sized like add_logo_to_qr: 15% of the width plus 20% padding
+    pixels = size * 10
+    logo_size = int(pixels * 0.15)
+    padding = int(logo_size * 0.20)
+    background_size = (logo_size + padding * 2) / 10
+    background_pos = (size - background_size) / 2
+    logo_pos = background_pos + padding / 10
+    
+    logo = ""
+    if logo_href:
+        logo = (
+            f'<rect x="{background_pos:g}" y="{background_pos:g}" width="{background_size:g}" height="{background_size:g}" fill="#fff"/>'
+            f'<image href={quoteattr(logo_href)} x="{logo_pos:g}" y="{logo_pos:g}" '
+            f'width="{logo_size / 10:g}" height="{logo_size / 10:g}" preserveAspectRatio="xMidYMid meet"/>'
+        )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'viewBox="0 0 {size} {size}" width="{pixels}" height="{pixels}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path fill="none" stroke="#000" stroke-width="1" d="{"".join(path)}"/>'
+        f'{logo}'
+        f'</svg>'
+    ).encode("utf-8")
+
+# Rendered QR images are a pure function of their content (and the logo), so they are
+# cached by digest: a bounded in-process LRU in front of a directory shared by all
+# API processes. Bump QR_RENDER_VERSION when the rendering itself changes.
+QR_RENDER_VERSION = "1"
+_qr_cache_lock = threading.Lock()
+_qr_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+def qr_digest(qr_content: str) -> str:
+    """Cache key and ETag of the QR image for `qr_content`"""
+    key = f"{QR_RENDER_VERSION}|{_current_logo()[0]}|{qr_content}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _remember_qr(digest: str, image: bytes):
+    if config.QR_CACHE_SIZE <= 0:
+        return
+    with _qr_cache_lock:
+        _qr_cache[digest] = image
+        _qr_cache.move_to_end(digest)
+        while len(_qr_cache) > config.QR_CACHE_SIZE:
+            _qr_cache.popitem(last=False)
+
+# Signed codes change every token period, so without pruning the directory only grows
+QR_CACHE_PRUNE_INTERVAL = 60
+_prune_lock = threading.Lock()
+_prune_state = {"pruned_at": 0.0}
+
+def prune_disk_cache() -> int:
+    """Enforce the QR_CACHE_DIR age and size bounds. Returns the number of files removed."""
+    if not config.QR_CACHE_DIR:
+        return 0
+    cutoff = time.time() - config.QR_CACHE_DIR_MAX_AGE_DAYS * 86400
+    files, removed = [], 0
+    try:
+        entries = list(os.scandir(config.QR_CACHE_DIR))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            mtime = entry.stat().st_mtime
+            # Leftover temp files of interrupted writes are never read
+            if mtime < cutoff or (entry.name.endswith(".tmp") and mtime < time.time() - 3600):
+                os.remove(entry.path)
+                removed += 1
+            elif not entry.name.endswith(".tmp"):
+                files.append((mtime, entry.path))
+        except OSError:
+            continue
+    if config.QR_CACHE_DIR_MAX_FILES > 0 and len(files) > config.QR_CACHE_DIR_MAX_FILES:
+        files.sort()
+        for _, path in files[:len(files) - config.QR_CACHE_DIR_MAX_FILES]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+    return removed
+
+def _maybe_prune_disk_cache():
+    with _prune_lock:
+        now = time.monotonic()
+        if now - _prune_state["pruned_at"] < QR_CACHE_PRUNE_INTERVAL:
+            return
+        _prune_state["pruned_at"] = now
+    removed = prune_disk_cache()
+    if removed:
+        print(f"Pruned {removed} QR cache files")
+
+def _read_disk_cache(digest: str, ext: str) -> Optional[bytes]:
+    if not config.QR_CACHE_DIR:
+        return None
+    path = os.path.join(config.QR_CACHE_DIR, f"{digest}.{ext}")
+    try:
+        with open(path, "rb") as f:
+            image = f.read()
+        # Codes still being served keep a fresh mtime and outlive the pruning
+        os.utime(path)
+        return image
+    except OSError:
+        return None
+
+def _write_disk_cache(digest: str, image: bytes, ext: str):
+    if not config.QR_CACHE_DIR:
+        return
+    try:
+        os.makedirs(config.QR_CACHE_DIR, exist_ok=True)
+        path = os.path.join(config.QR_CACHE_DIR, f"{digest}.{ext}")
+        # Write then rename, so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write QR cache file: {e}")
+        return
+    _maybe_prune_disk_cache()
+
+def cached_qr_image(digest: str, ext: str = "png") -> Optional[bytes]:
+    """Image for `digest` from the memory or disk cache, None if it was never rendered"""
+    with _qr_cache_lock:
+        image = _qr_cache.get(digest)
+        if image is not None:
+            _qr_cache.move_to_end(digest)
+            return image
+
+    image = _read_disk_cache(digest, ext)
+    if image is not None:
+        _remember_qr(digest, image)
+    return image
+
+def store_qr_image(digest: str, image: bytes, ext: str = "png"):
+    _write_disk_cache(digest, image, ext)
+    _remember_qr(digest, image)
+
+def qr_png(qr_content: str) -> Tuple[bytes, str]:
+    """PNG bytes and digest of the QR code for `qr_content`, rendered at most once"""
+    digest = qr_digest(qr_content)
+    png = cached_qr_image(digest)
+    if png is None:
+        png = render_qr_png(qr_content)
+        store_qr_image(digest, png)
+    return png, digest
+
+def qr_svg(qr_content: str) -> Tuple[bytes, str]:
+    """SVG bytes and digest of the QR code for `qr_content`, rendered at most once"""
+    key = f"{QR_RENDER_VERSION}|svg|{_current_logo()[0]}|{qr_content}"
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    svg = cached_qr_image(digest, "svg")
+    if svg is None:
+        svg = render_qr_svg(qr_content)
+        store_qr_image(digest, svg, "svg")
+    return svg, digest
+
+def qr_code_value(qr_content: str, qr_format: str = "png") -> str:
+    """What QR endpoints return as "qr_code": a base64 PNG data URI, or the SVG markup itself"""
+    if qr_format == "svg":
+        svg, _ = qr_svg(qr_content)
+        return svg.decode("utf-8")
+    png, _ = qr_png(qr_content)
+    return png_data_uri(png)
+
+def png_data_uri(png: bytes) -> str:
+    return f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"
+
+def qr_image_response(request: Request, image: bytes, digest: str, media_type: str = "image/png") -> Response:
+    """Raw image response with ETag/Cache-Control; 304 when the client already has it"""
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={config.QR_CACHE_MAX_AGE}"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image, media_type=media_type, headers=headers)
+
+def build_user_qr_url(user_id: int, user_data: dict = None, base_url: str = "http://localhost:3000") -> str:
+    """Payment URL encoded in a user's QR code"""
+    # Generate signed token for the user
+    user_hash = generate_user_qr_token(user_id)
+    
+    # Create payment URL that works with external scanners
+    payment_url = f"{base_url}/pay?to={user_id}&hash={user_hash}"
+    
+    # Add user info as URL parameters for better UX
+    if user_data:
+        if user_data.get("username"):
+            payment_url += f"&username={user_data['username']}"
+        if user_data.get("full_name"):
+            payment_url += f"&name={user_data['full_name'].replace(' ', '%20')}"
+    
+    return payment_url
+
+def generate_user_qr_code(user_id: int, user_data: dict = None, base_url: str = "http://localhost:3000", qr_format: str = "png") -> str:
+    """
+    Generate a unique QR code for a user that contains a payment URL.
+    When scanned, it redirects to the payment page.
     
-    # Encode to base64
-    img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+    Args:
+        user_id: The user's unique ID
+        user_data: Optional dictionary with user info like name, email etc.
+        base_url: Base URL of the frontend application
+        qr_format: "png" or "svg"
     
-    return f"data:image/png;base64,{img_base64}"
+    Returns:
+        Base64 encoded PNG image of the QR code, or the SVG markup
+    """
+    return qr_code_value(build_user_qr_url(user_id, user_data, base_url), qr_format)
 
 def generate_user_qr_hash(user_id: int) -> str:
     """
     Generate a consistent hash for the user that can be used as QR identifier.
     This will always produce the same hash for the same user_id.
+    Legacy: new QR codes carry a signed token (generate_user_qr_token).
     
     Args:
         user_id: The user's unique ID
@@ -157,21 +495,10 @@ def verify_qr_code(qr_data: str, expected_user_id: int) -> bool:
     except (json.JSONDecodeError, KeyError):
         return False
 
-def generate_account_qr_code(account_id: int, account_data: dict = None, base_url: str = "http://localhost:3000") -> str:
-    """
-    Generate a unique QR code for a bank account (similar to UPI).
-    Each account gets its own QR code for receiving payments.
-    
-    Args:
-        account_id: The account's unique ID
-        account_data: Optional dictionary with account info
-        base_url: Base URL of the frontend application
-    
-    Returns:
-        Base64 encoded PNG image of the QR code
-    """
-    # Generate secure hash for the account
-    account_hash = generate_account_qr_hash(account_id)
+def build_account_qr_url(account_id: int, account_data: dict = None, base_url: str = "http://localhost:3000") -> str:
+    """Payment URL encoded in an account's QR code"""
+    # Generate signed token for the account
+    account_hash = generate_account_qr_token(account_id)
     
     # Create payment URL that works with external scanners
     payment_url = f"{base_url}/pay?account={account_id}&hash={account_hash}"
@@ -185,43 +512,29 @@ def generate_account_qr_code(account_id: int, account_data: dict = None, base_ur
         if account_data.get("account_type"):
             payment_url += f"&type={account_data['account_type']}"
     
-    # QR content is the payment URL
-    qr_content = payment_url
-    
-    # Create QR code with HIGH error correction for logo embedding
-    qr = qrcode.QRCode(
-        version=1,  # Controls size
-        error_correction=qrcode.constants.ERROR_CORRECT_H,  # HIGH error correction (30% damage tolerance)
-        box_size=10,  # Size of each box in pixels
-        border=4,  # Border size in boxes
-    )
-    
-    qr.add_data(qr_content)
-    qr.make(fit=True)
-    
-    # Create image
-    qr_image = qr.make_image(
-        fill_color="black",
-        back_color="white"
-    ).convert('RGB')
-    
-    # Add logo to center of QR code
-    qr_image = add_logo_to_qr(qr_image)
-    
-    # Convert to base64 string
-    img_buffer = io.BytesIO()
-    qr_image.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
+    return payment_url
+
+def generate_account_qr_code(account_id: int, account_data: dict = None, base_url: str = "http://localhost:3000", qr_format: str = "png") -> str:
+    """
+    Generate a unique QR code for a bank account (similar to UPI).
+    Each account gets its own QR code for receiving payments.
     
-    # Encode to base64
-    img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+    Args:
+        account_id: The account's unique ID
+        account_data: Optional dictionary with account info
+        base_url: Base URL of the frontend application
+        qr_format: "png" or "svg"
     
-    return f"data:image/png;base64,{img_base64}"
+    Returns:
+        Base64 encoded PNG image of the QR code, or the SVG markup
+    """
+    return qr_code_value(build_account_qr_url(account_id, account_data, base_url), qr_format)
 
 def generate_account_qr_hash(account_id: int) -> str:
     """
     Generate a consistent hash for an account that can be used as QR identifier.
     This will always produce the same hash for the same account_id.
+    Legacy: new QR codes carry a signed token (generate_account_qr_token).
     
     Args:
         account_id: The account's unique ID
@@ -233,4 +546,72 @@ def generate_account_qr_hash(account_id: int) -> str:
     salt = "nyord_account_qr_2024"
     data = f"{salt}_{account_id}_{salt}"
     
-    return hashlib.sha256(data.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(data.encode()).hexdigest()
+
+# Signed QR tokens: "<type>.<id>.<expires>.<signature>", where type is "u" (user) or
+# "a" (account), expires is a unix timestamp and the signature is the first 128 bits
+# of HMAC-SHA256(QR_SIGNING_KEY, "<type>.<id>.<expires>"), base64url. Verifying one
+# needs no database access. Expiry is rounded to QR_TOKEN_TTL_DAYS periods, so a
+# code (and its cached image) stays the same for a whole period and is always valid
+# for at least one more.
+QR_TOKEN_USER = "u"
+QR_TOKEN_ACCOUNT = "a"
+
+def _qr_token_signature(payload: str) -> str:
+    digest = hmac.new(config.QR_SIGNING_KEY.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).decode().rstrip("=")
+
+def _qr_token_expiry(now: float = None) -> int:
+    period = max(config.QR_TOKEN_TTL_DAYS, 1) * 86400
+    now = time.time() if now is None else now
+    return (int(now) // period + 2) * period
+
+def generate_qr_token(token_type: str, subject_id: int, expires: int = None) -> str:
+    payload = f"{token_type}.{int(subject_id)}.{expires or _qr_token_expiry()}"
+    return f"{payload}.{_qr_token_signature(payload)}"
+
+def generate_user_qr_token(user_id: int) -> str:
+    """Signed QR token identifying a user"""
+    return generate_qr_token(QR_TOKEN_USER, user_id)
+
+def generate_account_qr_token(account_id: int) -> str:
+    """Signed QR token identifying an account"""
+    return generate_qr_token(QR_TOKEN_ACCOUNT, account_id)
+
+def verify_qr_token(token: str) -> Optional[Tuple[str, int]]:
+    """(type, id) of a valid, unexpired token, else None. No database access."""
+    try:
+        token_type, subject_id, expires, signature = token.split(".")
+        payload = f"{token_type}.{subject_id}.{expires}"
+        if not hmac.compare_digest(signature, _qr_token_signature(payload)):
+            return None
+        if int(expires) < time.time():
+            return None
+        return token_type, int(subject_id)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def _verify_qr_hash(token_type: str, subject_id: int, qr_hash: str, legacy_hash) -> bool:
+    if not qr_hash:
+        return False
+    if "." in qr_hash:
+        return verify_qr_token(qr_hash) == (token_type, int(subject_id))
+    # Codes issued before signed tokens carry the plain SHA256 hash, which anyone can compute
+    if not config.QR_ACCEPT_LEGACY_HASH:
+        return False
+    try:
+        accepted = hmac.compare_digest(qr_hash, legacy_hash(subject_id))
+    except TypeError:
+        return False
+    if accepted:
+        print(f"WARNING: accepted legacy unsigned QR hash for {token_type}.{subject_id} (QR_ACCEPT_LEGACY_HASH)")
+    return accepted
+
+def verify_user_qr_hash(user_id: int, qr_hash: str) -> bool:
+    """Whether the hash/token scanned from a user QR code belongs to `user_id`"""
+    return _verify_qr_hash(QR_TOKEN_USER, user_id, qr_hash, generate_user_qr_hash)
+
+def verify_account_qr_hash(account_id: int, qr_hash: str) -> bool:
+    """Whether the hash/token scanned from an account QR code belongs to `account_id`"""
+    return _verify_qr_hash(QR_TOKEN_ACCOUNT, account_id, qr_hash, generate_account_qr_hash)
+
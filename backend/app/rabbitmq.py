@@ -1,23 +1,226 @@
 import pika
 import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from pika.exceptions import AMQPConnectionError, AMQPChannelError, StreamLostError
+from . import config
 
-def publish_event(queue_name: str, payload: dict):
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters("localhost")
-    )
-    channel = connection.channel()
+# Topic exchange for real-time WebSocket events. Routing keys are "user.<id>" for a
+# single user's sockets, "admin" for admin dashboards and "fanout" for events that
+# address many users at once (every API process delivers to the ones it holds).
+WS_EXCHANGE = "ws_user_events"
+WS_ADMIN_ROUTING_KEY = "admin"
+WS_FANOUT_ROUTING_KEY = "fanout"
+
+# Failures that mean the pooled connection is gone and the publish should be retried on a fresh one
+_RECONNECT_ERRORS = (AMQPConnectionError, AMQPChannelError, StreamLostError, ConnectionError)
+
+
+class _PooledChannel:
+    """A broker connection with a single (optionally confirm-mode) channel and the declarations made on it"""
+
+    def __init__(self, host: str, confirms: bool):
+        self.connection = pika.BlockingConnection(pika.ConnectionParameters(host))
+        self.channel = self.connection.channel()
+        if confirms:
+            self.channel.confirm_delivery()
+        self.declared = set()
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection.is_open and self.channel.is_open
+
+    def close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+
+class RabbitPublisher:
+    """
+    Process-wide RabbitMQ publisher.
+
+    Keeps up to `pool_size` long-lived connections around instead of doing a
+    TCP + AMQP handshake per message, declares each exchange/queue only once
+    per connection, waits for publisher confirms, and transparently retries a
+    publish once on a fresh connection if the pooled one has died.
+
+    `batch()` opens a batching window for the current thread: everything
+    published inside it is flushed together over one channel when it exits.
+    """
+
+    def __init__(self, host: str, pool_size: int = 4, confirms: bool = True):
+        self.host = host
+        self.pool_size = pool_size
+        self.confirms = confirms
+        self._pid = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_pool(self) -> queue.LifoQueue:
+        # Celery's prefork pool forks after import; never share sockets with the parent
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._pool = queue.LifoQueue(maxsize=self.pool_size)
+                    self._pid = pid
+        return self._pool
+
+    @contextmanager
+    def _checkout(self):
+        pool = self._get_pool()
+        try:
+            pooled = pool.get_nowait()
+            # Service heartbeats that piled up while the connection sat idle in the pool
+            pooled.connection.process_data_events(time_limit=0)
+        except queue.Empty:
+            pooled = _PooledChannel(self.host, self.confirms)
+        except _RECONNECT_ERRORS:
+            pooled.close()
+            pooled = _PooledChannel(self.host, self.confirms)
+
+        healthy = False
+        try:
+            yield pooled
+            healthy = True
+        finally:
+            if healthy and pooled.is_open:
+                try:
+                    pool.put_nowait(pooled)
+                except queue.Full:
+                    pooled.close()
+            else:
+                pooled.close()
+
+    @staticmethod
+    def _declare(pooled: _PooledChannel, exchange: str, exchange_type: str, queue_name: str):
+        if exchange and (exchange, exchange_type) not in pooled.declared:
+            pooled.channel.exchange_declare(exchange=exchange, exchange_type=exchange_type, durable=True)
+            pooled.declared.add((exchange, exchange_type))
+        if queue_name and queue_name not in pooled.declared:
+            pooled.channel.queue_declare(queue=queue_name, durable=True)
+            pooled.declared.add(queue_name)
 
-    channel.queue_declare(queue=queue_name, durable=True)
+    def _publish_many(self, messages: list):
+        if not messages:
+            return
 
-    message = json.dumps(payload)
+        # Messages handed to basic_publish without an error (confirmed, in confirm mode)
+        # are never sent again; a retry resumes with the one that failed
+        sent = 0
+        for attempt in range(2):
+            try:
+                with self._checkout() as pooled:
+                    for exchange, exchange_type, routing_key, queue_name, body, properties in messages[sent:]:
+                        self._declare(pooled, exchange, exchange_type, queue_name)
+                        pooled.channel.basic_publish(
+                            exchange=exchange,
+                            routing_key=routing_key,
+                            body=body,
+                            properties=properties
+                        )
+                        sent += 1
+                return
+            except _RECONNECT_ERRORS as e:
+                if attempt:
+                    raise
+                print(f"RabbitMQ publish failed after {sent}/{len(messages)} messages ({e}), reconnecting…")
 
-    channel.basic_publish(
+    def publish(self, exchange: str, routing_key: str, payload: dict,
+                exchange_type: str = "fanout", queue_name: str = None, persistent: bool = False):
+        """Publish a JSON payload, or buffer it if a batching window is open on this thread"""
+        message = (
+            exchange,
+            exchange_type,
+            routing_key,
+            queue_name,
+            json.dumps(payload),
+            pika.BasicProperties(delivery_mode=2) if persistent else None
+        )
+
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            buffer.append(message)
+            return
+
+        self._publish_many([message])
+
+    def queue_stats(self, queue_names: list) -> list:
+        """Ready-message and consumer counts per queue (None for queues that do not exist yet)"""
+        stats = []
+        with self._checkout() as pooled:
+            for queue_name in queue_names:
+                # Passive declare on a throwaway channel: a missing queue only closes that channel
+                channel = pooled.connection.channel()
+                try:
+                    result = channel.queue_declare(queue=queue_name, passive=True)
+                    stats.append({"queue": queue_name, "depth": result.method.message_count,
+                                  "consumers": result.method.consumer_count})
+                    channel.close()
+                except AMQPChannelError:
+                    stats.append({"queue": queue_name, "depth": None, "consumers": None})
+        return stats
+
+    @contextmanager
+    def batch(self):
+        """Collect publishes from this thread and flush them together on exit (dropped on error)"""
+        if getattr(self._local, "buffer", None) is not None:
+            # Nested window: the outermost one flushes
+            yield
+            return
+
+        self._local.buffer = []
+        try:
+            yield
+            messages = self._local.buffer
+        finally:
+            self._local.buffer = None
+
+        self._publish_many(messages)
+
+
+publisher = RabbitPublisher(
+    config.RABBITMQ_HOST,
+    pool_size=config.RABBITMQ_PUBLISHER_POOL_SIZE,
+    confirms=config.RABBITMQ_PUBLISHER_CONFIRMS
+)
+
+
+def publish_event(queue_name: str, payload: dict):
+    publisher.publish(
         exchange="",
         routing_key=queue_name,
-        body=message,
-        properties=pika.BasicProperties(
-            delivery_mode=2
-        ),
+        payload=payload,
+        exchange_type=None,
+        queue_name=queue_name,
+        persistent=True
     )
 
-    connection.close()
\ No newline at end of file
+
+def publish_user_event(user_id: int, event: dict):
+    """Publish a real-time event to every WebSocket held by `user_id`, in whichever API process"""
+    publisher.publish(exchange=WS_EXCHANGE, routing_key=f"user.{user_id}", payload=event, exchange_type="topic")
+
+
+def publish_admin_event(event: dict):
+    """Publish a real-time event to connected admins only"""
+    publisher.publish(exchange=WS_EXCHANGE, routing_key=WS_ADMIN_ROUTING_KEY, payload=event, exchange_type="topic")
+
+
+def publish_fanout_event(recipients: list, event: dict):
+    """
+    Publish one event for many users: `recipients` is a list of [user_id, notification_id]
+    pairs and `event` the shared notification payload. Each API process expands it
+    for the recipients connected to it.
+    """
+    publisher.publish(
+        exchange=WS_EXCHANGE,
+        routing_key=WS_FANOUT_ROUTING_KEY,
+        payload={"type": "notification.fanout", "recipients": recipients, "data": event},
+        exchange_type="topic"
+    )
@@ -1,40 +1,162 @@
-import pika
-import json
+import aio_pika
 import asyncio
+import json
 from .websocket_manager import manager
+from .rabbitmq import WS_EXCHANGE, WS_ADMIN_ROUTING_KEY, WS_FANOUT_ROUTING_KEY
+from . import config, notification_counters
 
-def rabbitmq_ws_listener():
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters("127.0.0.1")
-    )
-    channel = connection.channel()
 
-    channel.exchange_declare(
-        exchange="ws_events",
-        exchange_type="fanout",
-        durable=True
-    )
+class _UserBindings:
+    """
+    Keeps this process's listener queue bound to "user.<id>" for exactly the
+    users that currently hold a socket here, so the broker only sends us
+    events we can actually deliver.
+    """
 
-    result = channel.queue_declare(queue="", exclusive=True)
-    queue_name = result.method.queue
+    def __init__(self):
+        self.queue = None
+        self.exchange = None
+        self._lock = asyncio.Lock()
 
-    channel.queue_bind(
-        exchange="ws_events",
-        queue=queue_name
-    )
+    async def attach(self, queue, exchange):
+        self.queue, self.exchange = queue, exchange
+        await queue.bind(exchange, routing_key=WS_ADMIN_ROUTING_KEY)
+        await queue.bind(exchange, routing_key=WS_FANOUT_ROUTING_KEY)
+        for user_id in list(manager.user_connections):
+            await queue.bind(exchange, routing_key=f"user.{user_id}")
+
+    def detach(self):
+        self.queue, self.exchange = None, None
 
-    print("🔊 RabbitMQ WS Listener started…")
+    def subscribe(self, user_id: int):
+        if self.queue is not None:
+            asyncio.get_running_loop().create_task(self._sync(user_id))
 
-    def callback(ch, method, properties, body):
-        event = json.loads(body.decode())
-        # Run the async broadcast function from our sync callback
-        asyncio.run(manager.broadcast(event))
+    def unsubscribe(self, user_id: int):
+        if self.queue is not None:
+            asyncio.get_running_loop().create_task(self._sync(user_id))
 
-    channel.basic_consume(
-        queue=queue_name,
-        on_message_callback=callback,
-        auto_ack=True
+    async def _sync(self, user_id: int):
+        # Re-read the manager state under the lock so quick connect/disconnect
+        # sequences always converge on the right binding
+        async with self._lock:
+            queue, exchange = self.queue, self.exchange
+            if queue is None:
+                return
+            try:
+                if user_id in manager.user_connections:
+                    await queue.bind(exchange, routing_key=f"user.{user_id}")
+                    # Events published before the binding existed were not seen here
+                    notification_counters.forget(user_id)
+                else:
+                    await queue.unbind(exchange, routing_key=f"user.{user_id}")
+            except Exception as e:
+                print(f"Failed to update ws binding for user {user_id}: {e}")
+
+
+bindings = _UserBindings()
+manager.on_user_subscribed = bindings.subscribe
+manager.on_user_unsubscribed = bindings.unsubscribe
+
+
+async def publish_user_event(user_id: int, event: dict) -> bool:
+    """
+    Publish a user-addressed event on the listener's own connection, so it
+    reaches the user's sockets in every API process (including this one,
+    via the binding above). Returns False while the listener is offline.
+    """
+    exchange = bindings.exchange
+    if exchange is None:
+        return False
+
+    await exchange.publish(
+        aio_pika.Message(body=json.dumps(event).encode(), content_type="application/json"),
+        routing_key=f"user.{user_id}"
     )
+    return True
+
+
+async def _fan_out(event: dict):
+    """Expand a fanout event into one notification per recipient connected to this process"""
+    for user_id, notification_id in event.get("recipients", []):
+        if user_id in manager.user_connections:
+            notification_counters.forget(user_id)
+            data = dict(event["data"], id=notification_id, user_id=user_id)
+            await manager.send_personal_message({"type": "notification", "data": data}, user_id)
+
+
+async def _deliver(message: aio_pika.abc.AbstractIncomingMessage):
+    """Deliver one event to the sockets it is addressed to, then ack it"""
+    try:
+        event = json.loads(message.body.decode())
+    except ValueError:
+        print("Dropping malformed ws event")
+        await message.reject()
+        return
+
+    routing_key = message.routing_key or ""
+    try:
+        if routing_key == WS_ADMIN_ROUTING_KEY:
+            delivery = manager.broadcast_to_admins(event)
+        elif routing_key == WS_FANOUT_ROUTING_KEY:
+            delivery = _fan_out(event)
+        elif routing_key.startswith("user."):
+            user_id = int(routing_key.split(".", 1)[1])
+            if event.get("type") == "notification.stats":
+                notification_counters.remember(user_id, event["data"]["total_count"], event["data"]["unread_count"])
+            elif event.get("type") == "notification":
+                notification_counters.forget(user_id)
+            delivery = manager.send_personal_message(event, user_id)
+        else:
+            delivery = None
+
+        if delivery is not None:
+            # Bounded so a stuck client can never stall the consumer forever
+            await asyncio.wait_for(delivery, timeout=config.WS_DELIVERY_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"WebSocket delivery of {event.get('type')} timed out")
+    except Exception as e:
+        print(f"WebSocket delivery of {event.get('type')} failed: {e}")
+
+    await message.ack()
+
+
+async def rabbitmq_ws_listener():
+    """
+    Consume the ws_user_events topic exchange inside the FastAPI event loop.
+
+    The queue is bound to "admin", "fanout" and "user.<id>" for every user
+    connected to this process. Messages are acked manually after they have
+    been delivered and at most WS_LISTENER_PREFETCH are in flight, so when
+    clients are slow the backlog stays in RabbitMQ instead of piling up in
+    this process.
+    """
+    while True:
+        try:
+            connection = await aio_pika.connect_robust(host=config.RABBITMQ_HOST)
+            async with connection:
+                channel = await connection.channel()
+                await channel.set_qos(prefetch_count=config.WS_LISTENER_PREFETCH)
+
+                exchange = await channel.declare_exchange(
+                    WS_EXCHANGE,
+                    aio_pika.ExchangeType.TOPIC,
+                    durable=True
+                )
+
+                queue = await channel.declare_queue("", exclusive=True)
+                await bindings.attach(queue, exchange)
+
+                print("🔊 RabbitMQ WS Listener started…")
 
-    # Blocking call — this stays in its own thread
-    channel.start_consuming()
\ No newline at end of file
+                try:
+                    async with queue.iterator() as messages:
+                        async for message in messages:
+                            await _deliver(message)
+                finally:
+                    bindings.detach()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"RabbitMQ WS Listener error: {e}. Reconnecting in 5s…")
+            await asyncio.sleep(5)
@@ -0,0 +1,116 @@
+"""
+rollups.py
+
+transaction_daily_rollup: settled (SUCCESS) transaction count and amount
+per UTC day, bookkeeping movements (FD, EMI, adjustments) excluded, so /admin/statistics/transactions reads one row per day instead
+of scanning transactions.
+
+Rows are only written by rebuild_daily_rollup(), which the
+rebuild_transaction_rollup beat task runs for today and yesterday every few
+minutes, so a rollup row lags by at most one beat interval. Readers that need
+the current day exact take it from live_day_totals() instead, which scans
+only that day's transactions. Settlements
+deliberately do not add to the row themselves: a single row per day updated
+inside every settling transaction would stay locked until each commit and
+serialize all settlement workers behind one another.
+
+Backfill after deploying:
+    python -m app.rollups rebuild --days 400
+"""
+import argparse
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .database import SessionLocal, dialect_insert
+from .models import Transaction, TransactionDailyRollup, BOOKKEEPING_KINDS
+from .timeseries import date_bucket
+
+
+def rebuild_daily_rollup(db: Session, since: date) -> int:
+    """Recompute every rollup row from `since` (inclusive) from the transactions table"""
+    # Aggregate first without holding any lock, then write in one short transaction
+    day = date_bucket("day", Transaction.timestamp)
+    rows = db.query(
+        day.label("day"),
+        func.count(Transaction.id).label("transaction_count"),
+        func.coalesce(func.sum(Transaction.amount), 0).label("total_amount")
+    ).filter(
+        Transaction.status == "SUCCESS",
+        Transaction.kind.notin_(BOOKKEEPING_KINDS),
+        Transaction.timestamp >= datetime.combine(since, datetime.min.time())
+    ).group_by(day).all()
+    db.rollback()
+
+    now = datetime.utcnow()
+    days = [row.day.date() for row in rows]
+    stale = db.query(TransactionDailyRollup).filter(TransactionDailyRollup.day >= since)
+    if days:
+        stale = stale.filter(TransactionDailyRollup.day.notin_(days))
+    stale.delete(synchronize_session=False)
+    if rows:
+        # Upserts, so concurrent rebuilds never collide on the primary key
+        stmt = dialect_insert(db.get_bind())(TransactionDailyRollup.__table__).values([
+            {"day": row.day.date(), "transaction_count": row.transaction_count,
+             "total_amount": float(row.total_amount), "updated_at": now}
+            for row in sorted(rows, key=lambda row: row.day)
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["day"],
+            set_={
+                "transaction_count": stmt.excluded.transaction_count,
+                "total_amount": stmt.excluded.total_amount,
+                "updated_at": now
+            }
+        ))
+    db.commit()
+    return len(rows)
+
+
+def daily_rollup(db: Session, start: date, end: date) -> dict:
+    """{day: (count, amount)} for the days in [start, end] that have settled transactions"""
+    rows = db.query(TransactionDailyRollup).filter(
+        TransactionDailyRollup.day >= start,
+        TransactionDailyRollup.day <= end
+    ).all()
+    return {row.day: (row.transaction_count, row.total_amount) for row in rows}
+
+
+def live_day_totals(db: Session, day: date) -> tuple:
+    """(count, amount, {status: count}) for one UTC day straight from the transactions table.
+
+    count and amount cover SUCCESS rows, matching the rollup; the status
+    breakdown includes pending and failed transfers as well.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    rows = db.query(
+        Transaction.status,
+        func.count(Transaction.id),
+        func.coalesce(func.sum(Transaction.amount), 0)
+    ).filter(
+        Transaction.kind.notin_(BOOKKEEPING_KINDS),
+        Transaction.timestamp >= start,
+        Transaction.timestamp < start + timedelta(days=1)
+    ).group_by(Transaction.status).all()
+    by_status = {status: count for status, count, _ in rows}
+    settled = next(((count, float(amount)) for status, count, amount in rows if status == "SUCCESS"), (0, 0.0))
+    return settled[0], settled[1], by_status
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Transaction rollup tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="Recompute the daily rollup for the last N days")
+    rebuild.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow().date() - timedelta(days=args.days - 1)
+        rebuilt = rebuild_daily_rollup(db, since)
+        print(f"Rebuilt transaction_daily_rollup since {since}: {rebuilt} non-empty days")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    _main()
@@ -3,7 +3,8 @@ from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import User, Account
 from ..auth import get_current_user
-from ..qr_utils import generate_account_qr_code, generate_account_qr_hash
+from ..qr_utils import generate_account_qr_code, generate_account_qr_token, verify_account_qr_hash, build_account_qr_url, png_data_uri
+from .. import qr_renderer
 from typing import List
 
 router = APIRouter(prefix="/account-qr", tags=["Account QR Codes"])
@@ -29,32 +30,30 @@ def get_all_account_qr_codes(
             "accounts": []
         }
     
-    # Generate QR code for each account
-    account_qr_list = []
-    for account in accounts:
-        # Prepare account data for QR code
-        account_data = {
-            "account_number": account.account_number,
-            "account_type": account.account_type,
-            "user_name": current_user.full_name or current_user.username,
-            "user_email": current_user.email,
-            "balance": account.balance
-        }
-        
-        # Generate QR code with payment URL
-        qr_code_base64 = generate_account_qr_code(
-            account.id, 
-            account_data, 
+    # Generate QR code for each account, concurrently in the QR render pool
+    qr_codes = qr_renderer.render_all({
+        account.id: build_account_qr_url(
+            account.id,
+            {
+                "account_number": account.account_number,
+                "account_type": account.account_type,
+                "user_name": current_user.full_name or current_user.username
+            },
             "http://localhost:3000"
         )
-        qr_hash = generate_account_qr_hash(account.id)
+        for account in accounts
+    })
+    
+    account_qr_list = []
+    for account in accounts:
+        qr_hash = generate_account_qr_token(account.id)
         
         account_qr_list.append({
             "account_id": account.id,
             "account_number": account.account_number,
             "account_type": account.account_type,
             "balance": account.balance,
-            "qr_code": qr_code_base64,
+            "qr_code": png_data_uri(qr_codes[account.id]),
             "qr_hash": qr_hash,
             "created_at": account.created_at,
             "status": account.status
@@ -107,7 +106,7 @@ def get_single_account_qr_code(
         account_data, 
         "http://localhost:3000"
     )
-    qr_hash = generate_account_qr_hash(account.id)
+    qr_hash = generate_account_qr_token(account.id)
     
     return {
         "account_id": account.id,
@@ -158,24 +157,22 @@ def decode_account_qr_data(
                 detail="Invalid QR code format"
             )
         
-        # Get account details
-        target_account = db.query(Account).filter(Account.id == account_id).first()
-        if not target_account:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Account not found"
-            )
-        
-        # Verify the QR hash
-        expected_hash = generate_account_qr_hash(account_id)
-        if qr_hash != expected_hash:
+        # Verify the QR hash first, so tampered codes never reach the database
+        if not verify_account_qr_hash(account_id, qr_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid or tampered QR code"
             )
         
-        # Get account owner details
-        account_owner = db.query(User).filter(User.id == target_account.user_id).first()
+        # Get account details and the account owner in one query
+        row = db.query(Account, User).join(User, User.id == Account.user_id) \
+            .filter(Account.id == account_id).first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Account not found"
+            )
+        target_account, account_owner = row
         
         return {
             "valid": True,
@@ -196,6 +193,8 @@ def decode_account_qr_data(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid QR code format"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 from fastapi import Header
-from ..database import get_db
-from .. import models, schemas, auth
+from ..database import get_db, SessionLocal
+from .. import models, schemas, auth, statements
 from ..utils import get_current_user
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+from typing import Optional
 import os
+import json
 import random
 
 SECRET_KEY = os.getenv("JWT_SECRET")
@@ -249,45 +252,148 @@ def get_account_balance(
         "balance": account.balance
     }
 
+@router.get("/{account_id}/statement")
+def export_account_statement(
+    account_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Stream the full statement of an account as CSV or NDJSON, oldest first,
+    with the running balance after each transaction. Owners can export their
+    own accounts, admins any account. from_date/to_date are inclusive.
+    """
+    query = db.query(models.Account).filter(models.Account.id == account_id)
+    if current_user.role != "admin":
+        query = query.filter(models.Account.user_id == current_user.id)
+    account = query.first()
+
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    since = datetime.combine(from_date, time.min) if from_date else None
+    until = datetime.combine(to_date + timedelta(days=1), time.min) if to_date else None
+    return StreamingResponse(
+        statements.stream_statement(SessionLocal, account.id, format, since, until),
+        media_type=statements.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="statement-{account.account_number}.{format}"'}
+    )
+
+@router.get("/{account_id}/qr-code.png")
+def get_account_qr_image(
+    account_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Raw image/png QR code of one approved account; its ETag is the digest of the QR content"""
+    from ..qr_utils import build_account_qr_url, qr_png, qr_image_response
+
+    account = db.query(models.Account).filter(
+        models.Account.id == account_id,
+        models.Account.user_id == current_user.id,
+        models.Account.status == "approved"
+    ).first()
+
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    account_data = {
+        "account_number": account.account_number,
+        "user_name": current_user.full_name or current_user.username,
+        "account_type": account.account_type
+    }
+    png, digest = qr_png(build_account_qr_url(account.id, account_data, "http://localhost:3000"))
+    return qr_image_response(request, png, digest)
+
+@router.get("/{account_id}/qr-code.svg")
+def get_account_qr_svg(
+    account_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """SVG variant of /accounts/{account_id}/qr-code.png"""
+    from ..qr_utils import build_account_qr_url, qr_svg, qr_image_response
+
+    account = db.query(models.Account).filter(
+        models.Account.id == account_id,
+        models.Account.user_id == current_user.id,
+        models.Account.status == "approved"
+    ).first()
+
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    account_data = {
+        "account_number": account.account_number,
+        "user_name": current_user.full_name or current_user.username,
+        "account_type": account.account_type
+    }
+    svg, digest = qr_svg(build_account_qr_url(account.id, account_data, "http://localhost:3000"))
+    return qr_image_response(request, svg, digest, "image/svg+xml")
+
 @router.get("/qr-codes/all")
 def get_all_account_qr_codes(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    qr_format: str = Query("png", pattern="^(png|svg)$"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Get QR codes for all approved accounts (like UPI - one QR per account)"""
-    from ..qr_utils import generate_account_qr_code
+    """
+    Get QR codes for all approved accounts (like UPI - one QR per account).
+    The codes are rendered concurrently in the QR render pool; with
+    format=ndjson each account is streamed as its own line as soon as its
+    QR code is ready. qr_format=svg returns SVG markup, which needs no
+    render pool.
+    """
+    from ..qr_utils import build_account_qr_url, png_data_uri, qr_code_value
+    from .. import qr_renderer
     
     # Get all approved accounts for the user
     accounts = db.query(models.Account).filter(
         models.Account.user_id == current_user.id,
         models.Account.status == "approved"
-    ).all()
+    ).order_by(models.Account.id).all()
     
     if not accounts:
         raise HTTPException(status_code=404, detail="No approved accounts found")
     
-    # Generate QR code for each account
-    qr_codes = []
+    # Account info and QR content for each account
+    entries, contents = {}, {}
     for account in accounts:
         account_data = {
             "account_number": account.account_number,
             "user_name": current_user.full_name or current_user.username,
             "account_type": account.account_type
         }
-        
-        qr_code = generate_account_qr_code(
-            account_id=account.id,
-            account_data=account_data,
-            base_url="http://localhost:3000"
-        )
-        
-        qr_codes.append({
+        contents[account.id] = build_account_qr_url(account.id, account_data, "http://localhost:3000")
+        entries[account.id] = {
             "account_id": account.id,
             "account_number": account.account_number,
             "account_type": account.account_type,
-            "balance": account.balance,
-            "qr_code": qr_code
-        })
+            "balance": account.balance
+        }
+    
+    if qr_format == "svg":
+        rendered = ((account_id, qr_code_value(content, "svg")) for account_id, content in contents.items())
+    else:
+        rendered = ((account_id, png_data_uri(png)) for account_id, png, _ in qr_renderer.render_many(contents))
+    
+    if format == "ndjson":
+        def lines():
+            for account_id, qr_code in rendered:
+                yield json.dumps({**entries[account_id], "qr_code": qr_code, "qr_format": qr_format}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    qr_codes_by_account = dict(rendered)
+    qr_codes = [
+        {**entry, "qr_code": qr_codes_by_account[account_id], "qr_format": qr_format}
+        for account_id, entry in entries.items()
+    ]
     
     return {
         "user_id": current_user.id,
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, and_
 from typing import List
-from .. import models, schemas, auth
+from .. import models, schemas, auth, user_cache, admin_stats
 from ..database import get_db
 from .notification_router import create_notification_service
 import random
@@ -39,45 +39,64 @@ async def get_admin_stats(
     db: Session = Depends(get_db)
 ):
     """Get system statistics for admin dashboard"""
-    total_users = db.query(models.User).filter(models.User.role == "customer").count()
-    total_accounts = db.query(models.Account).count()
-    total_balance = db.query(func.sum(models.Account.balance)).scalar() or 0
-    total_transactions = db.query(models.Transaction).count()
-    total_loans = db.query(models.Loan).count()
-    total_fixed_deposits = db.query(models.FixedDeposit).count()
-    total_cards = db.query(models.Card).count()
-    
-    # Count pending approvals
-    pending_kyc = db.query(models.User).filter(
-        models.User.role == "customer",
-        models.User.status == "pending"
-    ).count()
-    
-    pending_cards = db.query(models.Card).filter(
-        models.Card.approval_status == "pending"
-    ).count()
-    
-    pending_loans = db.query(models.Loan).filter(
-        models.Loan.approval_status == "pending"
-    ).count()
-    
-    pending_fds = db.query(models.FixedDeposit).filter(
-        models.FixedDeposit.approval_status == "pending"
-    ).count()
-    
-    return schemas.AdminStats(
-        total_users=total_users,
-        total_accounts=total_accounts,
-        total_balance=float(total_balance),
-        total_transactions=total_transactions,
-        total_loans=total_loans,
-        total_fixed_deposits=total_fixed_deposits,
-        total_cards=total_cards,
-        pending_kyc=pending_kyc,
-        pending_cards=pending_cards,
-        pending_loans=pending_loans,
-        pending_fds=pending_fds
-    )
+    return schemas.AdminStats(**admin_stats.get_stats(db))
+
+
+@router.get("/shards")
+async def get_transaction_shards(
+    admin_user: models.User = Depends(auth.get_admin_user)
+):
+    """Queue depth and consumer count for every process_transaction shard queue"""
+    from ..sharding import shard_queue_depths
+    from .. import config
+
+    try:
+        queues = await asyncio.to_thread(shard_queue_depths)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Broker unavailable: {str(e)}")
+
+    return {
+        "shard_count": config.TRANSACTION_SHARDS,
+        "queues": queues,
+        "total_depth": sum(q["depth"] or 0 for q in queues)
+    }
+
+
+@router.get("/ws/connections")
+async def get_websocket_connections(
+    admin_user: models.User = Depends(auth.get_admin_user)
+):
+    """Live WebSocket connection counts for this API process"""
+    # async so stats() runs on the event loop that mutates the connection registries
+    from ..websocket_manager import manager
+
+    return manager.stats()
+
+
+@router.get("/emi-runs", response_model=List[schemas.EmiRunOut])
+async def get_emi_runs(
+    limit: int = Query(30, ge=1, le=365),
+    admin_user: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Recent EMI auto-debit runs with their progress, newest first"""
+    return db.query(models.EmiRun).order_by(models.EmiRun.run_date.desc()).limit(limit).all()
+
+
+@router.get("/emi-runs/{run_id}/items", response_model=List[schemas.EmiRunItemOut])
+async def get_emi_run_items(
+    run_id: int,
+    status: str = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    admin_user: models.User = Depends(auth.get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Per-loan outcomes of an EMI run, optionally only those with `status` (e.g. insufficient_balance)"""
+    query = db.query(models.EmiRunItem).filter(models.EmiRunItem.run_id == run_id)
+    if status:
+        query = query.filter(models.EmiRunItem.status == status)
+    return query.order_by(models.EmiRunItem.loan_id).offset(skip).limit(limit).all()
 
 
 @router.get("/users", response_model=List[schemas.UserOut])
@@ -123,6 +142,7 @@ async def update_user_by_admin(
         setattr(user, field, value)
     
     db.commit()
+    user_cache.invalidate_user(user_id)
     db.refresh(user)
     return {"message": "User updated successfully", "user": user}
 
@@ -189,12 +209,13 @@ async def delete_user(
         raise HTTPException(status_code=400, detail="Cannot delete admin user")
     
     # Delete all related data
-    db.query(models.Account).filter(models.Account.user_id == user_id).delete()
-    db.query(models.FixedDeposit).filter(models.FixedDeposit.user_id == user_id).delete()
-    db.query(models.Loan).filter(models.Loan.user_id == user_id).delete()
-    db.query(models.Card).filter(models.Card.user_id == user_id).delete()
+    admin_stats.bulk_delete(db, db.query(models.Account).filter(models.Account.user_id == user_id))
+    admin_stats.bulk_delete(db, db.query(models.FixedDeposit).filter(models.FixedDeposit.user_id == user_id))
+    admin_stats.bulk_delete(db, db.query(models.Loan).filter(models.Loan.user_id == user_id))
+    admin_stats.bulk_delete(db, db.query(models.Card).filter(models.Card.user_id == user_id))
     db.delete(user)
     db.commit()
+    user_cache.invalidate_user(user_id)
     
     return {"message": "User deleted successfully"}
 
@@ -238,6 +259,11 @@ async def adjust_account_balance(
     
     old_balance = account.balance
     account.balance += amount
+    # Record the movement so statements and balances derived from transactions add up
+    if amount > 0:
+        db.add(models.Transaction(dest_account=account.id, amount=amount, status="SUCCESS", kind="adjustment"))
+    elif amount < 0:
+        db.add(models.Transaction(src_account=account.id, amount=-amount, status="SUCCESS", kind="adjustment"))
     
     # Log the adjustment
     audit_log = models.AuditLog(
@@ -317,6 +343,7 @@ async def approve_kyc(
     db.add(audit_log)
     
     db.commit()
+    user_cache.invalidate_user(user.id)
     db.refresh(user)
     
     # KYC approval/rejection completed
@@ -446,7 +473,8 @@ async def approve_loan(
             transaction = models.Transaction(
                 dest_account=account.id,
                 amount=loan.principal,
-                status="SUCCESS"
+                status="SUCCESS",
+                kind="loan"
             )
             db.add(transaction)
             
@@ -535,7 +563,7 @@ async def approve_fixed_deposit(
         
         if approval_request.action.lower() == "approve":
             fd.approval_status = "approved"
-            fd.status = "active"
+            fd.status = "ACTIVE"
             message = f"Fixed deposit approved for user {fd.owner.username}"
         elif approval_request.action.lower() == "reject":
             fd.approval_status = "rejected"
@@ -575,42 +603,44 @@ async def get_detailed_statistics(
 ):
     """Get detailed statistics for charts and analytics"""
     from datetime import datetime, timedelta
-    from sqlalchemy import extract, case
+    from sqlalchemy import case
+    from ..timeseries import bucket_counts, day_starts, month_starts, fill, cumulative
+    
+    def count_if(condition):
+        return func.count(case((condition, 1)))
     
     # Get current date
     today = datetime.now()
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
-    # Weekly stats
-    accounts_this_week = db.query(models.Account).filter(
-        models.Account.created_at >= week_ago
-    ).count()
-    
-    loans_this_week = db.query(models.Loan).filter(
-        models.Loan.created_at >= week_ago,
-        models.Loan.approval_status == "approved"
-    ).count()
-    
-    cards_this_week = db.query(models.Card).filter(
-        models.Card.created_at >= week_ago,
-        models.Card.approval_status == "approved"
-    ).count()
-    
-    # Monthly stats
-    accounts_this_month = db.query(models.Account).filter(
-        models.Account.created_at >= month_ago
-    ).count()
-    
-    loans_this_month = db.query(models.Loan).filter(
-        models.Loan.created_at >= month_ago,
-        models.Loan.approval_status == "approved"
-    ).count()
-    
-    cards_this_month = db.query(models.Card).filter(
-        models.Card.created_at >= month_ago,
-        models.Card.approval_status == "approved"
-    ).count()
+    # Weekly/monthly totals, distributions and approval rates: one conditional aggregate per table
+    account_totals = db.query(
+        count_if(models.Account.created_at >= week_ago).label("this_week"),
+        count_if(models.Account.created_at >= month_ago).label("this_month"),
+        func.count(models.Account.id).label("total"),
+        count_if(models.Account.status == "active").label("approved")
+    ).one()
+    
+    loan_approved = models.Loan.approval_status == "approved"
+    loan_totals = db.query(
+        count_if(and_(loan_approved, models.Loan.created_at >= week_ago)).label("this_week"),
+        count_if(and_(loan_approved, models.Loan.created_at >= month_ago)).label("this_month"),
+        func.count(models.Loan.id).label("total"),
+        count_if(loan_approved).label("approved"),
+        # Loan types distribution (approximation based on amount)
+        count_if(and_(loan_approved, models.Loan.principal <= 50000)).label("personal"),
+        count_if(and_(loan_approved, models.Loan.principal > 50000, models.Loan.principal <= 200000)).label("auto"),
+        count_if(and_(loan_approved, models.Loan.principal > 200000)).label("home")
+    ).one()
+    
+    card_approved = models.Card.approval_status == "approved"
+    card_totals = db.query(
+        count_if(and_(card_approved, models.Card.created_at >= week_ago)).label("this_week"),
+        count_if(and_(card_approved, models.Card.created_at >= month_ago)).label("this_month"),
+        func.count(models.Card.id).label("total"),
+        count_if(card_approved).label("approved")
+    ).one()
     
     # Account types distribution
     account_types = db.query(
@@ -618,134 +648,83 @@ async def get_detailed_statistics(
         func.count(models.Account.id).label('count')
     ).group_by(models.Account.account_type).all()
     
-    # Loan types distribution (approximation based on amount)
-    total_loans = db.query(models.Loan).filter(models.Loan.approval_status == "approved").count()
-    personal_loans = db.query(models.Loan).filter(
-        models.Loan.approval_status == "approved",
-        models.Loan.principal <= 50000
-    ).count()
-    auto_loans = db.query(models.Loan).filter(
-        models.Loan.approval_status == "approved",
-        models.Loan.principal > 50000,
-        models.Loan.principal <= 200000
-    ).count()
-    home_loans = db.query(models.Loan).filter(
-        models.Loan.approval_status == "approved",
-        models.Loan.principal > 200000
-    ).count()
-    
     # Card types distribution
     card_types = db.query(
         models.Card.card_type,
         func.count(models.Card.id).label('count')
     ).group_by(models.Card.card_type).all()
     
-    # Approval rates
-    total_accounts_req = db.query(models.Account).count()
-    approved_accounts = db.query(models.Account).filter(models.Account.status == "active").count()
-    
-    total_loans_req = db.query(models.Loan).count()
-    approved_loans = db.query(models.Loan).filter(models.Loan.approval_status == "approved").count()
-    
-    total_cards_req = db.query(models.Card).count()
-    approved_cards = db.query(models.Card).filter(models.Card.approval_status == "approved").count()
-    
-    # User growth (monthly for last 12 months)
-    user_growth = []
-    for i in range(11, -1, -1):
-        month_start = today.replace(day=1) - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=30)
-        users = db.query(models.User).filter(
-            models.User.role == "customer",
-            models.User.created_at <= month_end
-        ).count()
-        active_users = db.query(models.User).filter(
-            models.User.role == "customer",
-            models.User.status == "approved",
-            models.User.created_at <= month_end
-        ).count()
-        user_growth.append({
-            "month": month_start.strftime("%b"),
-            "users": users,
-            "active": active_users
-        })
+    # Time series: one GROUP BY per entity, gaps filled in Python
+    months = month_starts(today, 12)
+    days = day_starts(today, 7)
+    
+    # User growth (cumulative, calendar months, last 12)
+    user_months = bucket_counts(
+        db, models.User.created_at, "month",
+        where=[models.User.role == "customer"],
+        users=None,
+        active=models.User.status == "approved"
+    )
+    user_growth = [
+        {"month": start.strftime("%b"), "users": users, "active": active}
+        for start, users, active in zip(
+            months,
+            cumulative(user_months, months, "users"),
+            cumulative(user_months, months, "active")
+        )
+    ]
     
     # Daily accounts (last 7 days)
-    daily_accounts = []
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-        count = db.query(models.Account).filter(
-            models.Account.created_at >= day_start,
-            models.Account.created_at <= day_end
-        ).count()
-        daily_accounts.append({
-            "day": day.strftime("%a"),
-            "accounts": count
-        })
+    account_days = bucket_counts(db, models.Account.created_at, "day", since=days[0], accounts=None)
+    daily_accounts = [
+        {"day": start.strftime("%a"), "accounts": count}
+        for start, count in zip(days, fill(account_days, days, "accounts"))
+    ]
+    
+    # Monthly data (last 12 calendar months)
+    account_months = bucket_counts(db, models.Account.created_at, "month", since=months[0], accounts=None)
+    loan_months = bucket_counts(db, models.Loan.created_at, "month", since=months[0], where=[loan_approved], loans=None)
+    card_months = bucket_counts(db, models.Card.created_at, "month", since=months[0], where=[card_approved], cards=None)
+    monthly_data = [
+        {"month": start.strftime("%b"), "accounts": accounts, "loans": loans, "cards": cards}
+        for start, accounts, loans, cards in zip(
+            months,
+            fill(account_months, months, "accounts"),
+            fill(loan_months, months, "loans"),
+            fill(card_months, months, "cards")
+        )
+    ]
     
-    # Monthly data (last 12 months)
-    monthly_data = []
-    for i in range(11, -1, -1):
-        month_start = today.replace(day=1) - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=30)
-        
-        accounts = db.query(models.Account).filter(
-            models.Account.created_at >= month_start,
-            models.Account.created_at < month_end
-        ).count()
-        
-        loans = db.query(models.Loan).filter(
-            models.Loan.approval_status == "approved",
-            models.Loan.created_at >= month_start,
-            models.Loan.created_at < month_end
-        ).count()
-        
-        cards = db.query(models.Card).filter(
-            models.Card.approval_status == "approved",
-            models.Card.created_at >= month_start,
-            models.Card.created_at < month_end
-        ).count()
-        
-        monthly_data.append({
-            "month": month_start.strftime("%b"),
-            "accounts": accounts,
-            "loans": loans,
-            "cards": cards
-        })
+    def approval_rate(totals):
+        if totals.total == 0:
+            return {"approved": 0, "rejected": 0}
+        return {
+            "approved": round(totals.approved / totals.total * 100, 1),
+            "rejected": round((totals.total - totals.approved) / totals.total * 100, 1)
+        }
     
     return {
         "weeklyStats": {
-            "accounts": accounts_this_week,
-            "loans": loans_this_week,
-            "cards": cards_this_week
+            "accounts": account_totals.this_week,
+            "loans": loan_totals.this_week,
+            "cards": card_totals.this_week
         },
         "monthlyStats": {
-            "accounts": accounts_this_month,
-            "loans": loans_this_month,
-            "cards": cards_this_month
+            "accounts": account_totals.this_month,
+            "loans": loan_totals.this_month,
+            "cards": card_totals.this_month
         },
         "accountTypes": [{"name": acc_type, "value": count} for acc_type, count in account_types],
         "loanTypes": [
-            {"name": "Personal", "value": personal_loans},
-            {"name": "Auto", "value": auto_loans},
-            {"name": "Home", "value": home_loans}
+            {"name": "Personal", "value": loan_totals.personal},
+            {"name": "Auto", "value": loan_totals.auto},
+            {"name": "Home", "value": loan_totals.home}
         ],
         "cardTypes": [{"name": card_type, "value": count} for card_type, count in card_types],
         "approvalRates": {
-            "accounts": {
-                "approved": round((approved_accounts / total_accounts_req * 100) if total_accounts_req > 0 else 0, 1),
-                "rejected": round(((total_accounts_req - approved_accounts) / total_accounts_req * 100) if total_accounts_req > 0 else 0, 1)
-            },
-            "loans": {
-                "approved": round((approved_loans / total_loans_req * 100) if total_loans_req > 0 else 0, 1),
-                "rejected": round(((total_loans_req - approved_loans) / total_loans_req * 100) if total_loans_req > 0 else 0, 1)
-            },
-            "cards": {
-                "approved": round((approved_cards / total_cards_req * 100) if total_cards_req > 0 else 0, 1),
-                "rejected": round(((total_cards_req - approved_cards) / total_cards_req * 100) if total_cards_req > 0 else 0, 1)
-            }
+            "accounts": approval_rate(account_totals),
+            "loans": approval_rate(loan_totals),
+            "cards": approval_rate(card_totals)
         },
         "userGrowth": user_growth,
         "dailyAccounts": daily_accounts,
@@ -755,50 +734,45 @@ async def get_detailed_statistics(
 
 @router.get("/statistics/transactions")
 async def get_transaction_statistics(
+    days: int = Query(30, ge=1, le=366),
     admin_user: models.User = Depends(auth.get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Get daily transaction statistics for the last 30 days"""
+    """Get daily settled-transaction statistics for the last `days` days.
+
+    Counts and amounts cover SUCCESS transfers by UTC day. Past days come from
+    transaction_daily_rollup (refreshed by the rebuild_transaction_rollup beat
+    task); today is computed live from transactions, together with its
+    per-status breakdown (todayByStatus) so pending and failed transfers stay
+    visible.
+    """
     from datetime import datetime, timedelta
+    from ..rollups import daily_rollup, live_day_totals
     
-    today = datetime.now()
-    daily_transactions = []
+    today = datetime.utcnow().date()
+    rollup = daily_rollup(db, today - timedelta(days=max(days, 7) - 1), today - timedelta(days=1))
+    today_count, today_amount, today_by_status = live_day_totals(db, today)
+    rollup[today] = (today_count, today_amount)
     
-    for i in range(29, -1, -1):
+    daily_transactions = []
+    for i in range(days - 1, -1, -1):
         day = today - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        # Count transactions
-        count = db.query(models.Transaction).filter(
-            models.Transaction.timestamp >= day_start,
-            models.Transaction.timestamp <= day_end
-        ).count()
-        
-        # Sum amounts
-        total_amount = db.query(func.sum(models.Transaction.amount)).filter(
-            models.Transaction.timestamp >= day_start,
-            models.Transaction.timestamp <= day_end
-        ).scalar() or 0
-        
+        count, total_amount = rollup.get(day, (0, 0.0))
         daily_transactions.append({
             "date": day.strftime("%b %d"),
             "count": count,
             "amount": float(total_amount)
         })
     
-    # Weekly summary
-    week_ago = today - timedelta(days=7)
-    weekly_volume = db.query(models.Transaction).filter(
-        models.Transaction.timestamp >= week_ago
-    ).count()
-    
-    weekly_amount = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.timestamp >= week_ago
-    ).scalar() or 0
+    # Weekly summary (last 7 days, including today)
+    week = [rollup.get(today - timedelta(days=i), (0, 0.0)) for i in range(7)]
+    weekly_volume = sum(count for count, _ in week)
+    weekly_amount = sum(amount for _, amount in week)
     
     return {
         "dailyTransactions": daily_transactions,
         "weeklyVolume": weekly_volume,
-        "weeklyAmount": float(weekly_amount)
+        "weeklyAmount": float(weekly_amount),
+        "todayByStatus": today_by_status,
+        "basis": "settled"
     }
\ No newline at end of file
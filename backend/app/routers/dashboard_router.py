@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, and_, or_, case
 from datetime import datetime, timedelta
 from ..database import get_db
-from ..models import Account, Transaction, FixedDeposit, Loan, Card, User
+from ..models import Account, Transaction, FixedDeposit, Loan, Card, User, BOOKKEEPING_KINDS
 from ..auth import get_current_user
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def _display_name(full_name, username):
+    return full_name or username if username else "Unknown"
+
+
 @router.get("/summary")
 def get_dashboard_summary(db: Session = Depends(get_db), 
                          current_user: User = Depends(get_current_user)):
@@ -39,26 +48,36 @@ def get_dashboard_summary(db: Session = Depends(get_db),
         for acc in accounts
     ]
     
-    # Get recent transactions (last 10) with detailed account and user info
+    # Get recent transactions (last 10) with account numbers and owner names joined in
     recent_transactions = []
     if account_ids:
-        transactions = db.query(Transaction).filter(
+        SrcAccount, DestAccount = aliased(Account), aliased(Account)
+        SrcUser, DestUser = aliased(User), aliased(User)
+        rows = db.query(
+            Transaction,
+            SrcAccount.account_number.label("src_account_number"),
+            DestAccount.account_number.label("dest_account_number"),
+            SrcUser.full_name.label("src_full_name"),
+            SrcUser.username.label("src_username"),
+            DestUser.full_name.label("dest_full_name"),
+            DestUser.username.label("dest_username")
+        ).outerjoin(SrcAccount, SrcAccount.id == Transaction.src_account
+        ).outerjoin(SrcUser, SrcUser.id == SrcAccount.user_id
+        ).outerjoin(DestAccount, DestAccount.id == Transaction.dest_account
+        ).outerjoin(DestUser, DestUser.id == DestAccount.user_id
+        ).filter(
             or_(
                 Transaction.src_account.in_(account_ids),
                 Transaction.dest_account.in_(account_ids)
-            )
+            ),
+            Transaction.kind.notin_(BOOKKEEPING_KINDS)
         ).order_by(Transaction.timestamp.desc()).limit(10).all()
         
-        for txn in transactions:
+        for row in rows:
+            txn = row.Transaction
             is_debit = txn.src_account in account_ids
-            
-            # Get source account details
-            src_account = db.query(Account).filter(Account.id == txn.src_account).first()
-            src_user = db.query(User).filter(User.id == src_account.user_id).first() if src_account else None
-            
-            # Get destination account details  
-            dest_account = db.query(Account).filter(Account.id == txn.dest_account).first()
-            dest_user = db.query(User).filter(User.id == dest_account.user_id).first() if dest_account else None
+            src_user_name = _display_name(row.src_full_name, row.src_username)
+            dest_user_name = _display_name(row.dest_full_name, row.dest_username)
             
             recent_transactions.append({
                 "id": txn.id,
@@ -66,11 +85,11 @@ def get_dashboard_summary(db: Session = Depends(get_db),
                 "type": "debit" if is_debit else "credit",
                 "status": txn.status,
                 "timestamp": txn.timestamp.isoformat() if txn.timestamp else None,
-                "src_account_number": src_account.account_number if src_account else None,
-                "dest_account_number": dest_account.account_number if dest_account else None,
-                "src_user_name": src_user.full_name or src_user.username if src_user else "Unknown",
-                "dest_user_name": dest_user.full_name or dest_user.username if dest_user else "Unknown",
-                "description": dest_user.full_name or dest_user.username if is_debit and dest_user else (src_user.full_name or src_user.username if not is_debit and src_user else "Transfer")
+                "src_account_number": row.src_account_number,
+                "dest_account_number": row.dest_account_number,
+                "src_user_name": src_user_name,
+                "dest_user_name": dest_user_name,
+                "description": dest_user_name if is_debit and row.dest_username else (src_user_name if not is_debit and row.src_username else "Transfer")
             })
     
     # Calculate monthly income and expenses (last 30 days)
@@ -79,53 +98,64 @@ def get_dashboard_summary(db: Session = Depends(get_db),
     monthly_expenses = 0.0
     
     if account_ids:
-        # Credits (money coming in)
-        income_txns = db.query(func.sum(Transaction.amount)).filter(
-            and_(
-                Transaction.dest_account.in_(account_ids),
-                Transaction.status == "SUCCESS",
-                Transaction.timestamp >= thirty_days_ago
-            )
-        ).scalar()
-        monthly_income = float(income_txns) if income_txns else 0.0
-        
-        # Debits (money going out)
-        expense_txns = db.query(func.sum(Transaction.amount)).filter(
-            and_(
+        # Credits (money coming in) and debits (money going out) in one pass
+        monthly_income, monthly_expenses = db.query(
+            _sum_if(Transaction.dest_account.in_(account_ids), Transaction.amount),
+            _sum_if(Transaction.src_account.in_(account_ids), Transaction.amount)
+        ).filter(
+            or_(
                 Transaction.src_account.in_(account_ids),
-                Transaction.status == "SUCCESS",
-                Transaction.timestamp >= thirty_days_ago
-            )
-        ).scalar()
-        monthly_expenses = float(expense_txns) if expense_txns else 0.0
+                Transaction.dest_account.in_(account_ids)
+            ),
+            Transaction.status == "SUCCESS",
+            Transaction.kind.notin_(BOOKKEEPING_KINDS),
+            Transaction.timestamp >= thirty_days_ago
+        ).one()
+        monthly_income = float(monthly_income)
+        monthly_expenses = float(monthly_expenses)
     
     # Fixed Deposits Summary
-    fds = db.query(FixedDeposit).filter(FixedDeposit.user_id == current_user.id).all()
+    fd_totals = db.query(
+        func.count(FixedDeposit.id),
+        func.coalesce(func.sum(FixedDeposit.principal), 0),
+        func.coalesce(func.sum(FixedDeposit.maturity_amount), 0),
+        func.coalesce(func.avg(FixedDeposit.rate), 0)
+    ).filter(FixedDeposit.user_id == current_user.id).one()
     fd_summary = {
-        "count": len(fds),
-        "total_investment": sum(float(fd.principal) for fd in fds),
-        "total_maturity": sum(float(fd.maturity_amount) for fd in fds),
-        "avg_rate": (sum(float(fd.rate) for fd in fds) / len(fds)) if fds else 0.0
+        "count": fd_totals[0],
+        "total_investment": float(fd_totals[1]),
+        "total_maturity": float(fd_totals[2]),
+        "avg_rate": float(fd_totals[3])
     }
     
     # Loans Summary
-    loans = db.query(Loan).filter(Loan.user_id == current_user.id).all()
-    active_loans = [loan for loan in loans if loan.status == "ACTIVE"]
+    loan_active = Loan.status == "ACTIVE"
+    loan_totals = db.query(
+        func.count(Loan.id),
+        func.count(case((loan_active, 1))),
+        func.coalesce(func.sum(Loan.principal), 0),
+        _sum_if(loan_active, Loan.outstanding)
+    ).filter(Loan.user_id == current_user.id).one()
     loan_summary = {
-        "count": len(loans),
-        "active_count": len(active_loans),
-        "total_borrowed": sum(float(loan.principal) for loan in loans),
-        "total_outstanding": sum(float(loan.outstanding) for loan in active_loans)
+        "count": loan_totals[0],
+        "active_count": loan_totals[1],
+        "total_borrowed": float(loan_totals[2]),
+        "total_outstanding": float(loan_totals[3])
     }
     
     # Cards Summary
-    cards = db.query(Card).filter(Card.user_id == current_user.id).all()
-    active_cards = [card for card in cards if card.status == "ACTIVE"]
+    card_active = Card.status == "ACTIVE"
+    card_totals = db.query(
+        func.count(Card.id),
+        func.count(case((card_active, 1))),
+        func.coalesce(func.sum(Card.credit_limit), 0),
+        _sum_if(card_active, Card.available_credit)
+    ).filter(Card.user_id == current_user.id).one()
     card_summary = {
-        "count": len(cards),
-        "active_count": len(active_cards),
-        "total_credit_limit": sum(float(card.credit_limit) for card in cards),
-        "total_available": sum(float(card.available_credit) for card in active_cards)
+        "count": card_totals[0],
+        "active_count": card_totals[1],
+        "total_credit_limit": float(card_totals[2]),
+        "total_available": float(card_totals[3])
     }
     
     # Calculate balance change percentage (comparing to 30 days ago)
@@ -2,8 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from ..database import get_db
-from ..models import FixedDeposit, User, Account
-from ..schemas import FixedDepositCreate, FixedDepositOut, FixedDepositRenew
+from ..models import FixedDeposit, User, Account, Transaction
+from ..schemas import FixedDepositCreate, FixedDepositOut, FixedDepositRenew, FixedDepositAutoRenew
+from ..fd_maturity import add_months
 from ..utils import get_current_user
 
 ALLOWED_RATES = {7.0, 8.0, 9.0, 10.0}
@@ -11,17 +12,6 @@ ALLOWED_RATES = {7.0, 8.0, 9.0, 10.0}
 router = APIRouter(prefix="/fixed-deposits", tags=["FixedDeposits"])
 
 
-def _add_months(source_date: date, months: int) -> date:
-    # safe month add
-    month = source_date.month - 1 + months
-    year = source_date.year + month // 12
-    month = month % 12 + 1
-    # days per month
-    mdays = [31, 29 if (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)) else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    day = min(source_date.day, mdays[month - 1])
-    return date(year, month, day)
-
-
 @router.get("/me", response_model=list[FixedDepositOut])
 def list_my_fds(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """List fixed deposits for current user"""
@@ -54,9 +44,10 @@ def create_fd(fd_in: FixedDepositCreate, current_user: User = Depends(get_curren
     
     # Deduct FD amount from account balance
     user_account.balance -= fd_in.principal
+    db.add(Transaction(src_account=user_account.id, dest_account=None, amount=fd_in.principal, status="SUCCESS", kind="fd"))
 
     start = fd_in.start_date
-    maturity = _add_months(start, fd_in.tenure_months)
+    maturity = add_months(start, fd_in.tenure_months)
     # Use compound interest with monthly compounding: A = P(1 + r/n)^(nt)
     # where n = 12 (monthly compounding), t = years
     years = fd_in.tenure_months / 12
@@ -75,6 +66,7 @@ def create_fd(fd_in: FixedDepositCreate, current_user: User = Depends(get_curren
         tenure_months=fd_in.tenure_months,
         maturity_amount=maturity_amount,
         status="ACTIVE",
+        auto_renew=fd_in.auto_renew,
         approval_status="approved",  # Auto-approve for self-service
         approved_by=current_user.id,
         approval_date=datetime.utcnow(),
@@ -118,12 +110,13 @@ def renew_fd(
     
     # Deduct renewal amount from account
     user_account.balance -= renew_data.principal
+    db.add(Transaction(src_account=user_account.id, dest_account=None, amount=renew_data.principal, status="SUCCESS", kind="fd"))
 
     # Mark old as renewed
     old_fd.status = "RENEWED"
 
     start = date.today()
-    maturity = _add_months(start, renew_data.tenure_months)
+    maturity = add_months(start, renew_data.tenure_months)
     # Use compound interest with monthly compounding
     monthly_rate = old_fd.rate / 12 / 100
     maturity_amount = round(renew_data.principal * ((1 + monthly_rate) ** renew_data.tenure_months), 2)
@@ -150,6 +143,26 @@ def renew_fd(
     return new_fd
 
 
+@router.put("/{fd_id}/auto-renew", response_model=FixedDepositOut)
+def set_fd_auto_renew(
+    fd_id: int,
+    payload: FixedDepositAutoRenew,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Choose whether an active fixed deposit is renewed or paid out when it matures"""
+    fd = db.query(FixedDeposit).filter(FixedDeposit.id == fd_id, FixedDeposit.user_id == current_user.id).first()
+    if not fd:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fixed deposit not found")
+    if fd.status != "ACTIVE":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only ACTIVE deposits can be changed")
+
+    fd.auto_renew = payload.auto_renew
+    db.commit()
+    db.refresh(fd)
+    return fd
+
+
 @router.post("/{fd_id}/cancel", response_model=FixedDepositOut)
 def cancel_fd(
     fd_id: int,
@@ -202,6 +215,7 @@ def cancel_fd(
     
     # Credit the return amount to user's account
     user_account.balance += return_amount
+    db.add(Transaction(src_account=None, dest_account=user_account.id, amount=return_amount, status="SUCCESS", kind="fd"))
     
     # Mark FD as cancelled
     fd.status = "CANCELLED"
@@ -6,9 +6,8 @@ from ..models import Loan, User
 from ..schemas import LoanCreate, LoanOut, LoanPayment, NotificationCreate
 from ..utils import get_current_user
 from .notification_router import create_notification_service
+from ..rabbitmq import publish_user_event, publish_admin_event
 import math
-import pika
-import json
 
 router = APIRouter(prefix="/loans", tags=["Loans"]) 
 
@@ -23,14 +22,6 @@ def _compute_emi(principal: float, annual_rate: float, months: int) -> float:
     return round(emi, 2)
 
 
-def _publish_ws_event(event: dict):
-    connection = pika.BlockingConnection(pika.ConnectionParameters("127.0.0.1"))
-    channel = connection.channel()
-    channel.exchange_declare(exchange="ws_events", exchange_type="fanout", durable=True)
-    channel.basic_publish(exchange="ws_events", routing_key="", body=json.dumps(event))
-    connection.close()
-
-
 @router.get("/me", response_model=list[LoanOut])
 def list_my_loans(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     loans = db.query(Loan).filter(Loan.user_id == current_user.id).all()
@@ -97,14 +88,16 @@ async def apply_loan(payload: LoanCreate, current_user: User = Depends(get_curre
         )
         await create_notification_service(db, admin_notification)
 
-    _publish_ws_event({
+    loan_event = {
         "type": "loan.created",
         "loan_id": loan.id,
         "user_id": loan.user_id,
         "principal": loan.principal,
         "emi": loan.emi,
         "outstanding": loan.outstanding,
-    })
+    }
+    publish_user_event(loan.user_id, loan_event)
+    publish_admin_event(loan_event)
 
     return loan
 
@@ -133,7 +126,7 @@ def pay_loan(loan_id: int, payment: LoanPayment, current_user: User = Depends(ge
     db.commit()
     db.refresh(loan)
 
-    _publish_ws_event({
+    publish_user_event(loan.user_id, {
         "type": "loan.payment",
         "loan_id": loan.id,
         "user_id": loan.user_id,
@@ -1,31 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
-from ..models import Notification, User
-from ..schemas import NotificationCreate, NotificationOut, NotificationUpdate, NotificationStats
+from ..database import get_db, SessionLocal
+from ..models import Notification, NotificationBroadcast, User
+from ..schemas import NotificationCreate, NotificationOut, NotificationUpdate, NotificationStats, NotificationBroadcastOut
+from ..tasks import broadcast_notification as broadcast_notification_task
+from .. import broadcasts, config, notification_counters
 from ..auth import get_current_user
 from ..websocket_manager import manager
+from ..rabbitmq_ws_listener import publish_user_event
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
 
 async def send_real_time_notification(user_id: int, notification_data: dict):
     """Send real-time notification via WebSocket"""
+    message = {
+        "type": "notification",
+        "data": notification_data
+    }
     try:
-        await manager.send_personal_message(
-            message={
-                "type": "notification",
-                "data": notification_data
-            },
-            user_id=user_id
-        )
+        # Go through RabbitMQ so the user is reached on whichever API process holds the socket;
+        # only deliver locally if the listener is down
+        if not await publish_user_event(user_id, message):
+            await manager.send_personal_message(message=message, user_id=user_id)
     except Exception as e:
         print(f"Failed to send real-time notification: {e}")
 
 
+def _page_with_from_user_names(query, skip: int, limit: int) -> List[NotificationOut]:
+    """Newest-first page of a Notification query with from_user names joined in (one statement)"""
+    FromUser = aliased(User)
+    rows = query.outerjoin(FromUser, FromUser.id == Notification.from_user_id) \
+        .add_columns(FromUser.username) \
+        .order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+
+    result = []
+    for notification, from_user_name in rows:
+        notification_out = NotificationOut.from_orm(notification)
+        notification_out.from_user_name = from_user_name
+        result.append(notification_out)
+    return result
+
+
 async def create_notification_service(
     db: Session, 
     notification_data: NotificationCreate,
@@ -108,19 +127,7 @@ async def get_notifications(
     if unread_only:
         query = query.filter(Notification.is_read == False)
     
-    notifications = query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Add from_user names
-    result = []
-    for notification in notifications:
-        notification_out = NotificationOut.from_orm(notification)
-        if notification.from_user_id:
-            from_user = db.query(User).filter(User.id == notification.from_user_id).first()
-            if from_user:
-                notification_out.from_user_name = from_user.username
-        result.append(notification_out)
-    
-    return result
+    return _page_with_from_user_names(query, skip, limit)
 
 
 @router.get("/stats", response_model=NotificationStats)
@@ -128,13 +135,8 @@ async def get_notification_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get notification statistics for current user"""
-    total_count = db.query(Notification).filter(Notification.user_id == current_user.id).count()
-    unread_count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.is_read == False
-    ).count()
-    
+    """Get notification statistics for current user (kept up to date by app.notification_counters)"""
+    total_count, unread_count = notification_counters.get(db, current_user.id)
     return NotificationStats(total_count=total_count, unread_count=unread_count)
 
 
@@ -152,6 +154,8 @@ async def mark_all_notifications_read(
             "is_read": True,
             "read_at": datetime.utcnow()
         })
+        # Bulk UPDATE skips the flush hooks
+        notification_counters.apply(db, {current_user.id: (0, -updated_count)})
         
         db.commit()
         return {"message": f"Marked {updated_count} notifications as read"}
@@ -227,45 +231,61 @@ async def get_all_notifications(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    notifications = db.query(Notification).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Add from_user names
-    result = []
-    for notification in notifications:
-        notification_out = NotificationOut.from_orm(notification)
-        if notification.from_user_id:
-            from_user = db.query(User).filter(User.id == notification.from_user_id).first()
-            if from_user:
-                notification_out.from_user_name = from_user.username
-        result.append(notification_out)
-    
-    return result
+    return _page_with_from_user_names(db.query(Notification), skip, limit)
+
 
+def _run_broadcast_inline(broadcast_id: int):
+    db = SessionLocal()
+    try:
+        broadcasts.run_broadcast(db, broadcast_id, config.NOTIFICATION_BROADCAST_CHUNK_SIZE)
+    finally:
+        db.close()
 
+
+# Plain def: creating the row and the blocking broker publish run in the threadpool
 @router.post("/admin/broadcast", response_model=dict)
-async def broadcast_notification(
+def broadcast_notification(
     title: str,
     message: str,
+    background_tasks: BackgroundTasks,
     notification_type: str = "general",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Broadcast notification to all users (admin only)"""
+    """
+    Broadcast notification to all users (admin only).
+    Queues a background job; poll /admin/broadcast/{broadcast_id} for progress.
+    """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    users = db.query(User).filter(User.role == "customer").all()
-    
-    notifications_created = 0
-    for user in users:
-        notification_data = NotificationCreate(
-            user_id=user.id,
-            title=title,
-            message=message,
-            type=notification_type,
-            from_user_id=current_user.id
-        )
-        await create_notification_service(db, notification_data)
-        notifications_created += 1
-    
-    return {"message": f"Broadcast sent to {notifications_created} users"}
\ No newline at end of file
+    broadcast = broadcasts.create_broadcast(db, title, message, notification_type, current_user.id)
+
+    try:
+        broadcast_notification_task.delay(broadcast.id)
+    except Exception as celery_error:
+        print(f"Celery not available, running broadcast {broadcast.id} in-process: {celery_error}")
+        background_tasks.add_task(_run_broadcast_inline, broadcast.id)
+
+    return {
+        "message": f"Broadcast queued for {broadcast.total_recipients} users",
+        "broadcast_id": broadcast.id,
+        "status": broadcast.status
+    }
+
+
+@router.get("/admin/broadcast/{broadcast_id}", response_model=NotificationBroadcastOut)
+async def get_broadcast_progress(
+    broadcast_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Progress of a broadcast job (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    broadcast = db.query(NotificationBroadcast).filter(NotificationBroadcast.id == broadcast_id).first()
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+
+    return broadcast
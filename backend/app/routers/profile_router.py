@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import User
 from ..schemas import UserOut, UserUpdate, PasswordChange
 from ..utils import get_current_user, hash_password, verify_password
-from ..qr_utils import generate_user_qr_code, generate_user_qr_hash
+from ..qr_utils import generate_user_qr_code, generate_user_qr_token
+from .. import user_cache
 
 router = APIRouter(prefix="/profile", tags=["Profile"]) 
 
@@ -54,6 +55,7 @@ def update_profile(
         user.address = profile_data.address
 
     db.commit()
+    user_cache.invalidate_user(user.id)
     db.refresh(user)
 
     return user
@@ -84,17 +86,20 @@ def change_password(
     # Update password
     user.hashed_password = hashed_new_password
     db.commit()
+    user_cache.invalidate_user(user.id)
 
     return {"message": "Password changed successfully"}
 
 @router.get("/qr-code")
 def get_user_qr_code(
+    qr_format: str = Query("png", pattern="^(png|svg)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate a unique QR code for the current user.
     The QR code will always be the same for the same user.
+    qr_format=svg returns the SVG markup instead of a base64 PNG.
     """
     # Re-fetch user to ensure we have complete data
     user = db.query(User).filter(User.id == current_user.id).first()
@@ -109,12 +114,13 @@ def get_user_qr_code(
     }
     
     # Generate QR code
-    qr_code_base64 = generate_user_qr_code(user.id, user_data)
-    qr_hash = generate_user_qr_hash(user.id)
+    qr_code_base64 = generate_user_qr_code(user.id, user_data, qr_format=qr_format)
+    qr_hash = generate_user_qr_token(user.id)
     
     return {
         "user_id": user.id,
         "qr_code": qr_code_base64,
+        "qr_format": qr_format,
         "qr_hash": qr_hash,
         "message": "QR code generated successfully"
     }
@@ -127,7 +133,7 @@ def get_qr_info(
     Get QR code information without generating the full image.
     Useful for getting just the hash or checking QR status.
     """
-    qr_hash = generate_user_qr_hash(current_user.id)
+    qr_hash = generate_user_qr_token(current_user.id)
     
     return {
         "user_id": current_user.id,
@@ -4,7 +4,8 @@ from pydantic import BaseModel
 from ..database import get_db
 from ..models import User, Account
 from ..utils import get_current_user
-from ..qr_utils import generate_user_qr_code, generate_user_qr_hash, verify_qr_code, generate_account_qr_hash
+from ..qr_utils import generate_user_qr_code, generate_user_qr_token, verify_qr_code, verify_user_qr_hash, verify_account_qr_hash, \
+    build_user_qr_url, qr_png, qr_svg, qr_image_response
 from typing import Optional
 import json
 from urllib.parse import urlparse, parse_qs
@@ -17,12 +18,14 @@ router = APIRouter(prefix="/qr", tags=["QR Codes"])
 @router.get("/generate/{user_id}")
 def generate_qr_for_user(
     user_id: int,
+    qr_format: str = Query("png", pattern="^(png|svg)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Generate QR code for a specific user. 
     Users can only generate their own QR code, admins can generate for any user.
+    qr_format=svg returns the SVG markup instead of a base64 PNG.
     """
     # Check if user is requesting their own QR or if they're admin
     if current_user.id != user_id and current_user.role != "admin":
@@ -44,38 +47,73 @@ def generate_qr_for_user(
     }
     
     # Generate QR code with payment URL
-    qr_code_base64 = generate_user_qr_code(target_user.id, user_data, "http://localhost:3000")
-    qr_hash = generate_user_qr_hash(target_user.id)
+    qr_code_base64 = generate_user_qr_code(target_user.id, user_data, "http://localhost:3000", qr_format)
+    qr_hash = generate_user_qr_token(target_user.id)
     
     return {
         "user_id": target_user.id,
         "username": target_user.username,
         "full_name": target_user.full_name,
         "qr_code": qr_code_base64,
+        "qr_format": qr_format,
         "qr_hash": qr_hash,
         "generated_by": current_user.id,
         "message": "QR code generated successfully"
     }
 
+@router.get("/generate/{user_id}/image")
+def get_user_qr_image(
+    user_id: int,
+    request: Request,
+    qr_format: str = Query("png", pattern="^(png|svg)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Raw image/png (or image/svg+xml with qr_format=svg) variant of
+    /qr/generate/{user_id}, same access rules. The ETag is the digest of the
+    QR content, so unchanged codes answer 304.
+    """
+    if current_user.id != user_id and current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only generate QR code for your own account"
+        )
+    
+    target_user = db.query(User).filter(User.id == user_id).first()
+    if not target_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    
+    user_data = {
+        "full_name": target_user.full_name,
+        "email": target_user.email,
+        "username": target_user.username
+    }
+    qr_content = build_user_qr_url(target_user.id, user_data, "http://localhost:3000")
+    if qr_format == "svg":
+        svg, digest = qr_svg(qr_content)
+        return qr_image_response(request, svg, digest, "image/svg+xml")
+    png, digest = qr_png(qr_content)
+    return qr_image_response(request, png, digest)
+
 @router.get("/verify/{user_id}")
 def verify_user_qr(
     user_id: int,
     qr_hash: str = Query(..., description="QR hash to verify"),
+    include_user_info: bool = Query(True, description="Look up the user's display data"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Verify if a QR hash belongs to the specified user.
+    Verify if a QR hash (signed token or legacy hash) belongs to the specified user.
+    The check itself needs no database access; the user is only looked up
+    for user_info.
     """
-    # Generate expected hash for the user
-    expected_hash = generate_user_qr_hash(user_id)
-    
-    # Check if the provided hash matches
-    is_valid = qr_hash == expected_hash
+    is_valid = verify_user_qr_hash(user_id, qr_hash)
     
     # Get user info if valid
     user_info = None
-    if is_valid:
+    if is_valid and include_user_info:
         target_user = db.query(User).filter(User.id == user_id).first()
         if target_user:
             user_info = {
@@ -126,24 +164,22 @@ def decode_qr_data(
                 # Account QR code
                 account_id = int(account_id)
                 
-                # Get account details
-                target_account = db.query(Account).filter(Account.id == account_id).first()
-                if not target_account:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="Account not found"
-                    )
-                
-                # Verify the QR hash
-                expected_hash = generate_account_qr_hash(account_id)
-                if qr_hash != expected_hash:
+                # Verify the QR hash first, so tampered codes never reach the database
+                if not verify_account_qr_hash(account_id, qr_hash):
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Invalid or tampered QR code"
                     )
                 
-                # Get user who owns the account
-                target_user = db.query(User).filter(User.id == target_account.user_id).first()
+                # Get account details and the user who owns it in one query
+                row = db.query(Account, User).join(User, User.id == Account.user_id) \
+                    .filter(Account.id == account_id).first()
+                if not row:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Account not found"
+                    )
+                target_account, target_user = row
                 
                 return {
                     "valid": True,
@@ -171,6 +207,13 @@ def decode_qr_data(
                 
                 user_id = int(user_id)
                 
+                # Verify the QR hash first, so tampered codes never reach the database
+                if not verify_user_qr_hash(user_id, qr_hash):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid or tampered QR code"
+                    )
+                
                 # Get user details
                 target_user = db.query(User).filter(User.id == user_id).first()
                 if not target_user:
@@ -179,14 +222,6 @@ def decode_qr_data(
                         detail="User not found"
                     )
                 
-                # Verify the QR hash
-                expected_hash = generate_user_qr_hash(user_id)
-                if qr_hash != expected_hash:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Invalid or tampered QR code"
-                    )
-                
                 return {
                     "valid": True,
                     "qr_type": "user",
@@ -211,6 +246,13 @@ def decode_qr_data(
                     detail="Invalid QR code format"
                 )
             
+            # Verify the QR hash first, so tampered codes never reach the database
+            if not verify_user_qr_hash(user_id, qr_hash):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid or tampered QR code"
+                )
+            
             # Get user details
             target_user = db.query(User).filter(User.id == user_id).first()
             if not target_user:
@@ -219,14 +261,6 @@ def decode_qr_data(
                     detail="User not found"
                 )
             
-            # Verify the QR hash
-            expected_hash = generate_user_qr_hash(user_id)
-            if qr_hash != expected_hash:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid or tampered QR code"
-                )
-            
             return {
                 "valid": True,
                 "qr_type": "user",
@@ -273,7 +307,7 @@ def get_all_user_qr_info(
     
     user_qr_list = []
     for user in users:
-        qr_hash = generate_user_qr_hash(user.id)
+        qr_hash = generate_user_qr_token(user.id)
         user_qr_list.append({
             "user_id": user.id,
             "username": user.username,
@@ -313,7 +347,7 @@ def get_user_qr_info_by_id(
     if not target_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    qr_hash = generate_user_qr_hash(target_user.id)
+    qr_hash = generate_user_qr_token(target_user.id)
     
     return {
         "user_id": target_user.id,
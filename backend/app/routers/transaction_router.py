@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import base64
+from datetime import date, datetime, time, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, union_all, tuple_, or_
+from sqlalchemy.orm import Session, aliased
 from pydantic import BaseModel
 from ..schemas import TransactionCreate, TransactionOut
 from ..database import get_db
-from ..models import Account, Transaction
+from ..models import Account, Transaction, User, BOOKKEEPING_KINDS
 from ..rabbitmq import publish_event
 from ..utils import get_current_user
 from ..tasks import process_transaction
@@ -65,41 +68,93 @@ def initiate_transaction(txn: TransactionCreate,
 
     return new_txn
 
+def _encode_cursor(txn: Transaction) -> str:
+    raw = f"{txn.timestamp.isoformat()}|{txn.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, txn_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(txn_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _newest_first(columns):
+    return [columns.timestamp.desc(), columns.id.desc()]
+
+
 @router.get("/me", response_model=list[TransactionOut])
-def get_my_transactions(db: Session = Depends(get_db),
+def get_my_transactions(response: Response,
+                        limit: int = Query(50, ge=1, le=200),
+                        cursor: Optional[str] = None,
+                        from_date: Optional[date] = None,
+                        to_date: Optional[date] = None,
+                        min_amount: Optional[float] = None,
+                        max_amount: Optional[float] = None,
+                        status: Optional[str] = None,
+                        db: Session = Depends(get_db),
                         current_user = Depends(get_current_user)):
-    """Get all transactions where user's accounts are involved (as source or destination)"""
-    
+    """
+    Transactions where user's accounts are involved (as source or destination), newest first.
+
+    Returns at most `limit` rows. When there are more, the X-Next-Cursor
+    header carries the cursor for the next page; pass it back as `cursor`.
+    """
     # Get all account IDs owned by the user
-    user_account_ids = [acc.id for acc in db.query(Account).filter(Account.user_id == current_user.id).all()]
-    
+    user_account_ids = [acc_id for (acc_id,) in db.query(Account.id).filter(Account.user_id == current_user.id).all()]
+
     if not user_account_ids:
         return []
-    
-    # Fetch transactions where user's accounts are either source or destination
-    transactions = db.query(Transaction).filter(
-        (Transaction.src_account.in_(user_account_ids)) | 
-        (Transaction.dest_account.in_(user_account_ids))
-    ).order_by(Transaction.timestamp.desc()).all()
-
-    # Build response list including source/destination usernames for frontend display
-    result = []
-    for txn in transactions:
-        src_user_name = None
-        dest_user_name = None
-        try:
-            if txn.src_acc_rel and txn.src_acc_rel.owner:
-                src_user_name = txn.src_acc_rel.owner.username
-        except Exception:
-            src_user_name = None
 
-        try:
-            if txn.dest_acc_rel and txn.dest_acc_rel.owner:
-                dest_user_name = txn.dest_acc_rel.owner.username
-        except Exception:
-            dest_user_name = None
+    # FD, EMI and adjustment movements only appear on account statements
+    filters = [Transaction.kind.notin_(BOOKKEEPING_KINDS)]
+    if cursor:
+        after_timestamp, after_id = _decode_cursor(cursor)
+        filters.append(tuple_(Transaction.timestamp, Transaction.id) < tuple_(after_timestamp, after_id))
+    if from_date:
+        filters.append(Transaction.timestamp >= datetime.combine(from_date, time.min))
+    if to_date:
+        filters.append(Transaction.timestamp < datetime.combine(to_date + timedelta(days=1), time.min))
+    if min_amount is not None:
+        filters.append(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        filters.append(Transaction.amount <= max_amount)
+    if status:
+        filters.append(Transaction.status == status.upper())
 
-        result.append({
+    # One branch per side, each an ordered range scan of its (account, timestamp, id)
+    # index that stops after limit + 1 rows; transfers between the user's own
+    # accounts are only taken from the sent side
+    sent = select(Transaction.id, Transaction.timestamp).where(
+        Transaction.src_account.in_(user_account_ids), *filters
+    ).order_by(*_newest_first(Transaction)).limit(limit + 1).subquery()
+    received = select(Transaction.id, Transaction.timestamp).where(
+        Transaction.dest_account.in_(user_account_ids),
+        or_(Transaction.src_account.is_(None), Transaction.src_account.notin_(user_account_ids)),
+        *filters
+    ).order_by(*_newest_first(Transaction)).limit(limit + 1).subquery()
+    merged = union_all(select(sent.c.id, sent.c.timestamp), select(received.c.id, received.c.timestamp)).subquery()
+    page = select(merged.c.id).order_by(*_newest_first(merged.c)).limit(limit + 1).subquery()
+
+    # Counterparty names come from the same statement instead of lazy loads per row
+    SrcAccount, DestAccount = aliased(Account), aliased(Account)
+    SrcUser, DestUser = aliased(User), aliased(User)
+    rows = db.query(Transaction, SrcUser.username, DestUser.username) \
+        .join(page, page.c.id == Transaction.id) \
+        .outerjoin(SrcAccount, SrcAccount.id == Transaction.src_account) \
+        .outerjoin(SrcUser, SrcUser.id == SrcAccount.user_id) \
+        .outerjoin(DestAccount, DestAccount.id == Transaction.dest_account) \
+        .outerjoin(DestUser, DestUser.id == DestAccount.user_id) \
+        .order_by(*_newest_first(Transaction)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1][0])
+
+    return [
+        {
             "id": txn.id,
             "src_account": txn.src_account,
             "dest_account": txn.dest_account,
@@ -108,9 +163,9 @@ def get_my_transactions(db: Session = Depends(get_db),
             "timestamp": txn.timestamp,
             "src_user_name": src_user_name,
             "dest_user_name": dest_user_name
-        })
-
-    return result
+        }
+        for txn, src_user_name, dest_user_name in rows
+    ]
 
 
 @router.post("/qr-transfer", response_model=TransactionOut)
@@ -243,8 +298,9 @@ def get_transaction(txn_id: int,
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    # Confirm the user owns the source account
-    if txn.src_acc_rel.user_id != current_user.id:
+    # Confirm the user owns the source account (or the destination, for credits without one)
+    owner_account = txn.src_acc_rel or txn.dest_acc_rel
+    if owner_account is None or owner_account.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this transaction")
 
     return txn
\ No newline at end of file
@@ -14,6 +14,7 @@ async def websocket_endpoint(
     token: str = Query(None)
 ):
     user_id = None
+    role = None
     
     # Try to authenticate user if token provided
     if token:
@@ -24,6 +25,7 @@ async def websocket_endpoint(
             try:
                 user = get_current_user_from_token(token, db)
                 user_id = user.id
+                role = user.role
             except:
                 pass  # Continue without authentication
             finally:
@@ -31,7 +33,7 @@ async def websocket_endpoint(
         except:
             pass
     
-    await manager.connect(websocket, user_id)
+    await manager.connect(websocket, user_id, role)
 
     try:
         while True:
@@ -42,14 +44,15 @@ async def websocket_endpoint(
                 
                 # Handle different message types
                 if message.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    manager.record_pong(websocket)
+                    await manager.send_to_connection(websocket, {"type": "pong"})
                 elif message.get("type") == "subscribe_notifications" and user_id:
                     # User is requesting to subscribe to notifications
-                    await websocket.send_text(json.dumps({
+                    await manager.send_to_connection(websocket, {
                         "type": "notification_subscription",
                         "status": "subscribed",
                         "user_id": user_id
-                    }))
+                    })
             except json.JSONDecodeError:
                 pass  # Ignore invalid JSON
                 
@@ -164,6 +164,7 @@ class FixedDepositCreate(BaseModel):
     start_date: date
     tenure_months: int
     account_id: int
+    auto_renew: bool = False
 
 
 class FixedDepositRenew(BaseModel):
@@ -172,6 +173,10 @@ class FixedDepositRenew(BaseModel):
     account_id: int
 
 
+class FixedDepositAutoRenew(BaseModel):
+    auto_renew: bool
+
+
 class FixedDepositOut(BaseModel):
     id: int
     fd_number: str
@@ -185,6 +190,8 @@ class FixedDepositOut(BaseModel):
     status: str
     approval_status: str
     maturity_amount: Optional[float] = None
+    auto_renew: bool = False
+    matured_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -374,4 +381,50 @@ class NotificationUpdate(BaseModel):
 
 class NotificationStats(BaseModel):
     total_count: int
-    unread_count: int
\ No newline at end of file
+    unread_count: int
+
+
+class NotificationBroadcastOut(BaseModel):
+    id: int
+    title: str
+    type: str
+    status: str
+    total_recipients: int
+    sent_count: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EmiRunOut(BaseModel):
+    id: int
+    run_date: date
+    status: str
+    total_loans: int
+    processed_count: int
+    debited_count: int
+    failed_count: int
+    debited_amount: float
+    partitions_total: int
+    partitions_done: int
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class EmiRunItemOut(BaseModel):
+    id: int
+    run_id: int
+    loan_id: int
+    status: str
+    amount: float
+    detail: Optional[str] = None
+    processed_at: datetime
+
+    class Config:
+        from_attributes = True
\ No newline at end of file
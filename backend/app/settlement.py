@@ -0,0 +1,246 @@
+"""
+settlement.py
+
+Batched settlement of pending transfers.
+
+In batched mode a single Celery message drains up to SETTLEMENT_BATCH_SIZE
+PENDING transactions, locks every account they touch once (always in id
+order to avoid deadlocks), applies each transfer inside its own savepoint so
+one bad transfer cannot poison the rest, and commits the whole batch with a
+single round-trip. Outcome events are returned to the caller so they can be
+published in bulk after the commit.
+"""
+from datetime import datetime
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+from .models import Transaction, Account, AuditLog, User, Notification
+from .sharding import queue_for_transfer
+from . import config
+
+
+def notification_payload(notification: Notification, from_user_name: str = None) -> dict:
+    """Serialize a freshly flushed Notification for real-time delivery"""
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "title": notification.title,
+        "message": notification.message,
+        "type": notification.type,
+        "related_id": notification.related_id,
+        "is_read": False,
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+        "read_at": None,
+        "from_user_id": notification.from_user_id,
+        "from_user_name": from_user_name
+    }
+
+
+def build_transfer_notifications(db: Session, txn_id: int, amount: float,
+                                 src_acc: Account, dest_acc: Account,
+                                 src_user: User, dest_user: User) -> list:
+    """
+    Add sender/receiver notifications for a successful transfer to the session.
+
+    Returns a list of (notification, from_user_name) tuples; ids are only
+    available once the session has been flushed.
+    """
+    created = []
+
+    if src_user:
+        sender_notification = Notification(
+            user_id=src_user.id,
+            title="Transaction Sent",
+            message=f"You successfully sent ${amount:,.2f} to {dest_user.username if dest_user else 'Account ' + str(dest_acc.id)}. Your new balance is ${src_acc.balance:,.2f}.",
+            type="transaction",
+            related_id=txn_id
+        )
+        db.add(sender_notification)
+        created.append((sender_notification, None))
+
+    if dest_user and (not src_user or dest_user.id != src_user.id):
+        # Notification for receiver (only if different from sender)
+        receiver_notification = Notification(
+            user_id=dest_user.id,
+            title="Transaction Received",
+            message=f"You received ${amount:,.2f} from {src_user.username if src_user else 'Account ' + str(src_acc.id)}. Your new balance is ${dest_acc.balance:,.2f}.",
+            type="transaction",
+            related_id=txn_id,
+            from_user_id=src_user.id if src_user else None
+        )
+        db.add(receiver_notification)
+        created.append((receiver_notification, src_user.username if src_user else None))
+
+    return created
+
+
+def _shard_candidate_ids(db: Session, limit: int, first_txn_id: int, shard_queue: str) -> list:
+    """Ids of pending transfers that belong to `shard_queue` (looked up without taking locks)"""
+    candidates = db.query(Transaction.id, Transaction.src_account, Transaction.dest_account).filter(
+        Transaction.status == "PENDING",
+        Transaction.src_account.isnot(None),
+        Transaction.dest_account.isnot(None)
+    ).order_by(Transaction.id).limit(limit * max(config.TRANSACTION_SHARDS, 1)).all()
+
+    ids = [c.id for c in candidates if queue_for_transfer(c.src_account, c.dest_account) == shard_queue][:limit]
+    if first_txn_id is not None and first_txn_id not in ids:
+        ids = [first_txn_id] + ids[:limit - 1]
+    return ids
+
+
+def _claim_pending(db: Session, limit: int, first_txn_id: int = None, shard_queue: str = None) -> list:
+    """
+    Lock up to `limit` PENDING transactions. SKIP LOCKED lets several batch
+    workers drain the backlog side by side without waiting on each other.
+    The transaction that triggered the batch (if any) is claimed first.
+    With account sharding only transfers routed to `shard_queue` are claimed.
+    """
+    query = db.query(Transaction).filter(
+        Transaction.status == "PENDING",
+        Transaction.src_account.isnot(None),
+        Transaction.dest_account.isnot(None)
+    )
+
+    if shard_queue is not None:
+        query = query.filter(Transaction.id.in_(_shard_candidate_ids(db, limit, first_txn_id, shard_queue)))
+
+    if first_txn_id is not None:
+        query = query.order_by(case((Transaction.id == first_txn_id, 0), else_=1), Transaction.id)
+    else:
+        query = query.order_by(Transaction.id)
+
+    return query.with_for_update(skip_locked=True).limit(limit).all()
+
+
+def _apply_transfer(db: Session, txn: Transaction, accounts: dict, users: dict) -> dict:
+    """Apply a single claimed transfer. Caller owns the savepoint."""
+    src_acc = accounts.get(txn.src_account)
+    dest_acc = accounts.get(txn.dest_account)
+    amount = txn.amount
+
+    if not src_acc or not dest_acc:
+        txn.status = "FAILED"
+        return {"transaction_id": txn.id, "status": "FAILED", "reason": "account_not_found",
+                "src": txn.src_account, "dest": txn.dest_account, "amount": amount,
+                "src_user_id": src_acc.user_id if src_acc else None,
+                "dest_user_id": dest_acc.user_id if dest_acc else None, "notifications": []}
+
+    if src_acc.balance < amount:
+        txn.status = "FAILED"
+        db.add(AuditLog(
+            event_type="TRANSACTION_FAILED",
+            message=f"Insufficient balance for txn {txn.id}"
+        ))
+        return {"transaction_id": txn.id, "status": "FAILED", "reason": "insufficient_balance",
+                "src": txn.src_account, "dest": txn.dest_account, "amount": amount,
+                "src_user_id": src_acc.user_id, "dest_user_id": dest_acc.user_id, "notifications": []}
+
+    src_acc.balance -= amount
+    dest_acc.balance += amount
+
+    txn.status = "SUCCESS"
+    txn.timestamp = datetime.utcnow()
+
+    db.add(AuditLog(
+        event_type="TRANSACTION_SUCCESS",
+        message=f"Txn {txn.id}: {amount} transferred from {src_acc.id} to {dest_acc.id}"
+    ))
+
+    notifications = build_transfer_notifications(
+        db, txn.id, amount, src_acc, dest_acc,
+        users.get(src_acc.user_id), users.get(dest_acc.user_id)
+    )
+
+    return {"transaction_id": txn.id, "status": "SUCCESS", "src": src_acc.id, "dest": dest_acc.id,
+            "amount": amount, "new_src_balance": src_acc.balance, "new_dest_balance": dest_acc.balance,
+            "src_user_id": src_acc.user_id, "dest_user_id": dest_acc.user_id,
+            "notifications": notifications}
+
+
+def settle_batch(db: Session, limit: int, first_txn_id: int = None, shard_queue: str = None) -> list:
+    """
+    Settle up to `limit` pending transfers in a single DB transaction.
+
+    Returns one outcome dict per claimed transfer with its final status,
+    balances and serialized notifications. Nothing is published here; the
+    caller emits the outcomes after the commit has succeeded.
+    """
+    txns = _claim_pending(db, limit, first_txn_id, shard_queue)
+    if not txns:
+        db.rollback()
+        return []
+
+    # Lock every touched account once, in id order, for the whole batch
+    account_ids = sorted({t.src_account for t in txns} | {t.dest_account for t in txns})
+    accounts = {
+        acc.id: acc
+        for acc in db.query(Account).filter(Account.id.in_(account_ids)).order_by(Account.id).with_for_update().all()
+    }
+
+    user_ids = {acc.user_id for acc in accounts.values() if acc.user_id}
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+
+    outcomes = []
+    for txn in txns:
+        txn_id, src_id, dest_id, amount = txn.id, txn.src_account, txn.dest_account, txn.amount
+        savepoint = db.begin_nested()
+        try:
+            outcome = _apply_transfer(db, txn, accounts, users)
+            savepoint.commit()
+        except Exception as e:
+            print(f"Error settling transaction {txn_id} in batch: {e}")
+            savepoint.rollback()
+            txn.status = "FAILED"
+            outcome = {"transaction_id": txn_id, "status": "FAILED", "reason": "error",
+                       "src": src_id, "dest": dest_id, "amount": amount,
+                       "src_user_id": accounts[src_id].user_id if src_id in accounts else None,
+                       "dest_user_id": accounts[dest_id].user_id if dest_id in accounts else None,
+                       "notifications": []}
+
+        # Serialize while ids/created_at are still loaded; commit expires them
+        outcome["notifications"] = [
+            (n.user_id, notification_payload(n, from_name)) for n, from_name in outcome["notifications"]
+        ]
+        outcomes.append(outcome)
+
+    db.commit()
+    return outcomes
+
+
+def outcome_events(outcomes: list) -> list:
+    """
+    Translate settlement outcomes into real-time events.
+
+    Returns (user_ids, event) pairs: each event is only routed to the owners
+    of the accounts involved.
+    """
+    events = []
+    for outcome in outcomes:
+        src_user_id = outcome.get("src_user_id")
+        parties = {uid for uid in (src_user_id, outcome.get("dest_user_id")) if uid}
+
+        if outcome["status"] == "SUCCESS":
+            events.append((parties, {
+                "type": "transaction.success",
+                "transaction_id": outcome["transaction_id"],
+                "src": outcome["src"],
+                "dest": outcome["dest"],
+                "amount": outcome["amount"],
+                "new_src_balance": outcome["new_src_balance"],
+                "new_dest_balance": outcome["new_dest_balance"]
+            }))
+            if outcome["new_src_balance"] < 1000 and src_user_id:
+                events.append(({src_user_id}, {
+                    "type": "low_balance",
+                    "account_id": outcome["src"],
+                    "balance": outcome["new_src_balance"]
+                }))
+        elif src_user_id:
+            events.append(({src_user_id}, {
+                "type": "transaction.failed",
+                "transaction_id": outcome["transaction_id"],
+                "src": outcome["src"],
+                "dest": outcome["dest"],
+                "amount": outcome["amount"],
+                "reason": outcome.get("reason")
+            }))
+    return events
@@ -0,0 +1,145 @@
+"""
+sharding.py
+
+Account-sharded routing for process_transaction.
+
+Every transfer is mapped onto one of TRANSACTION_SHARDS Celery queues
+(transactions.shard.0 … transactions.shard.K-1) by consistent-hashing its
+lower account id. Running one worker per shard queue serializes transfers
+that touch the same hot account instead of having many workers pile up on
+the same with_for_update() row locks. With TRANSACTION_SHARDS=1 everything
+stays on the default 'celery' queue.
+
+Operational helpers:
+    python -m app.sharding depths                 # per-shard queue depth
+    python -m app.sharding rebalance --to 8       # accounts that move when K changes
+"""
+import argparse
+import bisect
+import hashlib
+from collections import Counter
+from . import config
+
+DEFAULT_QUEUE = "celery"
+SHARD_QUEUE_PREFIX = "transactions.shard"
+
+
+def shard_queue_name(shard: int) -> str:
+    return f"{SHARD_QUEUE_PREFIX}.{shard}"
+
+
+class ConsistentHashRing:
+    """Hash ring with virtual nodes so changing K only moves ~1/K of the accounts"""
+
+    def __init__(self, shard_count: int, vnodes: int = 64):
+        self.shard_count = shard_count
+        ring = sorted(
+            (self._hash(f"{shard_queue_name(shard)}#{v}"), shard_queue_name(shard))
+            for shard in range(shard_count)
+            for v in range(vnodes)
+        )
+        self._keys = [point for point, _ in ring]
+        self._queues = [queue for _, queue in ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def queue_for(self, account_id: int) -> str:
+        idx = bisect.bisect(self._keys, self._hash(str(account_id))) % len(self._keys)
+        return self._queues[idx]
+
+    @property
+    def queues(self) -> list:
+        return [shard_queue_name(shard) for shard in range(self.shard_count)]
+
+
+_ring = ConsistentHashRing(config.TRANSACTION_SHARDS, config.TRANSACTION_SHARD_VNODES) if config.TRANSACTION_SHARDS > 1 else None
+
+
+def shard_queues() -> list:
+    """All queues process_transaction can be routed to"""
+    return _ring.queues if _ring else [DEFAULT_QUEUE]
+
+
+def queue_for_transfer(src_account: int, dest_account: int) -> str:
+    """Queue owning a transfer, keyed by its lower account id"""
+    if not _ring:
+        return DEFAULT_QUEUE
+    return _ring.queue_for(min(src_account, dest_account))
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery router: send process_transaction to the shard queue of its accounts"""
+    if name != "process_transaction":
+        return None
+
+    payload = (args[0] if args else None) or (kwargs or {}).get("event_payload") or {}
+    src_id = payload.get("src_account")
+    dest_id = payload.get("dest_account")
+    if src_id is None or dest_id is None:
+        return None
+
+    return {"queue": queue_for_transfer(src_id, dest_id)}
+
+
+def rebalance_plan(account_ids, old_shards: int, new_shards: int) -> Counter:
+    """
+    Count how many accounts move between queues when the shard count changes.
+
+    Keys are (old_queue, new_queue) pairs; accounts that stay put are omitted.
+    """
+    def assign(shards):
+        ring = ConsistentHashRing(shards, config.TRANSACTION_SHARD_VNODES) if shards > 1 else None
+        return (lambda account_id: ring.queue_for(account_id)) if ring else (lambda account_id: DEFAULT_QUEUE)
+
+    old_queue_for, new_queue_for = assign(old_shards), assign(new_shards)
+    moves = Counter()
+    for account_id in account_ids:
+        old_queue, new_queue = old_queue_for(account_id), new_queue_for(account_id)
+        if old_queue != new_queue:
+            moves[(old_queue, new_queue)] += 1
+    return moves
+
+
+def shard_queue_depths() -> list:
+    """Ready-message and consumer counts for every shard queue"""
+    from .rabbitmq import publisher
+    return publisher.queue_stats(shard_queues())
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Transaction shard tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("depths", help="Show queue depth per shard")
+    rebalance = sub.add_parser("rebalance", help="Show which accounts move when the shard count changes")
+    rebalance.add_argument("--from", dest="old_shards", type=int, default=config.TRANSACTION_SHARDS)
+    rebalance.add_argument("--to", dest="new_shards", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == "depths":
+        for stat in shard_queue_depths():
+            print(f"{stat['queue']}: depth={stat['depth']} consumers={stat['consumers']}")
+        return
+
+    from .database import SessionLocal
+    from .models import Account
+
+    db = SessionLocal()
+    try:
+        account_ids = [row.id for row in db.query(Account.id).yield_per(10000)]
+    finally:
+        db.close()
+
+    moves = rebalance_plan(account_ids, args.old_shards, args.new_shards)
+    moved = sum(moves.values())
+    print(f"{moved} of {len(account_ids)} accounts change queue going from {args.old_shards} to {args.new_shards} shards")
+    for (old_queue, new_queue), count in sorted(moves.items()):
+        print(f"  {old_queue} -> {new_queue}: {count}")
+    if moved:
+        print("Start workers for the new queues, then let the old queues drain before stopping their workers.")
+        print("Row locks keep balances correct while both generations of workers overlap.")
+
+
+if __name__ == "__main__":
+    _main()
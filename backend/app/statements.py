@@ -0,0 +1,142 @@
+"""
+statements.py
+
+Streaming account statements (CSV or NDJSON) with a running balance.
+
+Rows are read oldest first through a server-side cursor (yield_per) in a
+session owned by the generator, and written out in small chunks, so memory
+use does not depend on how much history the account has. The opening
+balance is derived once from the current balance minus the net effect of
+the settled (SUCCESS) transactions in the exported window. It is read in
+the same session as the rows, inside one REPEATABLE READ transaction on
+PostgreSQL, so settlements committing mid-export cannot skew the running
+balance. Every balance change (transfers, FD create/renew/cancel/maturity,
+loan disbursal and EMI debits, admin adjustments) writes a SUCCESS
+transaction, which is what makes the derivation exact; the "kind" column
+tells transfers from those bookkeeping movements.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select, union_all, literal, func, case, or_
+from sqlalchemy.orm import Session, aliased
+from .models import Account, Transaction
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COLUMNS = ["transaction_id", "timestamp", "kind", "direction", "counterparty_account", "amount", "status", "balance"]
+FETCH_SIZE = 1000
+CHUNK_ROWS = 500
+
+
+def _window(since: datetime = None, until: datetime = None) -> list:
+    conditions = []
+    if since is not None:
+        conditions.append(Transaction.timestamp >= since)
+    if until is not None:
+        conditions.append(Transaction.timestamp < until)
+    return conditions
+
+
+def opening_balance(db: Session, account_id: int, since: datetime = None) -> float:
+    """Balance before the first transaction at or after `since` (or before all history)"""
+    balance = db.query(Account.balance).filter(Account.id == account_id).scalar()
+    net = db.query(func.coalesce(func.sum(case(
+        (Transaction.src_account == Transaction.dest_account, 0),
+        (Transaction.dest_account == account_id, Transaction.amount),
+        else_=-Transaction.amount
+    )), 0)).filter(
+        or_(Transaction.src_account == account_id, Transaction.dest_account == account_id),
+        Transaction.status == "SUCCESS",
+        *_window(since)
+    ).scalar()
+    return (balance or 0.0) - float(net)
+
+
+def _statement_query(account_id: int, since: datetime = None, until: datetime = None):
+    # Debits and credits come from the (src_account, ...) and (dest_account, ...)
+    # indexes, both already in timestamp order; transfers to the same account
+    # are listed once, as a debit that nets to zero
+    counterparty = aliased(Account)
+    debits = select(
+        Transaction.id, Transaction.timestamp, Transaction.kind, literal("debit").label("direction"),
+        counterparty.account_number.label("counterparty_account"), Transaction.amount, Transaction.status,
+        (Transaction.dest_account == Transaction.src_account).label("internal")
+    ).outerjoin(counterparty, counterparty.id == Transaction.dest_account).where(
+        Transaction.src_account == account_id, *_window(since, until)
+    )
+    credits = select(
+        Transaction.id, Transaction.timestamp, Transaction.kind, literal("credit").label("direction"),
+        counterparty.account_number.label("counterparty_account"), Transaction.amount, Transaction.status,
+        literal(False).label("internal")
+    ).outerjoin(counterparty, counterparty.id == Transaction.src_account).where(
+        Transaction.dest_account == account_id,
+        or_(Transaction.src_account.is_(None), Transaction.src_account != account_id),
+        *_window(since, until)
+    )
+    rows = union_all(debits, credits).subquery()
+    return select(rows).order_by(rows.c.timestamp, rows.c.id)
+
+
+def _records(session_factory, account_id: int, since: datetime, until: datetime):
+    db = session_factory()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # One snapshot for the balance, the window's net and the rows
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        balance = opening_balance(db, account_id, since)
+        result = db.execute(_statement_query(account_id, since, until).execution_options(yield_per=FETCH_SIZE))
+        for row in result:
+            if row.status == "SUCCESS" and not row.internal:
+                balance += row.amount if row.direction == "credit" else -row.amount
+            yield {
+                "transaction_id": row.id,
+                "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                "kind": row.kind,
+                "direction": row.direction,
+                "counterparty_account": row.counterparty_account,
+                "amount": row.amount,
+                "status": row.status,
+                "balance": round(balance, 2)
+            }
+    finally:
+        db.close()
+
+
+def _chunks(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= CHUNK_ROWS:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def _csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record) + "\n"
+
+
+def stream_statement(session_factory, account_id: int, fmt: str,
+                     since: datetime = None, until: datetime = None):
+    """
+    Iterator of text chunks for a StreamingResponse. `session_factory` opens
+    the session used for the cursor, which lives as long as the stream does.
+    """
+    records = _records(session_factory, account_id, since, until)
+    lines = _csv_lines(records) if fmt == "csv" else _ndjson_lines(records)
+    return _chunks(lines)
@@ -1,5 +1,4 @@
 import os
-import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -10,10 +9,14 @@ from sqlalchemy.orm import sessionmaker
 # App imports
 from .celery_app import celery_app
 from .models import Transaction, Account, AuditLog, User, Notification
-from app.websocket_manager import manager
+from .settlement import settle_batch, outcome_events, build_transfer_notifications, notification_payload
+from .sharding import queue_for_transfer
+from .admin_stats import rebuild_counters
+from .rollups import rebuild_daily_rollup
+from .broadcasts import run_broadcast
+from .emi import start_run, process_chunk, finish_partition
+from . import config, rabbitmq, notification_counters  # noqa: F401 - registers the notification counter hooks
 
-import pika
-import json
 
 load_dotenv()
 
@@ -24,6 +27,13 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 @celery_app.task(name="process_transaction")
 def process_transaction(event_payload: dict):
+    if config.SETTLEMENT_MODE == "batched":
+        # The triggering transfer is settled together with whatever else is pending on its shard
+        shard_queue = None
+        if config.TRANSACTION_SHARDS > 1 and event_payload.get("src_account") and event_payload.get("dest_account"):
+            shard_queue = queue_for_transfer(event_payload["src_account"], event_payload["dest_account"])
+        return settle_pending_transactions(event_payload.get("transaction_id"), shard_queue)
+
     db = SessionLocal()
 
     try:
@@ -96,113 +106,33 @@ def process_transaction(event_payload: dict):
         src_user = db.query(User).filter(User.id == src_acc.user_id).first()
         dest_user = db.query(User).filter(User.id == dest_acc.user_id).first()
 
-        sender_notification = None
-        receiver_notification = None
-
-        if src_user:
-            # Notification for sender
-            sender_notification = Notification(
-                user_id=src_user.id,
-                title="Transaction Sent",
-                message=f"You successfully sent ${amount:,.2f} to {dest_user.username if dest_user else 'Account ' + str(dest_id)}. Your new balance is ${src_acc.balance:,.2f}.",
-                type="transaction",
-                related_id=txn_id
-            )
-            db.add(sender_notification)
-            print(f"Created sender notification for user {src_user.id}")
-
-        if dest_user and (not src_user or dest_user.id != src_user.id):
-            # Notification for receiver (only if different from sender)
-            receiver_notification = Notification(
-                user_id=dest_user.id,
-                title="Transaction Received",
-                message=f"You received ${amount:,.2f} from {src_user.username if src_user else 'Account ' + str(src_id)}. Your new balance is ${dest_acc.balance:,.2f}.",
-                type="transaction",
-                related_id=txn_id,
-                from_user_id=src_user.id if src_user else None
-            )
-            db.add(receiver_notification)
-            print(f"Created receiver notification for user {dest_user.id}")
+        notifications = build_transfer_notifications(db, txn_id, amount, src_acc, dest_acc, src_user, dest_user)
+
+        db.flush()
+        realtime_messages = [
+            (n.user_id, notification_payload(n, from_name)) for n, from_name in notifications
+        ]
 
         db.commit()
         print(f"Notifications committed to database for transaction {txn_id}")
         
-        # Send real-time notifications via WebSocket
-        if sender_notification and src_user:
-            try:
-                print(f"Sending WebSocket notification to sender user {src_user.id}")
-                asyncio.run(manager.send_personal_message(
-                    message={
-                        "type": "notification",
-                        "data": {
-                            "id": sender_notification.id,
-                            "user_id": sender_notification.user_id,
-                            "title": sender_notification.title,
-                            "message": sender_notification.message,
-                            "type": sender_notification.type,
-                            "related_id": sender_notification.related_id,
-                            "is_read": False,
-                            "created_at": sender_notification.created_at.isoformat(),
-                            "read_at": None,
-                            "from_user_id": None,
-                            "from_user_name": None
-                        }
-                    },
-                    user_id=src_user.id
-                ))
-                print(f"WebSocket notification sent to sender user {src_user.id}")
-            except Exception as e:
-                print(f"Failed to send real-time notification to sender: {e}")
-
-        if receiver_notification and dest_user and (not src_user or dest_user.id != src_user.id):
-            try:
-                print(f"Sending WebSocket notification to receiver user {dest_user.id}")
-                asyncio.run(manager.send_personal_message(
-                    message={
-                        "type": "notification",
-                        "data": {
-                            "id": receiver_notification.id,
-                            "user_id": receiver_notification.user_id,
-                            "title": receiver_notification.title,
-                            "message": receiver_notification.message,
-                            "type": receiver_notification.type,
-                            "related_id": receiver_notification.related_id,
-                            "is_read": False,
-                            "created_at": receiver_notification.created_at.isoformat(),
-                            "read_at": None,
-                            "from_user_id": receiver_notification.from_user_id,
-                            "from_user_name": src_user.username if src_user else None
-                        }
-                    },
-                    user_id=dest_user.id
-                ))
-                print(f"WebSocket notification sent to receiver user {dest_user.id}")
-            except Exception as e:
-                print(f"Failed to send real-time notification to receiver: {e}")
-        
         print(f"Processed transaction {txn_id}: SUCCESS")
-        # --- Publish SUCCESS event to RabbitMQ ---
-        publish_ws_event({
-    "type": "transaction.success",
-    "transaction_id": txn_id,
-    "src": src_id,
-    "dest": dest_id,
-    "amount": amount,
-    "new_src_balance": src_acc.balance,
-    "new_dest_balance": dest_acc.balance
-})
-
-# --- Publish LOW BALANCE event ---
-        if src_acc.balance < 1000:
-         publish_ws_event({
-        "type": "low_balance",
-        "account_id": src_id,
-        "balance": src_acc.balance
-    })
-
-        # 5. WebSocket Notification (Moved INSIDE the function)
-        # We use asyncio.run() because Celery is synchronous, but the manager is async
-
+        # --- Publish notifications and SUCCESS / LOW BALANCE events to RabbitMQ ---
+        with rabbitmq.publisher.batch():
+            for user_id, data in realtime_messages:
+                _send_realtime_notification(user_id, data)
+
+            publish_ws_events(outcome_events([{
+                "transaction_id": txn_id,
+                "status": "SUCCESS",
+                "src": src_id,
+                "dest": dest_id,
+                "amount": amount,
+                "new_src_balance": src_acc.balance,
+                "new_dest_balance": dest_acc.balance,
+                "src_user_id": src_acc.user_id,
+                "dest_user_id": dest_acc.user_id
+            }]))
 
     except Exception as e:
         print(f"Error processing transaction {event_payload.get('transaction_id')}: {e}")
@@ -211,159 +141,198 @@ def process_transaction(event_payload: dict):
 
     finally:
         db.close()
-def publish_ws_event(event: dict):
-    connection = pika.BlockingConnection(pika.ConnectionParameters("127.0.0.1"))
-    channel = connection.channel()
 
-    channel.exchange_declare(exchange="ws_events", exchange_type="fanout", durable=True)
+def _send_realtime_notification(user_id: int, data: dict):
+    # Workers hold no sockets; the API process the user is connected to delivers it
+    try:
+        rabbitmq.publish_user_event(user_id, {"type": "notification", "data": data})
+    except Exception as e:
+        print(f"Failed to send real-time notification to user {user_id}: {e}")
 
-    channel.basic_publish(
-        exchange="ws_events",
-        routing_key="",
-        body=json.dumps(event)
-    )
 
-    connection.close()
+@celery_app.task(name="settle_pending_transactions")
+def settle_pending_transactions(first_txn_id: int = None, shard_queue: str = None):
+    """Batched settlement: drain up to SETTLEMENT_BATCH_SIZE pending transfers in one DB transaction"""
+    db = SessionLocal()
+    try:
+        outcomes = settle_batch(db, config.SETTLEMENT_BATCH_SIZE, first_txn_id, shard_queue)
+    except Exception as e:
+        print(f"Error settling transaction batch: {e}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+    if not outcomes:
+        return 0
+
+    succeeded = sum(1 for o in outcomes if o["status"] == "SUCCESS")
+    print(f"Settled batch of {len(outcomes)} transactions: {succeeded} SUCCESS, {len(outcomes) - succeeded} FAILED")
+
+    try:
+        with rabbitmq.publisher.batch():
+            for outcome in outcomes:
+                for user_id, data in outcome["notifications"]:
+                    _send_realtime_notification(user_id, data)
+            publish_ws_events(outcome_events(outcomes))
+    except Exception as e:
+        print(f"Failed to publish settlement events: {e}")
+
+    return len(outcomes)
+
+
+def publish_ws_events(routed_events: list):
+    """Publish (user_ids, event) pairs in one batching window (one channel, one flush)"""
+    with rabbitmq.publisher.batch():
+        for user_ids, event in routed_events:
+            for user_id in user_ids:
+                rabbitmq.publish_user_event(user_id, event)
+
 
 @celery_app.task(name="auto_debit_loan_emi")
-def auto_debit_loan_emi():
-    """Scheduled task to auto-debit EMI from linked accounts on due dates"""
-    from .models import Loan
+def auto_debit_loan_emi(run_date: str = None):
+    """
+    Scheduled task to auto-debit EMI from linked accounts on due dates.
+    Starts (or resumes) the EMI run for `run_date` (ISO date, default today)
+    and fans its loan id ranges out to process_emi_partition.
+    """
     from datetime import date
-    
+
     db = SessionLocal()
     try:
-        # Get all active loans where next_due_date is today or past
-        today = date.today()
-        due_loans = db.query(Loan).filter(
-            Loan.status == "ACTIVE",
-            Loan.next_due_date <= today
-        ).all()
-        
-        for loan in due_loans:
+        run, ranges = start_run(db, date.fromisoformat(run_date) if run_date else date.today(), config.EMI_PARTITIONS)
+        for first_loan_id, last_loan_id in ranges:
+            process_emi_partition.delay(run.id, first_loan_id, last_loan_id, run.generation)
+        print(f"EMI run {run.id} for {run.run_date}: {run.total_loans} due loans in {len(ranges)} partitions")
+        return run.id
+    except Exception as e:
+        print(f"Error in auto_debit_loan_emi task: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+# acks_late: a partition whose worker dies is re-delivered and resumes from its ledger
+@celery_app.task(name="process_emi_partition", acks_late=True)
+def process_emi_partition(run_id: int, first_loan_id: int, last_loan_id: int, generation: int = 0):
+    """Debit the due loans of one loan id range, EMI_CHUNK_SIZE per DB transaction"""
+    db = SessionLocal()
+    processed = 0
+    try:
+        while True:
+            outcomes = process_chunk(db, run_id, first_loan_id, last_loan_id, config.EMI_CHUNK_SIZE)
+            if not outcomes:
+                break
+            processed += len(outcomes)
+
             try:
-                # Get the linked account
-                account = db.query(Account).filter(
-                    Account.id == loan.account_ref
-                ).with_for_update().first()
-                
-                if not account:
-                    print(f"Account {loan.account_ref} not found for loan {loan.id}")
-                    # Create notification for user about failed auto-debit
-                    notification = Notification(
-                        user_id=loan.user_id,
-                        title="Loan EMI Auto-Debit Failed",
-                        message=f"Unable to debit EMI of ${loan.emi:,.2f} for your {loan.loan_type} loan. Linked account not found.",
-                        type="loan_payment",
-                        related_id=loan.id
-                    )
-                    db.add(notification)
-                    continue
-                
-                # Check if account has sufficient balance
-                if account.balance < loan.emi:
-                    print(f"Insufficient balance in account {account.id} for loan {loan.id}. Required: {loan.emi}, Available: {account.balance}")
-                    # Create notification for user
-                    notification = Notification(
-                        user_id=loan.user_id,
-                        title="Loan EMI Auto-Debit Failed",
-                        message=f"Insufficient balance to debit EMI of ${loan.emi:,.2f} for your {loan.loan_type} loan. Available balance: ${account.balance:,.2f}. Please maintain sufficient balance.",
-                        type="loan_payment",
-                        related_id=loan.id
-                    )
-                    db.add(notification)
-                    db.commit()
-                    
-                    # Send WebSocket notification
-                    try:
-                        asyncio.run(manager.send_personal_message(
-                            message={
-                                "type": "notification",
-                                "data": {
-                                    "id": notification.id,
-                                    "title": notification.title,
-                                    "message": notification.message,
-                                    "type": "loan_payment",
-                                    "is_read": False
-                                }
-                            },
-                            user_id=loan.user_id
-                        ))
-                    except Exception as e:
-                        print(f"Failed to send WebSocket notification: {e}")
-                    continue
-                
-                # Debit EMI from account
-                account.balance -= loan.emi
-                loan.amount_paid = round(loan.amount_paid + loan.emi, 2)
-                loan.outstanding = round(max(loan.total_payable - loan.amount_paid, 0.0), 2)
-                
-                # Update next due date or close loan
-                from datetime import timedelta
-                if loan.outstanding > 0:
-                    loan.next_due_date = loan.next_due_date + timedelta(days=30)
-                else:
-                    loan.status = "CLOSED"
-                    loan.next_due_date = None
-                
-                # Log the auto-debit
-                audit_log = AuditLog(
-                    event_type="LOAN_EMI_AUTO_DEBIT",
-                    message=f"Auto-debited EMI of ${loan.emi} from account {account.account_number} for loan {loan.id}"
-                )
-                db.add(audit_log)
-                
-                # Create success notification
-                notification = Notification(
-                    user_id=loan.user_id,
-                    title="Loan EMI Auto-Debited",
-                    message=f"EMI of ${loan.emi:,.2f} has been debited for your {loan.loan_type} loan. Outstanding: ${loan.outstanding:,.2f}. New balance: ${account.balance:,.2f}.",
-                    type="loan_payment",
-                    related_id=loan.id
-                )
-                db.add(notification)
-                db.commit()
-                
-                print(f"Successfully auto-debited EMI for loan {loan.id}. Outstanding: {loan.outstanding}")
-                
-                # Send WebSocket notification
-                try:
-                    asyncio.run(manager.send_personal_message(
-                        message={
-                            "type": "notification",
-                            "data": {
-                                "id": notification.id,
-                                "title": notification.title,
-                                "message": notification.message,
-                                "type": "loan_payment",
-                                "is_read": False
-                            }
-                        },
-                        user_id=loan.user_id
-                    ))
-                except Exception as e:
-                    print(f"Failed to send WebSocket notification: {e}")
-                
-                # Publish WebSocket event
-                publish_ws_event({
-                    "type": "loan.emi_debit",
-                    "loan_id": loan.id,
-                    "user_id": loan.user_id,
-                    "emi_amount": loan.emi,
-                    "outstanding": loan.outstanding,
-                    "status": loan.status,
-                    "account_balance": account.balance
-                })
-                
+                with rabbitmq.publisher.batch():
+                    for outcome in outcomes:
+                        if outcome["notification"]:
+                            _send_realtime_notification(outcome["user_id"], outcome["notification"])
+                        if outcome["event"]:
+                            # Publish WebSocket event to the loan owner
+                            rabbitmq.publish_user_event(outcome["user_id"], outcome["event"])
             except Exception as e:
-                print(f"Error processing loan {loan.id}: {e}")
-                db.rollback()
-                continue
-        
-        print(f"Processed {len(due_loans)} due loans for EMI auto-debit")
-        
+                print(f"Failed to publish EMI events: {e}")
+
+        run = finish_partition(db, run_id, generation)
+        print(f"EMI run {run_id} loans {first_loan_id}-{last_loan_id}: processed {processed}, run {run.status if run else 'missing'}")
+        return processed
     except Exception as e:
-        print(f"Error in auto_debit_loan_emi task: {e}")
+        print(f"Error in EMI run {run_id} partition {first_loan_id}-{last_loan_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+@celery_app.task(name="reconcile_admin_stats")
+def reconcile_admin_stats():
+    """Rebuild the /admin/stats counters from the base tables to correct any drift"""
+    if not config.ADMIN_STATS_COUNTERS:
+        return
+
+    db = SessionLocal()
+    try:
+        stats = rebuild_counters(db)
+        print(f"Reconciled admin stats counters: {stats}")
+    except Exception as e:
+        print(f"Error reconciling admin stats counters: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+@celery_app.task(name="rebuild_transaction_rollup")
+def rebuild_transaction_rollup(days: int = 2):
+    """Recompute the last `days` days of transaction_daily_rollup from the SUCCESS transactions (the stats endpoint reads today live)"""
+    from datetime import timedelta
+
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        rebuilt = rebuild_daily_rollup(db, since)
+        print(f"Rebuilt transaction rollup since {since}: {rebuilt} non-empty days")
+    except Exception as e:
+        print(f"Error rebuilding transaction rollup: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+@celery_app.task(name="broadcast_notification")
+def broadcast_notification(broadcast_id: int):
+    """Fan an admin broadcast out to every customer; re-running a failed broadcast resumes it"""
+    db = SessionLocal()
+    try:
+        broadcast = run_broadcast(db, broadcast_id, config.NOTIFICATION_BROADCAST_CHUNK_SIZE)
+        if broadcast is None:
+            print(f"Broadcast {broadcast_id} not found")
+            return 0
+        print(f"Broadcast {broadcast_id} {broadcast.status}: {broadcast.sent_count}/{broadcast.total_recipients} recipients")
+        return broadcast.sent_count
+    finally:
+        db.close()
+
+
+@celery_app.task(name="mature_fixed_deposits")
+def mature_fixed_deposits(as_of: str = None):
+    """Pay out (or auto-renew) every approved ACTIVE fixed deposit that matured on or before `as_of` (default today)"""
+    from datetime import date
+    from .fd_maturity import mature_due_deposits
+
+    today = date.fromisoformat(as_of) if as_of else date.today()
+    db = SessionLocal()
+    failed = set()
+    counts = {"MATURED": 0, "RENEWED": 0, "FAILED": 0}
+    try:
+        while True:
+            outcomes = mature_due_deposits(db, today, config.FD_MATURITY_CHUNK_SIZE, failed)
+            if not outcomes:
+                break
+            for outcome in outcomes:
+                counts[outcome["status"]] += 1
+
+            try:
+                with rabbitmq.publisher.batch():
+                    for outcome in outcomes:
+                        if outcome["notification"]:
+                            _send_realtime_notification(outcome["user_id"], outcome["notification"])
+                        if outcome["status"] == "MATURED":
+                            rabbitmq.publish_user_event(outcome["user_id"], {
+                                "type": "fd.matured",
+                                "fd_id": outcome["fd_id"],
+                                "amount": outcome["amount"],
+                                "account_id": outcome["account_id"],
+                                "account_balance": outcome["account_balance"]
+                            })
+            except Exception as e:
+                print(f"Failed to publish FD maturity events: {e}")
+
+        print(f"Fixed deposit maturity as of {today}: {counts}")
+        return counts
+    except Exception as e:
+        print(f"Error in mature_fixed_deposits task: {e}")
         db.rollback()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,92 @@
+"""
+timeseries.py
+
+Bucketed time-series queries for the admin charts.
+
+Each series is a single GROUP BY date_trunc(unit, column) query that returns
+only the non-empty buckets; the chart's full list of buckets (last N days or
+calendar months) is built and gap-filled in Python. Adding a chart costs one
+query, not one query per bucket.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, true
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime
+from sqlalchemy.orm import Session
+
+
+class date_bucket(FunctionElement):
+    """date_trunc(unit, column) for unit 'day' or 'month'"""
+    type = DateTime()
+    name = "date_bucket"
+    inherit_cache = False
+
+    def __init__(self, unit: str, column):
+        self.unit = unit
+        super().__init__(column)
+
+
+@compiles(date_bucket)
+def _compile_date_bucket(element, compiler, **kw):
+    return f"date_trunc('{element.unit}', {compiler.process(element.clauses, **kw)})"
+
+
+_SQLITE_BUCKET_FORMATS = {"day": "%Y-%m-%d 00:00:00", "month": "%Y-%m-01 00:00:00"}
+
+
+@compiles(date_bucket, "sqlite")
+def _compile_date_bucket_sqlite(element, compiler, **kw):
+    return f"strftime('{_SQLITE_BUCKET_FORMATS[element.unit]}', {compiler.process(element.clauses, **kw)})"
+
+
+def bucket_counts(db: Session, column, unit: str, since: datetime = None, where=(), **counts) -> dict:
+    """
+    Count rows per `unit` bucket of `column` in one query.
+
+    Each keyword names a count and gives its condition (None counts every
+    row). Returns {bucket_start: {name: count}} for non-empty buckets only.
+    """
+    bucket = date_bucket(unit, column).label("bucket")
+    query = select(
+        bucket,
+        *[func.count(case((true() if cond is None else cond, 1))).label(name) for name, cond in counts.items()]
+    ).where(column.isnot(None), *where)
+    if since is not None:
+        query = query.where(column >= since)
+
+    return {
+        row.bucket: {name: row._mapping[name] for name in counts}
+        for row in db.execute(query.group_by(bucket))
+    }
+
+
+def day_starts(today: datetime, days: int) -> list:
+    """Midnight of each of the last `days` days, oldest first"""
+    midnight = today.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [midnight - timedelta(days=i) for i in range(days - 1, -1, -1)]
+
+
+def month_starts(today: datetime, months: int) -> list:
+    """First instant of each of the last `months` calendar months, oldest first"""
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        starts.append(datetime(year, month, 1))
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return starts[::-1]
+
+
+def fill(buckets: dict, starts: list, name: str) -> list:
+    """Values of `name` for every bucket start, 0 where the bucket is empty"""
+    return [buckets.get(start, {}).get(name, 0) for start in starts]
+
+
+def cumulative(buckets: dict, starts: list, name: str) -> list:
+    """Running total of `name` up to the end of each bucket (includes history before the first)"""
+    totals = []
+    running = sum(counts[name] for bucket, counts in buckets.items() if bucket < starts[0])
+    for start in starts:
+        running += buckets.get(start, {}).get(name, 0)
+        totals.append(running)
+    return totals
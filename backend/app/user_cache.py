@@ -0,0 +1,100 @@
+"""
+user_cache.py
+
+In-process identity cache for the get_current_user dependencies.
+
+    - Decoded JWTs are kept in an LRU keyed by the raw token, so repeated
+      requests skip signature verification. Entries are never served past
+      the token's own "exp".
+    - User rows are kept per user id for AUTH_USER_CACHE_TTL seconds as
+      plain column snapshots. Every caller gets its own detached User built
+      from the snapshot, so nothing is shared between requests or sessions.
+
+Anything that changes a user's status, role or credentials must call
+invalidate_user(user_id). Other API processes pick the change up once their
+TTL runs out, so keep the TTL short.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy.orm import Session, make_transient_to_detached
+from . import config
+from .models import User
+from .utils import decode_access_token
+
+_lock = threading.Lock()
+_tokens: "OrderedDict[str, dict]" = OrderedDict()
+_users: dict = {}
+_columns = [attr.key for attr in User.__mapper__.column_attrs]
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """Decode a JWT through the LRU. Returns None for invalid or expired tokens."""
+    now = time.time()
+    with _lock:
+        payload = _tokens.get(token)
+        if payload is not None:
+            if payload.get("exp", 0) > now:
+                _tokens.move_to_end(token)
+                return payload
+            del _tokens[token]
+            return None
+
+    payload = decode_access_token(token)
+    if payload is None or config.AUTH_TOKEN_CACHE_SIZE <= 0:
+        return payload
+
+    with _lock:
+        _tokens[token] = payload
+        while len(_tokens) > config.AUTH_TOKEN_CACHE_SIZE:
+            _tokens.popitem(last=False)
+    return payload
+
+
+def _detached_user(values: dict) -> User:
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_user(user_id: int, db: Session = None) -> Optional[User]:
+    """
+    Detached User for `user_id`, from the cache or a single SELECT.
+    Uses `db` on a miss, or opens a short-lived session if none is given.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+    if entry and entry[0] > now:
+        return _detached_user(entry[1])
+
+    own_session = db is None
+    if own_session:
+        from .database import SessionLocal
+        db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+        values = {key: getattr(user, key) for key in _columns}
+    finally:
+        if own_session:
+            db.close()
+
+    if config.AUTH_USER_CACHE_TTL > 0:
+        with _lock:
+            _users[user_id] = (now + config.AUTH_USER_CACHE_TTL, values)
+    return _detached_user(values)
+
+
+def invalidate_user(user_id: int):
+    """Drop a cached user after its status, role or credentials changed"""
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def clear():
+    with _lock:
+        _tokens.clear()
+        _users.clear()
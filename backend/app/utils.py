@@ -61,11 +61,11 @@ def get_token_from_header(credentials: HTTPAuthorizationCredentials = Depends(se
     return credentials.credentials
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    from . import models
-    from .database import SessionLocal
+    """Detached current user from the identity cache; only opens a session on a cache miss"""
+    from . import user_cache
     
     token = credentials.credentials
-    payload = decode_access_token(token)
+    payload = user_cache.decode_token(token)
     
     if payload is None:
         raise HTTPException(
@@ -82,15 +82,11 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    db = SessionLocal()
-    try:
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return user
-    finally:
-        db.close()
\ No newline at end of file
+    user = user_cache.get_user(user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
\ No newline at end of file
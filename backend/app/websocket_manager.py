@@ -1,62 +1,186 @@
 from fastapi import WebSocket
-from typing import List, Dict
+from typing import Dict, Set, Callable, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+import asyncio
 import json
+from . import config
+
+
+@dataclass(eq=False)
+class ConnectionInfo:
+    """Bookkeeping for one live socket"""
+    user_id: Optional[int]
+    role: Optional[str]
+    outbox: asyncio.Queue
+    writer: Optional[asyncio.Task] = None
+    connected_at: datetime = field(default_factory=datetime.utcnow)
+    last_pong: Optional[datetime] = None
+    bytes_sent: int = 0
+    messages_sent: int = 0
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.user_connections: Dict[int, List[WebSocket]] = {}
+    """
+    Registry of live WebSocket connections.
+
+    Connections are kept in a dict keyed by the socket itself, with per-user
+    and per-role index sets, so connect/disconnect/lookup are O(1) no matter
+    how many clients are attached.
+
+    Every connection gets a bounded outbound queue drained by its own writer
+    task, so a message is JSON-encoded once, handed to all recipients without
+    awaiting any of them, and written to the sockets concurrently. A client
+    whose queue overflows or whose send exceeds WS_SEND_TIMEOUT is treated as
+    a slow consumer and dropped instead of holding everyone else up.
+    """
+
+    def __init__(self, outbound_queue_size: int = 100, send_timeout: float = 5.0):
+        self.connections: Dict[WebSocket, ConnectionInfo] = {}
+        self.user_connections: Dict[int, Set[WebSocket]] = {}
+        self.role_connections: Dict[str, Set[WebSocket]] = {}
 
-    async def connect(self, websocket: WebSocket, user_id: int = None):
+        self.outbound_queue_size = outbound_queue_size
+        self.send_timeout = send_timeout
+
+        # Hooks used by the RabbitMQ listener to bind/unbind "user.<id>" as the
+        # first socket of a user connects and the last one goes away
+        self.on_user_subscribed: Optional[Callable[[int], None]] = None
+        self.on_user_unsubscribed: Optional[Callable[[int], None]] = None
+
+    @property
+    def active_connections(self):
+        return self.connections.keys()
+
+    @property
+    def admin_connections(self):
+        return self.role_connections.get("admin", set())
+
+    async def connect(self, websocket: WebSocket, user_id: int = None, role: str = None):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        
+        info = ConnectionInfo(
+            user_id=user_id,
+            role=role,
+            outbox=asyncio.Queue(maxsize=self.outbound_queue_size)
+        )
+        self.connections[websocket] = info
+        info.writer = asyncio.create_task(self._writer(websocket, info))
+
         if user_id:
             if user_id not in self.user_connections:
-                self.user_connections[user_id] = []
-            self.user_connections[user_id].append(websocket)
+                self.user_connections[user_id] = set()
+                if self.on_user_subscribed:
+                    self.on_user_subscribed(user_id)
+            self.user_connections[user_id].add(websocket)
+
+        if role:
+            self.role_connections.setdefault(role, set()).add(websocket)
 
     def disconnect(self, websocket: WebSocket, user_id: int = None):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        
+        info = self.connections.pop(websocket, None)
+        if info is None:
+            return
+
+        if info.writer and info.writer is not asyncio.current_task():
+            info.writer.cancel()
+
+        if info.role in self.role_connections:
+            self.role_connections[info.role].discard(websocket)
+            if not self.role_connections[info.role]:
+                del self.role_connections[info.role]
+
+        user_id = info.user_id
         if user_id and user_id in self.user_connections:
-            if websocket in self.user_connections[user_id]:
-                self.user_connections[user_id].remove(websocket)
+            self.user_connections[user_id].discard(websocket)
             if not self.user_connections[user_id]:
                 del self.user_connections[user_id]
+                if self.on_user_unsubscribed:
+                    self.on_user_unsubscribed(user_id)
+
+    def record_pong(self, websocket: WebSocket):
+        """Note a heartbeat from the client"""
+        info = self.connections.get(websocket)
+        if info:
+            info.last_pong = datetime.utcnow()
+
+    async def _writer(self, websocket: WebSocket, info: ConnectionInfo):
+        """Drain one connection's outbound queue; drop the client if a send stalls or fails"""
+        try:
+            # wait_for() can swallow a cancel that lands as the send completes,
+            # so also stop once disconnect() has unregistered the connection
+            while self.connections.get(websocket) is info:
+                text = await info.outbox.get()
+                await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+                info.bytes_sent += len(text)
+                info.messages_sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            reason = "send timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            self._drop(websocket, reason)
+
+    def _drop(self, websocket: WebSocket, reason: str):
+        """Forget a dead or slow client and close its socket in the background"""
+        if websocket not in self.connections:
+            return
+        print(f"Dropping WebSocket client: {reason}")
+        self.disconnect(websocket)
+        asyncio.get_running_loop().create_task(self._close_quietly(websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # "try again later"
+        except Exception:
+            pass
+
+    def _enqueue(self, connections, text: str) -> int:
+        """Queue an already-encoded message for each connection without awaiting any send"""
+        queued = 0
+        for connection in list(connections):
+            info = self.connections.get(connection)
+            if info is None:
+                continue
+            try:
+                info.outbox.put_nowait(text)
+                queued += 1
+            except asyncio.QueueFull:
+                self._drop(connection, "outbound queue full")
+        return queued
+
+    async def send_to_connection(self, websocket: WebSocket, message: dict):
+        """Reply on a single socket through its outbound queue (keeps one writer per socket)"""
+        self._enqueue([websocket], json.dumps(message))
 
     async def send_personal_message(self, message: dict, user_id: int):
         """Send message to specific user"""
         if user_id in self.user_connections:
-            disconnected_connections = []
-            for connection in self.user_connections[user_id]:
-                try:
-                    await connection.send_text(json.dumps(message))
-                except Exception:
-                    disconnected_connections.append(connection)
-            
-            # Clean up disconnected connections
-            for connection in disconnected_connections:
-                self.disconnect(connection, user_id)
+            self._enqueue(self.user_connections[user_id], json.dumps(message))
 
     async def broadcast(self, message: dict):
         """Broadcast message to all connected clients"""
-        disconnected_connections = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception:
-                disconnected_connections.append(connection)
-        
-        # Clean up disconnected connections
-        for connection in disconnected_connections:
-            self.disconnect(connection)
+        self._enqueue(self.connections, json.dumps(message))
 
     async def broadcast_to_admins(self, message: dict):
-        """Broadcast message to all admin users (if we track admin connections)"""
-        # For now, broadcast to all - can be enhanced to track admin user IDs
-        await self.broadcast(message)
+        """Send message to connected admin users only"""
+        self._enqueue(self.admin_connections, json.dumps(message))
+
+    def stats(self) -> dict:
+        """Connection counts and traffic totals for this process"""
+        infos = list(self.connections.values())
+        return {
+            "total_connections": len(infos),
+            "authenticated_users": len(self.user_connections),
+            "anonymous_connections": sum(1 for info in infos if not info.user_id),
+            "connections_by_role": {role: len(sockets) for role, sockets in self.role_connections.items()},
+            "queued_messages": sum(info.outbox.qsize() for info in infos),
+            "messages_sent": sum(info.messages_sent for info in infos),
+            "bytes_sent": sum(info.bytes_sent for info in infos),
+            "oldest_connected_at": min((info.connected_at for info in infos), default=None)
+        }
 
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    outbound_queue_size=config.WS_OUTBOUND_QUEUE_SIZE,
+    send_timeout=config.WS_SEND_TIMEOUT
+)
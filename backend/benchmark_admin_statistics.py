@@ -0,0 +1,311 @@
+"""
+Benchmark /admin/statistics/detailed: per-bucket COUNT loops vs GROUP BY buckets.
+Run this from backend directory:
+
+    python benchmark_admin_statistics.py                 # seeded throwaway SQLite DB
+    python benchmark_admin_statistics.py --users 20000   # bigger seed
+    python benchmark_admin_statistics.py --use-app-db    # read-only, against DATABASE_URL
+
+Prints query count and latency of the old and new implementations and checks
+that both return the same response shape.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, date
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "nyord_unused.db"))
+
+from app import models
+from app.database import Base
+from app.routers.admin_router import get_detailed_statistics
+
+
+def legacy_detailed_statistics(db):
+    """The pre-rewrite implementation: one COUNT per bucket"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import extract, case
+    
+    # Get current date
+    today = datetime.now()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    
+    # Weekly stats
+    accounts_this_week = db.query(models.Account).filter(
+        models.Account.created_at >= week_ago
+    ).count()
+    
+    loans_this_week = db.query(models.Loan).filter(
+        models.Loan.created_at >= week_ago,
+        models.Loan.approval_status == "approved"
+    ).count()
+    
+    cards_this_week = db.query(models.Card).filter(
+        models.Card.created_at >= week_ago,
+        models.Card.approval_status == "approved"
+    ).count()
+    
+    # Monthly stats
+    accounts_this_month = db.query(models.Account).filter(
+        models.Account.created_at >= month_ago
+    ).count()
+    
+    loans_this_month = db.query(models.Loan).filter(
+        models.Loan.created_at >= month_ago,
+        models.Loan.approval_status == "approved"
+    ).count()
+    
+    cards_this_month = db.query(models.Card).filter(
+        models.Card.created_at >= month_ago,
+        models.Card.approval_status == "approved"
+    ).count()
+    
+    # Account types distribution
+    account_types = db.query(
+        models.Account.account_type,
+        func.count(models.Account.id).label('count')
+    ).group_by(models.Account.account_type).all()
+    
+    # Loan types distribution (approximation based on amount)
+    total_loans = db.query(models.Loan).filter(models.Loan.approval_status == "approved").count()
+    personal_loans = db.query(models.Loan).filter(
+        models.Loan.approval_status == "approved",
+        models.Loan.principal <= 50000
+    ).count()
+    auto_loans = db.query(models.Loan).filter(
+        models.Loan.approval_status == "approved",
+        models.Loan.principal > 50000,
+        models.Loan.principal <= 200000
+    ).count()
+    home_loans = db.query(models.Loan).filter(
+        models.Loan.approval_status == "approved",
+        models.Loan.principal > 200000
+    ).count()
+    
+    # Card types distribution
+    card_types = db.query(
+        models.Card.card_type,
+        func.count(models.Card.id).label('count')
+    ).group_by(models.Card.card_type).all()
+    
+    # Approval rates
+    total_accounts_req = db.query(models.Account).count()
+    approved_accounts = db.query(models.Account).filter(models.Account.status == "active").count()
+    
+    total_loans_req = db.query(models.Loan).count()
+    approved_loans = db.query(models.Loan).filter(models.Loan.approval_status == "approved").count()
+    
+    total_cards_req = db.query(models.Card).count()
+    approved_cards = db.query(models.Card).filter(models.Card.approval_status == "approved").count()
+    
+    # User growth (monthly for last 12 months)
+    user_growth = []
+    for i in range(11, -1, -1):
+        month_start = today.replace(day=1) - timedelta(days=30*i)
+        month_end = month_start + timedelta(days=30)
+        users = db.query(models.User).filter(
+            models.User.role == "customer",
+            models.User.created_at <= month_end
+        ).count()
+        active_users = db.query(models.User).filter(
+            models.User.role == "customer",
+            models.User.status == "approved",
+            models.User.created_at <= month_end
+        ).count()
+        user_growth.append({
+            "month": month_start.strftime("%b"),
+            "users": users,
+            "active": active_users
+        })
+    
+    # Daily accounts (last 7 days)
+    daily_accounts = []
+    for i in range(6, -1, -1):
+        day = today - timedelta(days=i)
+        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
+        count = db.query(models.Account).filter(
+            models.Account.created_at >= day_start,
+            models.Account.created_at <= day_end
+        ).count()
+        daily_accounts.append({
+            "day": day.strftime("%a"),
+            "accounts": count
+        })
+    
+    # Monthly data (last 12 months)
+    monthly_data = []
+    for i in range(11, -1, -1):
+        month_start = today.replace(day=1) - timedelta(days=30*i)
+        month_end = month_start + timedelta(days=30)
+        
+        accounts = db.query(models.Account).filter(
+            models.Account.created_at >= month_start,
+            models.Account.created_at < month_end
+        ).count()
+        
+        loans = db.query(models.Loan).filter(
+            models.Loan.approval_status == "approved",
+            models.Loan.created_at >= month_start,
+            models.Loan.created_at < month_end
+        ).count()
+        
+        cards = db.query(models.Card).filter(
+            models.Card.approval_status == "approved",
+            models.Card.created_at >= month_start,
+            models.Card.created_at < month_end
+        ).count()
+        
+        monthly_data.append({
+            "month": month_start.strftime("%b"),
+            "accounts": accounts,
+            "loans": loans,
+            "cards": cards
+        })
+    
+    return {
+        "weeklyStats": {
+            "accounts": accounts_this_week,
+            "loans": loans_this_week,
+            "cards": cards_this_week
+        },
+        "monthlyStats": {
+            "accounts": accounts_this_month,
+            "loans": loans_this_month,
+            "cards": cards_this_month
+        },
+        "accountTypes": [{"name": acc_type, "value": count} for acc_type, count in account_types],
+        "loanTypes": [
+            {"name": "Personal", "value": personal_loans},
+            {"name": "Auto", "value": auto_loans},
+            {"name": "Home", "value": home_loans}
+        ],
+        "cardTypes": [{"name": card_type, "value": count} for card_type, count in card_types],
+        "approvalRates": {
+            "accounts": {
+                "approved": round((approved_accounts / total_accounts_req * 100) if total_accounts_req > 0 else 0, 1),
+                "rejected": round(((total_accounts_req - approved_accounts) / total_accounts_req * 100) if total_accounts_req > 0 else 0, 1)
+            },
+            "loans": {
+                "approved": round((approved_loans / total_loans_req * 100) if total_loans_req > 0 else 0, 1),
+                "rejected": round(((total_loans_req - approved_loans) / total_loans_req * 100) if total_loans_req > 0 else 0, 1)
+            },
+            "cards": {
+                "approved": round((approved_cards / total_cards_req * 100) if total_cards_req > 0 else 0, 1),
+                "rejected": round(((total_cards_req - approved_cards) / total_cards_req * 100) if total_cards_req > 0 else 0, 1)
+            }
+        },
+        "userGrowth": user_growth,
+        "dailyAccounts": daily_accounts,
+        "monthlyData": monthly_data
+    }
+
+
+def seed(db, users: int):
+    random.seed(7)
+    now = datetime.now()
+
+    def created():
+        return now - timedelta(days=random.randint(0, 420), seconds=random.randint(0, 86399))
+
+    for i in range(users):
+        db.add(models.User(
+            username=f"user{i}", email=f"user{i}@example.com", hashed_password="x",
+            status=random.choice(["pending", "approved", "approved", "rejected"]), created_at=created()
+        ))
+    db.flush()
+
+    for i in range(users):
+        user_id = i + 1
+        db.add(models.Account(
+            account_number=f"{i:016d}", account_type=random.choice(["savings", "current"]),
+            balance=random.uniform(0, 50000), user_id=user_id, created_at=created()
+        ))
+        if i % 3 == 0:
+            db.add(models.Loan(
+                user_id=user_id, loan_type="Personal", principal=random.choice([20000, 100000, 500000]),
+                rate=9.5, tenure_months=12, start_date=date.today(), emi=1, total_payable=1, outstanding=1,
+                approval_status=random.choice(["pending", "approved"]), created_at=created()
+            ))
+        if i % 2 == 0:
+            db.add(models.Card(
+                user_id=user_id, card_number=f"{i:016d}", card_type=random.choice(["Gold", "Platinum"]),
+                card_holder="x", expiry_date="01/30", cvv="000", pin="x",
+                approval_status=random.choice(["pending", "approved"]), created_at=created()
+            ))
+    db.commit()
+
+
+def shape(value):
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(item) for item in value[:1]]
+    return type(value).__name__ if not isinstance(value, (int, float)) else "number"
+
+
+def measure(engine, session_factory, run, repeat: int):
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(repeat):
+            db = session_factory()
+            try:
+                queries[0] = 0
+                start = time.perf_counter()
+                result = run(db)
+                timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return result, queries[0], statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000, help="users to seed (SQLite mode)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--use-app-db", action="store_true", help="run against DATABASE_URL instead of a seeded SQLite file")
+    args = parser.parse_args()
+
+    if args.use_app_db:
+        from app.database import engine
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        print(f"Seeding {args.users} users into {path}...")
+        seed(sessionmaker(bind=engine)(), args.users)
+
+    session_factory = sessionmaker(bind=engine)
+    old, old_queries, old_ms = measure(engine, session_factory, legacy_detailed_statistics, args.repeat)
+    new, new_queries, new_ms = measure(
+        engine, session_factory,
+        lambda db: asyncio.run(get_detailed_statistics(admin_user=None, db=db)),
+        args.repeat
+    )
+
+    print(f"{'':10} {'queries':>8} {'median ms':>10}")
+    print(f"{'old':10} {old_queries:>8} {old_ms:>10.1f}")
+    print(f"{'new':10} {new_queries:>8} {new_ms:>10.1f}")
+    print(f"same response shape: {shape(old) == shape(new)}")
+    for key in ("weeklyStats", "monthlyStats", "loanTypes", "approvalRates", "dailyAccounts"):
+        print(f"  {key}: {'identical' if old[key] == new[key] else 'differs'}")
+    print("  userGrowth/monthlyData use calendar months now (old code used 30-day windows)")
+
+
+if __name__ == "__main__":
+    main()
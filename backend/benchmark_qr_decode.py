@@ -0,0 +1,165 @@
+"""
+Benchmark QR decoding in a scan-heavy checkout flow: legacy hash checks vs signed tokens.
+Run this from backend directory:
+
+    python benchmark_qr_decode.py                  # 2000 users, 5000 scans
+    python benchmark_qr_decode.py --scans 20000
+
+Seeds a throwaway SQLite DB and replays the same scan mix through the old
+/qr/decode logic (look the account up, compare the SHA256 hash, look the
+owner up) and the current decode_qr_data (verify the HMAC token without the
+database, then one joined lookup). The mix is mostly account QR codes at a
+till, some personal QR codes, and a share of tampered or forged codes.
+Prints queries per scan and latency for each kind of scan.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from fastapi import HTTPException
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "nyord_unused.db"))
+
+from app import models, qr_utils
+from app.database import Base
+from app.routers.qr_router import decode_qr_data, QRDecodeRequest
+
+BASE_URL = "http://localhost:3000"
+
+
+def legacy_decode(qr_data: str, current_user, db):
+    """The pre-token /qr/decode flow for payment URLs"""
+    from urllib.parse import urlparse, parse_qs
+    query_params = parse_qs(urlparse(qr_data).query)
+    qr_hash = query_params.get("hash", [None])[0]
+
+    account_id = query_params.get("account", [None])[0]
+    if account_id:
+        account_id = int(account_id)
+        target_account = db.query(models.Account).filter(models.Account.id == account_id).first()
+        if not target_account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        if qr_hash != qr_utils.generate_account_qr_hash(account_id):
+            raise HTTPException(status_code=400, detail="Invalid or tampered QR code")
+        target_user = db.query(models.User).filter(models.User.id == target_account.user_id).first()
+        return {"valid": True, "qr_type": "account", "user_id": target_user.id, "account_id": target_account.id}
+
+    user_id = int(query_params.get("to", [None])[0])
+    target_user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not target_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if qr_hash != qr_utils.generate_user_qr_hash(user_id):
+        raise HTTPException(status_code=400, detail="Invalid or tampered QR code")
+    return {"valid": True, "qr_type": "user", "user_id": target_user.id}
+
+
+def seed(db, users: int):
+    for i in range(users):
+        db.add(models.User(username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+                           hashed_password="x", status="approved"))
+    db.flush()
+    for i in range(users):
+        db.add(models.Account(account_number=f"{i:016d}", account_type="current", balance=1000.0,
+                              user_id=i + 1, status="approved"))
+    db.commit()
+
+
+def scan_mix(users: int, scans: int) -> list:
+    """[(kind, legacy_url, token_url)]: 80% account, 10% user, 10% tampered account codes"""
+    random.seed(11)
+    mix = []
+    for _ in range(scans):
+        subject_id = random.randint(1, users)
+        roll = random.random()
+        if roll < 0.8:
+            legacy = f"{BASE_URL}/pay?account={subject_id}&hash={qr_utils.generate_account_qr_hash(subject_id)}"
+            mix.append(("account", legacy, qr_utils.build_account_qr_url(subject_id, None, BASE_URL)))
+        elif roll < 0.9:
+            legacy = f"{BASE_URL}/pay?to={subject_id}&hash={qr_utils.generate_user_qr_hash(subject_id)}"
+            mix.append(("user", legacy, qr_utils.build_user_qr_url(subject_id, None, BASE_URL)))
+        else:
+            # A code re-pointed at another account, keeping the original hash/token
+            other = subject_id % users + 1
+            legacy = f"{BASE_URL}/pay?account={other}&hash={qr_utils.generate_account_qr_hash(subject_id)}"
+            forged = f"{BASE_URL}/pay?account={other}&hash={qr_utils.generate_account_qr_token(subject_id)}"
+            mix.append(("tampered", legacy, forged))
+    return mix
+
+
+def replay(engine, session_factory, mix: list, decode) -> dict:
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+
+    current_user = models.User(id=0, username="cashier", role="customer")
+    results = {}
+    event.listen(engine, "before_cursor_execute", count)
+    db = session_factory()
+    try:
+        for kind, url in mix:
+            queries[0] = 0
+            start = time.perf_counter()
+            try:
+                decode(url, current_user, db)
+                outcome = "ok"
+            except HTTPException as e:
+                outcome = e.status_code
+            elapsed = (time.perf_counter() - start) * 1000
+            entry = results.setdefault(kind, {"queries": 0, "timings": [], "outcomes": set()})
+            entry["queries"] += queries[0]
+            entry["timings"].append(elapsed)
+            entry["outcomes"].add(outcome)
+            db.expunge_all()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="users (one account each) to seed")
+    parser.add_argument("--scans", type=int, default=5000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    print(f"Seeding {args.users} users into {path}...")
+    seed(sessionmaker(bind=engine)(), args.users)
+    session_factory = sessionmaker(bind=engine)
+
+    mix = scan_mix(args.users, args.scans)
+    old = replay(engine, session_factory, [(kind, legacy) for kind, legacy, _ in mix], legacy_decode)
+    new = replay(
+        engine, session_factory, [(kind, token) for kind, _, token in mix],
+        lambda url, user, db: decode_qr_data(QRDecodeRequest(qr_data=url), current_user=user, db=db)
+    )
+
+    print(f"\n{'scan':10} {'count':>6} {'old q/scan':>11} {'new q/scan':>11} {'old median ms':>14} {'new median ms':>14}  outcomes (old / new)")
+    for kind in ("account", "user", "tampered"):
+        o, n = old[kind], new[kind]
+        scans = len(o["timings"])
+        print(f"{kind:10} {scans:>6} {o['queries'] / scans:>11.2f} {n['queries'] / scans:>11.2f} "
+              f"{statistics.median(o['timings']):>14.3f} {statistics.median(n['timings']):>14.3f}  "
+              f"{sorted(map(str, o['outcomes']))} / {sorted(map(str, n['outcomes']))}")
+
+    total_old = sum(sum(entry["timings"]) for entry in old.values())
+    total_new = sum(sum(entry["timings"]) for entry in new.values())
+    print(f"\nwhole mix: {total_old:.0f} ms -> {total_new:.0f} ms, "
+          f"{sum(e['queries'] for e in old.values())} -> {sum(e['queries'] for e in new.values())} queries")
+
+    token = qr_utils.generate_account_qr_token(1)
+    start = time.perf_counter()
+    for _ in range(10000):
+        qr_utils.verify_account_qr_hash(1, token)
+    print(f"token verification alone: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us, no database access")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark per-QR render time with the old and the preloaded logo handling.
+Run this from backend directory: python benchmark_qr_render.py
+
+"before" re-implements the previous add_logo_to_qr (os.path.exists,
+Image.open and a LANCZOS thumbnail on every QR); "after" is the current
+qr_utils.add_logo_to_qr, which pastes a composite decoded and resized once
+per QR width. Both render the same payment URLs with the QR image cache
+bypassed. Uses frontend/public/logo.png, or a generated 512x512 logo when
+that file is missing.
+"""
+import os
+import tempfile
+import time
+import qrcode
+from PIL import Image, ImageDraw
+from app import qr_utils
+
+ROUNDS = 200
+
+
+def legacy_add_logo(qr_image: Image.Image) -> Image.Image:
+    if not os.path.exists(qr_utils.LOGO_PATH):
+        return qr_image
+    logo = Image.open(qr_utils.LOGO_PATH)
+    qr_width, qr_height = qr_image.size
+    logo_max_size = int(qr_width * 0.15)
+    logo.thumbnail((logo_max_size, logo_max_size), Image.Resampling.LANCZOS)
+    logo_width, logo_height = logo.size
+    padding = int(logo_max_size * 0.20)
+    background_size = logo_width + (padding * 2)
+    background = Image.new('RGB', (background_size, background_size), 'white')
+    if logo.mode == 'RGBA':
+        background.paste(logo, (padding, padding), logo)
+    else:
+        background.paste(logo, (padding, padding))
+    qr_image.paste(background, ((qr_width - background_size) // 2, (qr_height - background_size) // 2))
+    return qr_image
+
+
+def make_logo(directory: str) -> str:
+    path = os.path.join(directory, "logo.png")
+    logo = Image.new('RGBA', (512, 512), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(logo)
+    draw.ellipse((16, 16, 496, 496), fill=(30, 64, 175, 255))
+    draw.rectangle((176, 136, 336, 376), fill=(255, 255, 255, 255))
+    logo.save(path)
+    return path
+
+
+def qr_images(urls: list) -> list:
+    images = []
+    for url in urls:
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+        qr.add_data(url)
+        qr.make(fit=True)
+        images.append(qr.make_image(fill_color="black", back_color="white").convert('RGB'))
+    return images
+
+
+def bench(add_logo, images: list) -> float:
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        add_logo(images[i % len(images)].copy())
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def bench_render(urls: list) -> float:
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        qr_utils.render_qr_png(urls[i % len(urls)])
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if not os.path.exists(qr_utils.LOGO_PATH):
+            qr_utils.LOGO_PATH = make_logo(tmp)
+            print("Logo not found, using a generated 512x512 logo")
+
+        urls = [
+            qr_utils.build_user_qr_url(i, {"username": f"user{i}", "full_name": f"Test User {i}"})
+            for i in range(1, 51)
+        ]
+        images = qr_images(urls)
+        widths = sorted({image.size[0] for image in images})
+        print(f"QR widths produced: {', '.join(f'{w}px' for w in widths)}\n")
+
+        qr_utils.preload_logo()
+        before = bench(legacy_add_logo, images)
+        after = bench(qr_utils.add_logo_to_qr, images)
+        print(f"{'':>22} {'before':>10} {'after':>10}")
+        print(f"{'add logo':>22} {before * 1000:>7.2f} ms {after * 1000:>7.2f} ms")
+
+        full_after = bench_render(urls)
+        original = qr_utils.add_logo_to_qr
+        qr_utils.add_logo_to_qr = legacy_add_logo
+        try:
+            full_before = bench_render(urls)
+        finally:
+            qr_utils.add_logo_to_qr = original
+        print(f"{'full render (PNG)':>22} {full_before * 1000:>7.2f} ms {full_after * 1000:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Migration script to add the dispatch generation column to emi_runs
+Run this from backend directory: python migrate_emi_run_generation.py
+
+Existing rows get generation 0, the generation that partition tasks queued
+before this change report, so runs in flight still complete.
+"""
+
+from app.database import engine
+from sqlalchemy import text
+
+def migrate():
+    try:
+        with engine.connect() as conn:
+            print("Adding generation column to emi_runs table...")
+            conn.execute(text("ALTER TABLE emi_runs ADD COLUMN generation INTEGER NOT NULL DEFAULT 0"))
+            conn.commit()
+            print("✓ Added generation to emi_runs table")
+    except Exception as e:
+        print(f"Note: generation - {e}")
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,46 @@
+"""
+Migration script to add the auto-renewal and maturity columns to fixed_deposits
+Run this script to update the database schema (then add_performance_indexes.py for the maturity index)
+
+Also normalises the status of deposits approved by an admin, which used to be
+stored as "active", to the "ACTIVE" the maturity engine and the API expect.
+"""
+
+from app.database import engine
+from sqlalchemy import text
+
+def migrate():
+    # Add auto_renew to fixed_deposits table
+    try:
+        with engine.connect() as conn:
+            print("Adding auto_renew column to fixed_deposits table...")
+            conn.execute(text("ALTER TABLE fixed_deposits ADD COLUMN auto_renew BOOLEAN NOT NULL DEFAULT FALSE"))
+            conn.commit()
+            print("✓ Added auto_renew to fixed_deposits table")
+    except Exception as e:
+        print(f"Note: auto_renew - {e}")
+    
+    # Add matured_at to fixed_deposits table
+    try:
+        with engine.connect() as conn:
+            print("Adding matured_at column to fixed_deposits table...")
+            conn.execute(text("ALTER TABLE fixed_deposits ADD COLUMN matured_at TIMESTAMP"))
+            conn.commit()
+            print("✓ Added matured_at to fixed_deposits table")
+    except Exception as e:
+        print(f"Note: matured_at - {e}")
+    
+    # Normalise admin-approved deposits
+    try:
+        with engine.connect() as conn:
+            print("Normalising status of admin-approved fixed deposits...")
+            result = conn.execute(text("UPDATE fixed_deposits SET status = 'ACTIVE' WHERE status = 'active'"))
+            conn.commit()
+            print(f"✓ Normalised {result.rowcount} fixed deposits to ACTIVE")
+    except Exception as e:
+        print(f"Note: status - {e}")
+    
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,34 @@
+"""
+Migration script to add the kind column to transactions
+Run this from backend directory: python migrate_transaction_kind.py
+
+Existing rows become "transfer", except loan disbursals (the only rows
+without a source account before kinds existed), which become "loan".
+"""
+
+from app.database import engine
+from sqlalchemy import text
+
+def migrate():
+    try:
+        with engine.connect() as conn:
+            print("Adding kind column to transactions table...")
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'transfer'"))
+            conn.commit()
+            print("✓ Added kind to transactions table")
+    except Exception as e:
+        print(f"Note: kind - {e}")
+
+    try:
+        with engine.connect() as conn:
+            print("Marking loan disbursals...")
+            result = conn.execute(text("UPDATE transactions SET kind = 'loan' WHERE src_account IS NULL AND kind = 'transfer'"))
+            conn.commit()
+            print(f"✓ Marked {result.rowcount} loan disbursals")
+    except Exception as e:
+        print(f"Note: loan disbursals - {e}")
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    migrate()
@@ -157,6 +157,9 @@ export function NotificationProvider({ children }) {
               newDestBalance: data.new_dest_balance
             }
           }));
+        } else if (data.type === 'notification.stats' && data.data) {
+          // Pushed after notifications are read or deleted (here or on another device)
+          setUnreadCount(data.data.unread_count);
         } else if (data.type === 'notification_subscription') {
           console.log('Notification subscription confirmed:', data);
         } else {
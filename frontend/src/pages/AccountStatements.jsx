@@ -8,23 +8,20 @@ const AccountStatements = () => {
   const [accounts, setAccounts] = useState([]);
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        setLoading(true);
-        const [txns, accs, usersData] = await Promise.all([
-          transactionsAPI.getMyTransactions(),
+        const [accs, usersData] = await Promise.all([
           accountsAPI.getAccounts(),
           adminAPI.getAllUsers().catch(() => []) // Fallback if not admin
         ]);
-        setRawTransactions(txns || []);
         setAccounts(accs || []);
         setUsers(usersData || []);
       } catch (e) {
         console.error('Failed to fetch data', e);
-      } finally {
-        setLoading(false);
       }
     };
     fetchData();
@@ -48,7 +45,7 @@ const AccountStatements = () => {
     return map;
   }, [users]);
 
-  // Filter transactions by period
+  // Filter transactions by period (the server already limits pages to the period)
   const filteredTransactions = useMemo(() => {
     const now = new Date();
     const getStartDate = () => {
@@ -103,6 +100,40 @@ const AccountStatements = () => {
     return { start: fmt(start), end: fmt(end) };
   }, [selectedPeriod]);
 
+  // First page of the selected period; older pages are loaded on demand
+  useEffect(() => {
+    let cancelled = false;
+    const fetchFirstPage = async () => {
+      try {
+        setLoading(true);
+        const { transactions, nextCursor } = await transactionsAPI.getMyTransactions({ fromDate: periodRange.start });
+        if (cancelled) return;
+        setRawTransactions(transactions);
+        setNextCursor(nextCursor);
+      } catch (e) {
+        console.error('Failed to fetch transactions', e);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    };
+    fetchFirstPage();
+    return () => { cancelled = true; };
+  }, [periodRange.start]);
+
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await transactionsAPI.getMyTransactions({ cursor: nextCursor, fromDate: periodRange.start });
+      setRawTransactions(prev => [...prev, ...page.transactions]);
+      setNextCursor(page.nextCursor);
+    } catch (e) {
+      console.error('Failed to load more transactions', e);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Compute summary stats
   const summary = useMemo(() => {
     if (!accounts.length || !filteredTransactions.length) {
@@ -424,13 +455,15 @@ const AccountStatements = () => {
             <div className="flex items-center justify-between">
               <div className="text-sm text-gray-700 dark:text-gray-300">
                 Showing <span className="font-medium">{displayTransactions.length}</span> transaction{displayTransactions.length !== 1 ? 's' : ''}
+                {nextCursor ? ' (older transactions not loaded yet)' : ''}
               </div>
               <div className="flex space-x-2">
-                <button className="px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-lg text-sm font-medium text-gray-700 dark:text-gray-300 hover:bg-gray-50 dark:hover:bg-gray-700 transition-colors">
-                  Previous
-                </button>
-                <button className="px-4 py-2 bg-blue-600 text-white rounded-lg text-sm font-medium hover:bg-blue-700 transition-colors">
-                  Next
+                <button
+                  onClick={loadMore}
+                  disabled={!nextCursor || loadingMore}
+                  className="px-4 py-2 bg-blue-600 text-white rounded-lg text-sm font-medium hover:bg-blue-700 transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
                 </button>
               </div>
             </div>
@@ -25,79 +25,109 @@ const Statistics = () => {
   const [barData, setBarData] = useState(null);
   const [pieData, setPieData] = useState(null);
   const [lineData, setLineData] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // helper to build colors
   const COLORS = ['#4c9f70', '#d95f02', '#7570b3', '#1b9e77', '#e7298a', '#66c2a5', '#fc8d62'];
 
+  // Rebuild the charts from every transaction loaded so far
+  useEffect(() => {
+    const accountIds = accounts.map(a => a.id);
+
+    // Aggregate spending to counterparties (only debits)
+    const spendingByRecipient = {};
+    const monthlyTotals = {}; // YYYY-MM -> total
+
+    transactions.forEach(t => {
+      const isDebit = accountIds.includes(t.src_account);
+      if (t.status !== 'SUCCESS') return; // only count completed
+
+      // Monthly totals for trend (use timestamp)
+      let month = 'Unknown';
+      try {
+        month = new Date(t.timestamp).toLocaleString('default', { month: 'short', year: 'numeric' });
+      } catch (e) {}
+
+      if (isDebit) {
+        const recipient = t.dest_user_name || t.description || `Acct ${t.dest_account}`;
+        spendingByRecipient[recipient] = (spendingByRecipient[recipient] || 0) + Number(t.amount || 0);
+        monthlyTotals[month] = (monthlyTotals[month] || 0) + Number(t.amount || 0);
+      }
+    });
+
+    // Prepare bar/pie datasets from top recipients
+    const recipients = Object.keys(spendingByRecipient).sort((a,b) => spendingByRecipient[b]-spendingByRecipient[a]);
+    const topRecipients = recipients.slice(0, 6);
+    const topValues = topRecipients.map(r => spendingByRecipient[r]);
+
+    setBarData({
+      labels: topRecipients,
+      datasets: [{ label: 'Spent (USD)', data: topValues, backgroundColor: topRecipients.map((_,i)=>COLORS[i%COLORS.length]) }]
+    });
+
+    setPieData({
+      labels: topRecipients,
+      datasets: [{ data: topValues, backgroundColor: topRecipients.map((_,i)=>COLORS[i%COLORS.length]) }]
+    });
+
+    // Monthly trend (sorted by month order)
+    const months = Object.keys(monthlyTotals).sort((a,b)=> new Date(a) - new Date(b));
+    const monthValues = months.map(m => monthlyTotals[m]);
+    setLineData({ labels: months, datasets: [{ label: 'Monthly Spending', data: monthValues, borderColor: '#2563eb', backgroundColor: 'rgba(37,99,235,0.1)', fill: true }] });
+  }, [accounts, transactions]);
+
   useEffect(() => {
     const img = new Image();
     img.onload = () => setMatplotlibLoaded(true);
     img.onerror = () => setMatplotlibLoaded(false);
     img.src = backendMatplotlibUrl + '?_=' + Date.now();
 
-    // Fetch dashboard summary and transactions to populate charts dynamically
+    // Fetch dashboard summary and the newest page of transactions; older pages load on demand
     (async () => {
       try {
         const summary = await dashboardAPI.getSummary();
+        const page = await transactionsAPI.getMyTransactions({ limit: 200 });
         setAccounts(summary.accounts || []);
-
-        // Fetch full transactions list for user
-        const txns = await transactionsAPI.getMyTransactions();
-        setTransactions(txns || []);
-
-        const accountIds = (summary.accounts || []).map(a => a.id);
-
-        // Aggregate spending to counterparties (only debits)
-        const spendingByRecipient = {};
-        const monthlyTotals = {}; // YYYY-MM -> total
-
-        (txns || []).forEach(t => {
-          const isDebit = accountIds.includes(t.src_account);
-          if (t.status !== 'SUCCESS') return; // only count completed
-
-          // Monthly totals for trend (use timestamp)
-          let month = 'Unknown';
-          try {
-            month = new Date(t.timestamp).toLocaleString('default', { month: 'short', year: 'numeric' });
-          } catch (e) {}
-
-          if (isDebit) {
-            const recipient = t.dest_user_name || t.description || `Acct ${t.dest_account}`;
-            spendingByRecipient[recipient] = (spendingByRecipient[recipient] || 0) + Number(t.amount || 0);
-            monthlyTotals[month] = (monthlyTotals[month] || 0) + Number(t.amount || 0);
-          }
-        });
-
-        // Prepare bar/pie datasets from top recipients
-        const recipients = Object.keys(spendingByRecipient).sort((a,b) => spendingByRecipient[b]-spendingByRecipient[a]);
-        const topRecipients = recipients.slice(0, 6);
-        const topValues = topRecipients.map(r => spendingByRecipient[r]);
-
-        setBarData({
-          labels: topRecipients,
-          datasets: [{ label: 'Spent (USD)', data: topValues, backgroundColor: topRecipients.map((_,i)=>COLORS[i%COLORS.length]) }]
-        });
-
-        setPieData({
-          labels: topRecipients,
-          datasets: [{ data: topValues, backgroundColor: topRecipients.map((_,i)=>COLORS[i%COLORS.length]) }]
-        });
-
-        // Monthly trend (sorted by month order)
-        const months = Object.keys(monthlyTotals).sort((a,b)=> new Date(a) - new Date(b));
-        const monthValues = months.map(m => monthlyTotals[m]);
-        setLineData({ labels: months, datasets: [{ label: 'Monthly Spending', data: monthValues, borderColor: '#2563eb', backgroundColor: 'rgba(37,99,235,0.1)', fill: true }] });
-
+        setTransactions(page.transactions);
+        setNextCursor(page.nextCursor);
       } catch (err) {
         console.error('Failed to load stats data', err);
       }
     })();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await transactionsAPI.getMyTransactions({ cursor: nextCursor, limit: 200 });
+      setTransactions(prev => [...prev, ...page.transactions]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Failed to load more transactions', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <div className="max-w-5xl mx-auto">
       <h2 className="text-2xl font-semibold mb-4">Statistics & Insights</h2>
 
+      <div className="flex items-center justify-between mb-4 text-sm text-gray-500">
+        <span>Based on your {transactions.length} most recent transactions{nextCursor ? '' : ' (full history)'}</span>
+        {nextCursor && (
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 bg-blue-600 text-white rounded-lg font-medium hover:bg-blue-700 transition-colors disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Include older transactions'}
+          </button>
+        )}
+      </div>
+
       <div className="grid grid-cols-1 md:grid-cols-2 gap-6 mb-6">
         <div className="bg-white dark:bg-gray-800 rounded-2xl p-4 shadow">
           <h3 className="font-semibold mb-2">Top Recipients (Bar)</h3>
@@ -11,7 +11,7 @@ const setToken = (token) => localStorage.setItem('token', token);
 const removeToken = () => localStorage.removeItem('token');
 
 // API request wrapper with authentication
-const apiRequest = async (endpoint, options = {}) => {
+const apiRequest = async (endpoint, { withHeaders = false, ...options } = {}) => {
   const token = getToken();
   const headers = {
     'Content-Type': 'application/json',
@@ -47,7 +47,8 @@ const apiRequest = async (endpoint, options = {}) => {
       throw error;
     }
 
-    return await response.json();
+    const data = await response.json();
+    return withHeaders ? { data, headers: response.headers } : data;
   } catch (error) {
     // If it's already our custom error, just re-throw
     if (error.detail || error.status) {
@@ -173,8 +174,14 @@ export const profileAPI = {
 
 // Transactions API
 export const transactionsAPI = {
-  getMyTransactions: async () => {
-    return await apiRequest('/transactions/me');
+  // One page of /transactions/me, newest first. Pass the returned nextCursor back
+  // as `cursor` to load the following page; it is null on the last one.
+  getMyTransactions: async ({ cursor = null, limit = 50, fromDate = null } = {}) => {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    if (fromDate) params.set('from_date', fromDate);
+    const { data, headers } = await apiRequest(`/transactions/me?${params}`, { withHeaders: true });
+    return { transactions: data || [], nextCursor: headers.get('X-Next-Cursor') };
   },
 
   getTransactions: async () => {